@@ -0,0 +1,21 @@
+"""
+Acesso ao núcleo de leitura e cache do app principal (pacote app/ na raiz
+do repositório). Os dois pacotes se chamam `app`, então os módulos do núcleo
+são carregados com o nome `horas_core`, sem executar o __init__ do app principal.
+"""
+import os
+import sys
+import types
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CORE_DIR = os.path.join(ROOT, 'app')
+
+if 'horas_core' not in sys.modules:
+    _pkg = types.ModuleType('horas_core')
+    _pkg.__path__ = [CORE_DIR]
+    sys.modules['horas_core'] = _pkg
+
+ingest = importlib.import_module('horas_core.ingest')
+dataset_cache = importlib.import_module('horas_core.dataset_cache')
+hours_rules = importlib.import_module('horas_core.hours_rules')
@@ -5,46 +5,65 @@ from flask import (
     Blueprint, current_app, render_template,
     request, redirect, url_for, flash
 )
+from .core import ingest, dataset_cache, hours_rules
 
 bp = Blueprint('main', __name__)
 
-def _load_df(filename):
-    """Lê o Excel de A até M (sempre fresco) e formata colunas básicas."""
-    path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-    df = pd.read_excel(
-        path,
-        sheet_name='Sheet1',
-        usecols='A:M',
-        dtype=str,
-        na_filter=False,
-        engine='openpyxl'
-    )
+# Regra de erro do total diário (8h a 8,8h, ou 9h/10h com tolerância de 0,01),
+# no formato de Config.HOURS_RULES do app principal
+ERROR_RULES = {
+    'ok': [
+        {'min': 7.95, 'max': 8.80},
+        {'value': 9.00, 'tol': 0.01},
+        {'value': 10.00, 'tol': 0.01},
+    ],
+}
 
-    # Datas
-    df['DATARDO']     = pd.to_datetime(df['DATARDO'], dayfirst=True, errors='coerce')
-    df['DATARDO_STR'] = df['DATARDO'].dt.strftime('%d/%m/%Y').fillna('')
+def _load_df(filename):
+    """
+    Planilha de horas normalizada pelo núcleo do app principal (ver core.py),
+    com disciplinas de mapping.xlsx. A leitura fica em uploads/.cache por versão
+    do arquivo e é compartilhada com o app principal quando a pasta é a mesma.
+    """
+    return ingest.load_hours(current_app.config['UPLOAD_FOLDER'], filename,
+                             mapping='mapping.xlsx', raw_names=True)
+
+def _daily_totals(filename):
+    """Totais diários por colaborador/disciplina/data com ERROR, calculados uma vez por versão."""
+    folder = current_app.config['UPLOAD_FOLDER']
+
+    def build():
+        df = _load_df(filename)
+        grp = df.groupby(
+            ['OBSERVAÇÃO','DISCIPLINA','DATARDO_STR'],
+            as_index=False
+        ).agg({'HORA NORMAL':'sum','HORA EXTRA':'sum'})
+        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
+        grp['ERROR'] = hours_rules.evaluate_errors(grp['TOTAL_HH'], grp['DISCIPLINA'], ERROR_RULES)
+        return grp
 
-    # Horas numéricas
-    df['HORA NORMAL'] = pd.to_numeric(df['HORA NORMAL'], errors='coerce').fillna(0.0)
-    df['HORA EXTRA']  = pd.to_numeric(df['HORA EXTRA'], errors='coerce').fillna(0.0)
+    version = dataset_cache.folder_version(folder, [filename, 'mapping.xlsx'])
+    return dataset_cache.cached(('legacy_totals', folder, filename), version, build)
 
-    # Texto
-    for c in ['ORDEM','OPERAÇÃO','T_ATIV','OBSERVAÇÃO']:
-        if c in df.columns:
-            df[c] = df[c].fillna('').astype(str)
+def _collaborator_map(folder):
+    """OBSERVAÇÃO → DISCIPLINA de mapping.xlsx (primeira ocorrência), ou None sem o arquivo."""
+    map_path = os.path.join(folder, 'mapping.xlsx')
 
-    # Mapeamento de disciplina
-    map_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'mapping.xlsx')
-    if os.path.exists(map_path):
+    def build():
+        if not os.path.exists(map_path):
+            return None
         dm = pd.read_excel(map_path, dtype=str, na_filter=False).iloc[:, :2]
         dm.columns = ['OBSERVAÇÃO','DISCIPLINA']
         dm = dm.drop_duplicates('OBSERVAÇÃO', keep='first')
-        df = df.merge(dm, on='OBSERVAÇÃO', how='left')
-    if 'DISCIPLINA' not in df.columns:
-        df['DISCIPLINA'] = ''
-    df['DISCIPLINA'] = df['DISCIPLINA'].fillna('').astype(str)
+        return dm.set_index('OBSERVAÇÃO')['DISCIPLINA'].to_dict()
 
-    return df
+    return dataset_cache.cached(('legacy_mapping', folder), dataset_cache.file_version(map_path), build)
+
+def _justifications(folder):
+    """justificativas.csv (lida a cada chamada: é pequena e editada pela tela de atestados)."""
+    just_path = os.path.join(folder,'justificativas.csv')
+    return (pd.read_csv(just_path, dtype=str) if os.path.exists(just_path)
+            else pd.DataFrame(columns=['OBSERVAÇÃO','DISCIPLINA','DATARDO_STR','DESVIO']))
 
 @bp.route('/')
 def dashboard():
@@ -62,21 +81,11 @@ def dashboard():
     total = coll = 0
 
     if sel_file:
-        # 1) sempre lê A:M via _load_df
+        # 1) planilha normalizada (cacheada) via _load_df
         df = _load_df(sel_file)
 
-        # 2) calcula TOTAl_HH e ERROR por colaborador+disciplina+data
-        grp = df.groupby(
-            ['OBSERVAÇÃO','DISCIPLINA','DATARDO_STR'],
-            as_index=False
-        ).agg({'HORA NORMAL':'sum','HORA EXTRA':'sum'})
-        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
-        tol = 0.01
-        def is_error(v):
-            if 7.95 <= v <= 8.80: return False
-            if abs(v - 9.00) <= tol or abs(v - 10.00) <= tol: return False
-            return True
-        grp['ERROR'] = grp['TOTAL_HH'].apply(is_error)
+        # 2) TOTAL_HH e ERROR por colaborador+disciplina+data (cacheados)
+        grp = _daily_totals(sel_file)
 
         # 3) mapeia de volta em df para cada linha original
         df = df.merge(
@@ -221,22 +230,15 @@ def validation():
     pivot = []
     dates_list = []
     disciplines = []
-    just_path = os.path.join(folder,'justificativas.csv')
-    just_df   = (pd.read_csv(just_path, dtype=str) if os.path.exists(just_path)
-                 else pd.DataFrame(columns=['OBSERVAÇÃO','DISCIPLINA','DATARDO_STR','DESVIO']))
+    columns = []
+    just_df = _justifications(folder)
 
     if sel_file:
-        df = _load_df(sel_file)
-        disciplines = sorted(df['DISCIPLINA'].unique())
+        grp = _daily_totals(sel_file)
+        disciplines = sorted(grp['DISCIPLINA'].unique())
         if sel_disc!='All':
-            df = df[df['DISCIPLINA']==sel_disc]
-        dates_list = sorted(df['DATARDO_STR'].unique())
-
-        # Soma diária completa
-        grp = df.groupby(
-            ['OBSERVAÇÃO','DISCIPLINA','DATARDO_STR'], as_index=False
-        ).agg({'HORA NORMAL':'sum','HORA EXTRA':'sum'})
-        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
+            grp = grp[grp['DISCIPLINA']==sel_disc]
+        dates_list = sorted(grp['DATARDO_STR'].unique())
 
         table = grp.pivot(
             index=['OBSERVAÇÃO','DISCIPLINA'],
@@ -244,31 +246,30 @@ def validation():
             values='TOTAL_HH'
         ).reset_index()
 
+        # Justificativas por (colaborador, disciplina, data): vale a primeira
+        just = {}
+        for obs, disc, dt, dev in zip(just_df['OBSERVAÇÃO'], just_df['DISCIPLINA'],
+                                      just_df['DATARDO_STR'], just_df['DESVIO']):
+            just.setdefault((obs, disc, dt), dev)
+        cmap = {'Atestado':'AT','Ausente':'AU','SP':'SP','DEP':'DEP'}
+
         columns = ['OBSERVAÇÃO','DISCIPLINA'] + dates_list
-        for _, row in table.iterrows():
+        for row in table.to_dict('records'):
             rec = {'OBSERVAÇÃO':row['OBSERVAÇÃO'],'DISCIPLINA':row['DISCIPLINA']}
             for dt in dates_list:
                 raw = row.get(dt)
-                # 0 ou NaN → X
-                if pd.isna(raw) or raw == 0:
-                    disp = 'X'
-                else:
-                    disp = f"{raw:.2f}".replace('.', ',')
-                cls = ''
-                mask = (
-                    (just_df['OBSERVAÇÃO']==row['OBSERVAÇÃO']) &
-                    (just_df['DISCIPLINA']==row['DISCIPLINA']) &
-                    (just_df['DATARDO_STR']==dt)
-                )
-                if mask.any():
-                    dev = just_df.loc[mask,'DESVIO'].iloc[0]
-                    cmap = {'Atestado':'AT','Ausente':'AU','SP':'SP','DEP':'DEP'}
-                    smap = {'AT':'code-AT','AU':'code-AU','SP':'code-SP','DEP':'code-DEP'}
+                dev = just.get((row['OBSERVAÇÃO'], row['DISCIPLINA'], dt))
+                if dev is not None:
                     code = cmap[dev]
-                    disp = code
-                    cls  = smap[code]
-                rec[dt] = disp
-                rec[f"{dt}_class"] = cls or ('empty-cell' if disp=='X' else '')
+                    rec[dt] = code
+                    rec[f"{dt}_class"] = f'code-{code}'
+                elif pd.isna(raw) or raw == 0:
+                    # 0 ou NaN → X
+                    rec[dt] = 'X'
+                    rec[f"{dt}_class"] = 'empty-cell'
+                else:
+                    rec[dt] = f"{raw:.2f}".replace('.', ',')
+                    rec[f"{dt}_class"] = ''
             pivot.append(rec)
 
     return render_template('validation.html',
@@ -294,51 +295,31 @@ def pending():
     business_str = []
 
     if sel_file:
-        # 1) carrega dados e mapa de disciplina
-        df = _load_df(sel_file)
-        map_path = os.path.join(folder, 'mapping.xlsx')
-        if os.path.exists(map_path):
-            dm = pd.read_excel(map_path, dtype=str, na_filter=False).iloc[:, :2]
-            dm.columns = ['OBSERVAÇÃO','DISCIPLINA']
-            dm = dm.drop_duplicates('OBSERVAÇÃO', keep='first')
-            collaborator_map = dm.set_index('OBSERVAÇÃO')['DISCIPLINA'].to_dict()
-        else:
-            collaborator_map = df.set_index('OBSERVAÇÃO')['DISCIPLINA'].to_dict()
+        # 1) totais diários (cacheados) e mapa de disciplina
+        grp = _daily_totals(sel_file)
+        collaborator_map = _collaborator_map(folder)
+        if collaborator_map is None:
+            collaborator_map = _load_df(sel_file).set_index('OBSERVAÇÃO')['DISCIPLINA'].to_dict()
 
         # 2) gera lista de dias úteis entre min e max
-        df['DATARDO_DT'] = pd.to_datetime(df['DATARDO_STR'], dayfirst=True, errors='coerce')
-        start, end = df['DATARDO_DT'].min(), df['DATARDO_DT'].max()
-        business = pd.date_range(start, end, freq='B')
+        days = pd.to_datetime(grp['DATARDO_STR'], format='%d/%m/%Y', errors='coerce')
+        business = pd.date_range(days.min(), days.max(), freq='B')
         business_str = [d.strftime('%d/%m/%Y') for d in business]
 
-        # 3) totaliza HH por colaborador/data
-        grp = df.groupby(
-            ['OBSERVAÇÃO','DATARDO_STR'],
-            as_index=False
-        ).agg({'HORA NORMAL':'sum','HORA EXTRA':'sum'})
-        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
-
-        # 4) carrega justificativas
-        just_path = os.path.join(folder,'justificativas.csv')
-        just_df   = (pd.read_csv(just_path, dtype=str) if os.path.exists(just_path)
-                     else pd.DataFrame(columns=['OBSERVAÇÃO','DISCIPLINA','DATARDO_STR','DESVIO']))
+        # 3) (colaborador, data) com horas e com justificativa
+        per_day = grp.groupby(['OBSERVAÇÃO','DATARDO_STR'])['TOTAL_HH'].sum()
+        has_hh = set(per_day[per_day > 0].index)
+        just_df = _justifications(folder)
+        has_just = set(zip(just_df['OBSERVAÇÃO'], just_df['DATARDO_STR']))
 
-        # 5) itera colaborador × data útil
+        # 4) colaborador × data útil sem horas e sem justificativa
         collaborators = sorted(collaborator_map.keys())
         disciplines   = sorted(set(collaborator_map.values()))
 
         for obs in collaborators:
             disc = collaborator_map.get(obs,'')
             for dt in business_str:
-                has_hh = not grp[
-                    (grp['OBSERVAÇÃO']==obs)&(grp['DATARDO_STR']==dt)&(grp['TOTAL_HH']>0)
-                ].empty
-                has_just = not just_df[
-                    (just_df['OBSERVAÇÃO']==obs)&
-                    (just_df['DATARDO_STR']==dt)   # <-- corrigido abaixo
-                ].empty
-                # (veja nota abaixo sobre typo)
-                if not has_hh and not has_just:
+                if (obs, dt) not in has_hh and (obs, dt) not in has_just:
                     pending.append({'OBSERVAÇÃO':obs,'DISCIPLINA':disc,'DATARDO_STR':dt})
 
         # 6) aplica filtros
@@ -2,4 +2,6 @@ import os
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'chave-ultra-secreta'
-    UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
+    # Aponte para a pasta de uploads do app principal para compartilhar a
+    # leitura das planilhas (cache em <pasta>/.cache)
+    UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or os.path.join(os.getcwd(), 'uploads')
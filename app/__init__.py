@@ -1,4 +1,7 @@
 import os
+import time
+import logging
+import threading
 from flask import Flask, render_template
 from flask_login import LoginManager
 from app.config import Config
@@ -6,13 +9,26 @@ from app.config import Config
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 
+logger = logging.getLogger(__name__)
+
 def create_app():
+    t0 = time.perf_counter()
+    steps = []
+
+    def mark(name, start):
+        now = time.perf_counter()
+        steps.append(f"{name} {now - start:.3f}s")
+        return now
+
     app = Flask(__name__)
     app.config.from_object(Config)
     login_manager.init_app(app)
 
-    # 1) Configura o diretório de uploads
+    # 1) Configura o diretório de uploads e o orçamento de memória dos caches
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    from app import dataset_cache
+    dataset_cache.memory_budget = app.config['CACHE_MEMORY_BUDGET_MB'] * 2**20
+    t = mark('config', t0)
 
     # 2) Handler customizado para acessos não autorizados
     @login_manager.unauthorized_handler
@@ -22,9 +38,29 @@ def create_app():
     # 3) Registra o blueprint de autenticação
     from app.auth import bp as auth_bp
     app.register_blueprint(auth_bp)
+    t = mark('auth', t)
 
     # 4) Registra o blueprint principal
     from app.views import bp as main_bp
     app.register_blueprint(main_bp)
+    t = mark('views', t)
+
+    # 5) Comandos de linha: `flask inspect` (diagnóstico de uma pasta de planilhas)
+    #    e `flask loadtest` (teste de carga local)
+    from app.folder_inspect import inspect_command
+    from app.loadtest import loadtest_command
+    app.cli.add_command(inspect_command)
+    app.cli.add_command(loadtest_command)
+    t = mark('cli', t)
+
+    # 6) Perfil sob demanda para admins (?_profile=cpu|mem em qualquer rota)
+    from app import profiling
+    profiling.init_app(app)
+
+    # 7) Pré-aquecimento opcional dos caches em segundo plano
+    if app.config['PREWARM']:
+        from app.views import prewarm
+        threading.Thread(target=prewarm, args=(app,), name='prewarm', daemon=True).start()
 
+    logger.info(f"Aplicação criada em {time.perf_counter() - t0:.3f}s ({', '.join(steps)})")
     return app
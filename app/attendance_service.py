@@ -2,6 +2,8 @@ import os
 from datetime import datetime, date
 import pandas as pd
 
+from .business_calendar import BusinessCalendar
+
 class AttendanceService:
     def __init__(self, upload_folder):
         self.folder = upload_folder
@@ -12,16 +14,8 @@ class AttendanceService:
         self._load_atestados()
 
     def _load_calendar(self):
-        path = os.path.join(self.folder, 'calendar.xlsx')
-        if os.path.exists(path):
-            df = pd.read_excel(path, sheet_name=0, dtype={'DATA': object, 'COBRAR?': str})
-            df['DATA'] = pd.to_datetime(df['DATA'], format='%d/%m/%Y', dayfirst=True, errors='coerce')
-            self.cobrar_days = df.loc[
-                df['COBRAR?'].str.strip().str.lower() == 'sim',
-                'DATA'
-            ].dt.strftime('%d/%m/%Y').tolist()
-        else:
-            self.cobrar_days = []
+        self.calendar = BusinessCalendar.from_excel(os.path.join(self.folder, 'calendar.xlsx'))
+        self.cobrar_days = [d.item().strftime('%d/%m/%Y') for d in self.calendar.days()]
 
     def _load_efetivo(self):
         path = os.path.join(self.folder, 'Efetivo.xlsx')
@@ -0,0 +1,72 @@
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _day(value):
+    return np.datetime64(value, 'D')
+
+
+class BusinessCalendar:
+    """
+    Dias cobráveis de calendar.xlsx (COBRAR? = Sim) como um array booleano,
+    um item por dia entre o primeiro e o último dia da planilha (pode cobrir
+    vários anos). Sem calendário todos os dias são cobráveis; com calendário, dias fora do
+    intervalo da planilha não são.
+    """
+
+    def __init__(self, chargeable_days=None):
+        self.has_calendar = chargeable_days is not None
+        days = np.unique(np.asarray(list(chargeable_days) if self.has_calendar else [], dtype='datetime64[D]'))
+        if len(days):
+            self.first = days[0]
+            self.flags = np.zeros(int((days[-1] - days[0]).astype(int)) + 1, dtype=bool)
+            self.flags[(days - days[0]).astype(int)] = True
+        else:
+            self.first = np.datetime64('1970-01-01', 'D')
+            self.flags = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def from_excel(cls, path):
+        """Lê calendar.xlsx (colunas DATA e COBRAR?); sem o arquivo devolve o calendário vazio."""
+        if not os.path.exists(path):
+            logger.info("Nenhum calendar.xlsx encontrado, usando todas as datas até o dia anterior.")
+            return cls()
+        cal_df = pd.read_excel(path, sheet_name=0, dtype={'DATA': object, 'COBRAR?': str})
+        cal_df['DATA'] = pd.to_datetime(cal_df['DATA'], format='%d/%m/%Y', dayfirst=True, errors='coerce')
+        charge = cal_df['COBRAR?'].fillna('').str.strip().str.lower() == 'sim'
+        return cls(cal_df.loc[charge, 'DATA'].dropna().values.astype('datetime64[D]'))
+
+    def _offsets(self, start, end):
+        """Posições em `flags` de start..end (inclusive), podendo cair fora do array."""
+        lo = int((_day(start) - self.first).astype(int))
+        hi = int((_day(end) - self.first).astype(int))
+        return lo, hi
+
+    def mask(self, start, end):
+        """Array booleano com um item por dia de start a end (inclusive): True = cobrável."""
+        lo, hi = self._offsets(start, end)
+        n = max(0, hi - lo + 1)
+        if not self.has_calendar:
+            return np.ones(n, dtype=bool)
+        out = np.zeros(n, dtype=bool)
+        a, b = max(lo, 0), min(hi, len(self.flags) - 1)
+        if a <= b:
+            out[a - lo:b - lo + 1] = self.flags[a:b + 1]
+        return out
+
+    def is_chargeable(self, day):
+        if not self.has_calendar:
+            return True
+        k = int((_day(day) - self.first).astype(int))
+        return 0 <= k < len(self.flags) and bool(self.flags[k])
+
+    def days(self, start=None, end=None):
+        """Dias cobráveis de start a end como datetime64[D] (padrão: todo o intervalo da planilha)."""
+        start = self.first if start is None else _day(start)
+        end = self.first + (len(self.flags) - 1) if end is None else _day(end)
+        return start + np.flatnonzero(self.mask(start, end))
@@ -0,0 +1,70 @@
+import io
+
+from flask import Response
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # sem pyarrow o formato arrow fica indisponível; json e csv continuam
+    pa = None
+
+# Saídas da API de leitura (/api/<conjunto>): JSON colunar ({"columns", "data"}),
+# CSV gerado em blocos enquanto é enviado, ou Arrow IPC (stream).
+FORMATS = ('json', 'csv', 'arrow')
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MIMETYPES = {'json': 'application/json', 'csv': 'text/csv', 'arrow': ARROW_MIMETYPE}
+
+# Linhas por bloco do CSV
+CSV_CHUNK_ROWS = 5000
+
+
+class UnsupportedFormat(Exception):
+    """Formato pedido desconhecido ou sem a dependência instalada."""
+
+
+def negotiate(fmt, accept):
+    """Formato de ?format= ou, sem ele, do cabeçalho Accept (padrão json)."""
+    if not fmt:
+        best = accept.best_match(list(MIMETYPES.values()))
+        fmt = next((f for f, m in MIMETYPES.items() if m == best), 'json')
+    if fmt not in FORMATS:
+        raise UnsupportedFormat(f"Formato inválido: {fmt} (use {', '.join(FORMATS)}).")
+    if fmt == 'arrow' and pa is None:
+        raise UnsupportedFormat('Formato arrow requer o pacote pyarrow, que não está instalado.')
+    return fmt
+
+
+def select_fields(df, fields):
+    """Projeção ?fields=A,B (na ordem pedida); campo desconhecido → ValueError com os disponíveis."""
+    wanted = [f.strip() for f in (fields or '').split(',') if f.strip()]
+    if not wanted:
+        return df
+    unknown = [f for f in wanted if f not in df.columns]
+    if unknown:
+        raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}. Disponíveis: {', '.join(map(str, df.columns))}.")
+    return df[wanted]
+
+
+def _csv_chunks(df, chunk_rows):
+    yield df.iloc[:0].to_csv(index=False)
+    for i in range(0, len(df), chunk_rows):
+        yield df.iloc[i:i + chunk_rows].to_csv(index=False, header=False)
+
+
+def _arrow_bytes(df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def respond(df, fmt, name):
+    """Resposta HTTP com `df` no formato `fmt` (já validado por negotiate); `name` nomeia o arquivo baixado."""
+    if fmt == 'json':
+        return Response(df.to_json(orient='split', index=False, force_ascii=False), mimetype=MIMETYPES['json'])
+    if fmt == 'csv':
+        return Response(_csv_chunks(df, CSV_CHUNK_ROWS), mimetype=MIMETYPES['csv'],
+                        headers={'Content-Disposition': f'attachment; filename={name}.csv'})
+    return Response(_arrow_bytes(df), mimetype=ARROW_MIMETYPE,
+                    headers={'Content-Disposition': f'attachment; filename={name}.arrows'})
@@ -1,5 +1,57 @@
 import os
+import json
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'chave-ultra-secreta'
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
+
+    # Upload em lote: tamanho do bloco gravado em disco e nº de validações simultâneas
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+    UPLOAD_CHECK_WORKERS = int(os.environ.get('UPLOAD_CHECK_WORKERS', 4))
+
+    # Pré-aquecimento: ao subir, carrega em segundo plano as planilhas de horas
+    # listadas e as de referência nos caches (ver views.prewarm)
+    PREWARM = os.environ.get('PREWARM', '0').lower() in ('1', 'true', 'yes')
+    PREWARM_FILES = [f for f in os.environ.get('PREWARM_FILES', 'dados.xlsx').split(',') if f.strip()]
+
+    # Orçamento de memória dos caches (MB, 0 = sem limite). Com vários projetos
+    # (uploads/projects/<nome>), o projeto usado há mais tempo é liberado primeiro.
+    CACHE_MEMORY_BUDGET_MB = int(os.environ.get('CACHE_MEMORY_BUDGET_MB', 0))
+
+    # Agregação em blocos: com valor > 0 os totais diários são calculados lendo a
+    # planilha de horas em blocos desse nº de linhas, sem montar a planilha inteira
+    # (as linhas brutas só são carregadas pelas telas que as exibem). 0 = desligado.
+    HOURS_CHUNK_ROWS = int(os.environ.get('HOURS_CHUNK_ROWS', 0))
+
+    # Exportações em segundo plano: nº de exportações simultâneas e quantos
+    # arquivos prontos manter em <pasta de dados>/.exports (ver app/export_jobs.py)
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_CACHE_FILES = int(os.environ.get('EXPORT_CACHE_FILES', 50))
+
+    # Versões guardadas por arquivo enviado em <pasta de dados>/.versions,
+    # incluindo a ativa (0 = todas; ver app/dataset_store.py)
+    DATASET_VERSIONS_KEEP = int(os.environ.get('DATASET_VERSIONS_KEEP', 10))
+
+    # Cálculos pesados (grade de validação, pendências, exportações) rodam em
+    # processos filhos: no máximo OFFLOAD_WORKERS ao mesmo tempo (0 = na própria
+    # thread), encerrados após OFFLOAD_TIMEOUT segundos (EXPORT_TIMEOUT para
+    # exportações) ou quando o cliente desconecta (ver app/offload.py)
+    OFFLOAD_WORKERS = int(os.environ.get('OFFLOAD_WORKERS', 2))
+    OFFLOAD_TIMEOUT = int(os.environ.get('OFFLOAD_TIMEOUT', 120))
+    EXPORT_TIMEOUT = int(os.environ.get('EXPORT_TIMEOUT', 600))
+
+    # Relatórios de ?_profile=cpu|mem mantidos em <UPLOAD_FOLDER>/.profiles (ver app/profiling.py)
+    PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+
+    # Regras de horas diárias (ver app/hours_rules.py). Pode ser sobrescrito
+    # pela variável HOURS_RULES com o mesmo formato em JSON.
+    HOURS_RULES = json.loads(os.environ['HOURS_RULES']) if os.environ.get('HOURS_RULES') else {
+        'ok': [
+            {'min': 7.95, 'max': 8.80},
+            {'value': 9.00, 'tol': 0.01},
+            {'value': 10.00, 'tol': 0.01},
+        ],
+        # Sobrescritas por disciplina substituem a lista 'ok' inteira, ex.:
+        # 'disciplines': {'ANDAIME': [{'min': 7.95, 'max': 9.80}]}
+        'disciplines': {},
+    }
@@ -0,0 +1,287 @@
+import os
+import sys
+import pickle
+import hashlib
+import threading
+import logging
+import itertools
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos, só entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# chave → (versão, valor). Cada chave guarda só a versão mais recente.
+_entries = {}
+_lock = threading.Lock()
+
+# Orçamento de memória (bytes; 0 = sem limite) dividido entre namespaces
+# (a pasta de dados de cada projeto). Estourado o limite, o namespace usado há
+# mais tempo perde todos os seus caches. Definido em create_app.
+memory_budget = 0
+_sizes = {}          # (namespace, chave) → bytes estimados
+_last_used = {}      # namespace → tique do último acesso
+_ticks = itertools.count()
+_evict_hooks = []
+
+# chave → _Flight em andamento neste processo
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _before_fork():
+    _lock.acquire()
+    _flights_lock.acquire()
+
+
+def _after_fork_in_parent():
+    _flights_lock.release()
+    _lock.release()
+
+
+def _after_fork_in_child():
+    # Processo filho do offload: só existe a thread que fez o fork. Locks e
+    # cálculos em andamento de outras threads nunca terminariam aqui.
+    global _lock, _flights_lock
+    _lock = threading.Lock()
+    _flights_lock = threading.Lock()
+    _flights.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent,
+                        after_in_child=_after_fork_in_child)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def file_version(path):
+    """Versão de um arquivo em disco: (mtime_ns, tamanho), ou None se não existir."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def folder_version(folder, filenames):
+    """Versão combinada de vários arquivos de uma mesma pasta."""
+    return tuple(file_version(os.path.join(folder, name)) for name in filenames)
+
+
+def single_flight(key, fn):
+    """
+    Executa `fn()` uma única vez por `key` entre as threads do processo:
+    quem chega enquanto o cálculo está em andamento espera e recebe o mesmo
+    resultado (ou a mesma exceção) em vez de repetir o trabalho.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+    try:
+        flight.value = fn()
+        return flight.value
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+@contextmanager
+def file_lock(path):
+    """Lock exclusivo entre processos (workers do gunicorn) baseado em arquivo."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _disk_path(disk_dir, key, ext):
+    digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(disk_dir, f'{key[0]}_{digest}.{ext}')
+
+
+def _read_disk(path, version):
+    try:
+        with open(path, 'rb') as f:
+            stored_version, value = pickle.load(f)
+    except Exception:
+        return None
+    return (value,) if stored_version == version else None
+
+
+def _write_disk(path, version, value):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'wb') as f:
+            pickle.dump((version, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception:
+        logger.warning(f"Não foi possível gravar {path}", exc_info=True)
+
+
+def shared_build(key, version, builder, disk_dir):
+    """
+    Constrói o valor de (`key`, `version`) uma única vez entre threads e
+    entre processos: o primeiro worker calcula sob um lock de arquivo e grava
+    o resultado em `disk_dir`; os demais esperam o lock e leem o arquivo.
+    """
+    def build():
+        path = _disk_path(disk_dir, key, 'pkl')
+        with file_lock(_disk_path(disk_dir, key, 'lock')):
+            hit = _read_disk(path, version)
+            if hit is not None:
+                logger.info(f"Cache lido do disco: {key}")
+                return hit[0]
+            value = builder()
+            _write_disk(path, version, value)
+            return value
+    return single_flight(('disk', key, version), build)
+
+
+def estimate_size(obj, _seen=None):
+    """Tamanho aproximado em bytes de DataFrames, arrays e estruturas Python aninhadas."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    if hasattr(obj, 'memory_usage') and hasattr(obj, 'columns'):   # DataFrame
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if hasattr(obj, 'nbytes') and hasattr(obj, 'dtype'):           # ndarray / Series
+        return int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(v, _seen) for v in obj)
+    elif hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), _seen)
+    return size
+
+
+def on_evict(hook):
+    """Registra `hook(namespace)`, chamado quando um namespace é despejado da memória."""
+    _evict_hooks.append(hook)
+
+
+def touch(namespace):
+    """Marca o namespace como usado agora (ordem do LRU)."""
+    _last_used[namespace] = next(_ticks)
+
+
+def track(namespace, key, value):
+    """Registra o tamanho de um valor guardado em memória e aplica o orçamento."""
+    size = estimate_size(value)
+    with _lock:
+        _sizes[(namespace, key)] = size
+    touch(namespace)
+    _enforce_budget(namespace)
+
+
+def usage():
+    """Bytes estimados em memória por namespace."""
+    out = {}
+    with _lock:
+        for (ns, _), size in _sizes.items():
+            out[ns] = out.get(ns, 0) + size
+    return out
+
+
+def evict(namespace):
+    """Remove da memória todos os caches de um namespace (os arquivos em disco ficam)."""
+    with _lock:
+        for key in [k for k in _entries if _namespace(k) == namespace]:
+            del _entries[key]
+        for sk in [sk for sk in _sizes if sk[0] == namespace]:
+            del _sizes[sk]
+    _last_used.pop(namespace, None)
+    for hook in _evict_hooks:
+        hook(namespace)
+
+
+def _enforce_budget(current):
+    if not memory_budget:
+        return
+    while True:
+        used = usage()
+        if sum(used.values()) <= memory_budget:
+            return
+        others = [ns for ns in used if ns != current]
+        if not others:
+            return
+        victim = min(others, key=lambda ns: _last_used.get(ns, -1))
+        logger.info(f"Orçamento de memória excedido: caches de {victim} liberados ({used[victim] / 2**20:.1f} MB)")
+        evict(victim)
+
+
+def _namespace(key):
+    return key[1] if len(key) > 1 else None
+
+
+def cached(key, version, builder, disk_dir=None):
+    """
+    Devolve o valor guardado para `key` se a versão bater; caso contrário
+    executa `builder()`, guarda o resultado e o devolve.
+    Requisições simultâneas pela mesma versão esperam um único `builder()`;
+    com `disk_dir` o cálculo também é compartilhado entre processos (ver shared_build).
+    O 2º elemento de `key` é o namespace (pasta de dados do projeto) usado no
+    orçamento de memória.
+    Os valores são compartilhados entre requisições: quem os recebe não deve alterá-los.
+    """
+    with _lock:
+        hit = _entries.get(key)
+    if hit is not None and hit[0] == version:
+        touch(_namespace(key))
+        return hit[1]
+
+    def build():
+        with _lock:
+            hit = _entries.get(key)
+        if hit is not None and hit[0] == version:
+            return hit[1]
+        if disk_dir is None:
+            value = builder()
+        else:
+            value = shared_build(key, version, builder, disk_dir)
+        with _lock:
+            _entries[key] = (version, value)
+        logger.info(f"Cache recalculado: {key}")
+        track(_namespace(key), key, value)
+        return value
+    return single_flight((key, version), build)
+
+
+def invalidate(prefix=None):
+    """Remove entradas cujo primeiro elemento da chave seja `prefix` (ou todas)."""
+    with _lock:
+        if prefix is None:
+            _entries.clear()
+            _sizes.clear()
+            return
+        for key in [k for k in _entries if k[0] == prefix]:
+            del _entries[key]
+            _sizes.pop((_namespace(key), key), None)
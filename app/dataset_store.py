@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+
+from .dataset_cache import cached, file_lock, file_version
+
+logger = logging.getLogger(__name__)
+
+# Acervo de versões das planilhas enviadas, endereçado pelo SHA-256 do conteúdo:
+#   <pasta de dados>/.versions/<sha256>/<nome>   cópia imutável da planilha
+#   <pasta de dados>/.versions/<sha256>/*.pkl    leitura normalizada e índices derivados
+#   <pasta de dados>/.versions/manifest.json     versão ativa e histórico por arquivo
+# O arquivo ativo (<pasta>/<nome>) é uma cópia independente (mesmo mtime) da
+# versão guardada, que fica somente leitura: reescrever o ativo nunca altera o
+# acervo. Trocar de versão é copiar o arquivo guardado de volta e atualizar o
+# manifesto. A cópia custa O(tamanho do arquivo) em disco, não O(1): um link
+# (hard ou simbólico) seria instantâneo, mas quem grava no ativo sem trocar o
+# arquivo (cp, editor) alteraria a versão guardada. O que não se repete é a
+# leitura da planilha: os derivados gravados junto à versão voltam a valer (as
+# versões dos caches são o mtime/tamanho da cópia, que nunca muda).
+# Se o ativo for alterado por fora (cp, gravação em disco), o mtime/tamanho
+# deixa de bater e o conteúdo é conferido pelo hash.
+STORE_DIR = '.versions'
+MANIFEST = 'manifest.json'
+
+
+def store_dir(folder):
+    return os.path.join(folder, STORE_DIR)
+
+
+def version_dir(folder, digest):
+    return os.path.join(folder, STORE_DIR, digest)
+
+
+def _manifest_path(folder):
+    return os.path.join(folder, STORE_DIR, MANIFEST)
+
+
+def _read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'files': {}}
+
+
+def read_manifest(folder):
+    """Manifesto da pasta ({'files': {nome: {'active', 'versions'}}}), em memória enquanto não mudar."""
+    path = _manifest_path(folder)
+    return cached(('manifest', folder), file_version(path), lambda: _read_manifest(path))
+
+
+def _write_manifest(folder, manifest):
+    path = _manifest_path(folder)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def file_hash(folder, name):
+    """SHA-256 de <folder>/<name> (None se não existir), em memória pela versão (mtime, tamanho) do arquivo."""
+    path = os.path.join(folder, name)
+    version = file_version(path)
+    if version is None:
+        return None
+    return cached(('content_hash', folder, name), version, lambda: hash_file(path))
+
+
+def active_digest(folder, name):
+    """
+    Hash da versão ativa de `name`, ou None se o arquivo não é versionado (ou foi
+    trocado por fora do acervo, p.ex. copiado direto para a pasta).
+    """
+    entry = read_manifest(folder)['files'].get(name)
+    if not entry:
+        return None
+    version = file_version(os.path.join(folder, name))
+    if version is None:
+        return None
+    if version == file_version(os.path.join(version_dir(folder, entry['active']), name)):
+        return entry['active']
+    # mtime/tamanho diferentes da cópia guardada: só vale se o conteúdo for o mesmo
+    return entry['active'] if file_hash(folder, name) == entry['active'] else None
+
+
+def active_dir(folder, name):
+    """Pasta da versão ativa de `name` (onde ficam seus derivados), ou None se não versionado."""
+    digest = active_digest(folder, name)
+    return version_dir(folder, digest) if digest else None
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 do conteúdo de `path`, lido em blocos."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _place(src, dest, mode=0o644):
+    """Copia `src` para `dest` atomicamente (cópia temporária + os.replace), com o mesmo mtime e o modo `mode`."""
+    tmp = f"{dest}.{os.getpid()}.tmp"
+    shutil.copy2(src, tmp)
+    os.chmod(tmp, mode)
+    os.replace(tmp, dest)
+
+
+def _add_version(manifest, name, digest, size, uploaded, user):
+    entry = manifest['files'].setdefault(name, {'active': digest, 'versions': []})
+    if not any(v['hash'] == digest for v in entry['versions']):
+        entry['versions'].append({'hash': digest, 'size': size, 'uploaded': uploaded, 'by': user})
+    return entry
+
+
+def _import_active(folder, manifest, name):
+    """Arquivo ativo ainda fora do acervo (envio anterior ao versionamento): guarda-o antes de substituí-lo."""
+    active = os.path.join(folder, name)
+    if not os.path.exists(active) or active_digest(folder, name):
+        return
+    digest = hash_file(active)
+    blob = os.path.join(version_dir(folder, digest), name)
+    if not os.path.exists(blob):
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        _place(active, blob, 0o444)
+    st = os.stat(active)
+    _add_version(manifest, name, digest, st.st_size,
+                 time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(st.st_mtime)), None)
+    manifest['files'][name]['active'] = digest
+
+
+def commit(folder, name, tmp_path, digest, user=None, keep=0):
+    """
+    Guarda `tmp_path` (conteúdo com hash `digest`) como nova versão de `name`
+    e a torna ativa. Com `keep` > 0 mantém só as `keep` versões mais recentes do arquivo.
+    """
+    os.makedirs(store_dir(folder), exist_ok=True)
+    with file_lock(os.path.join(store_dir(folder), 'manifest.lock')):
+        manifest = _read_manifest(_manifest_path(folder))
+        _import_active(folder, manifest, name)
+        blob = os.path.join(version_dir(folder, digest), name)
+        if os.path.exists(blob):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, blob)
+        _add_version(manifest, name, digest, os.path.getsize(blob),
+                     time.strftime('%Y-%m-%d %H:%M:%S'), user)
+        _place(blob, os.path.join(folder, name))
+        manifest['files'][name]['active'] = digest
+        if keep:
+            _prune(folder, manifest, name, keep)
+        _write_manifest(folder, manifest)
+    logger.info(f"{name}: versão {digest[:12]} ativada")
+
+
+def activate(folder, name, digest):
+    """
+    Torna ativa uma versão já guardada de `name`: copia o arquivo guardado
+    (O(tamanho), ver comentário do módulo) sem reler a planilha.
+    """
+    with file_lock(os.path.join(store_dir(folder), 'manifest.lock')):
+        manifest = _read_manifest(_manifest_path(folder))
+        entry = manifest['files'].get(name)
+        if not entry or not any(v['hash'] == digest for v in entry['versions']):
+            raise KeyError(f"{name}: versão {digest} não encontrada")
+        _place(os.path.join(version_dir(folder, digest), name), os.path.join(folder, name))
+        entry['active'] = digest
+        _write_manifest(folder, manifest)
+    logger.info(f"{name}: versão {digest[:12]} reativada")
+
+
+def _prune(folder, manifest, name, keep):
+    entry = manifest['files'][name]
+    old = [v for v in entry['versions'] if v['hash'] != entry['active']]
+    drop = old[:max(0, len(old) - (keep - 1))]
+    if not drop:
+        return
+    entry['versions'] = [v for v in entry['versions'] if v not in drop]
+    in_use = {v['hash'] for e in manifest['files'].values() for v in e['versions']}
+    for v in drop:
+        if v['hash'] in in_use:
+            # mesmo conteúdo ainda referenciado por outro arquivo: só sai a cópia deste nome
+            try:
+                os.remove(os.path.join(version_dir(folder, v['hash']), name))
+            except OSError:
+                pass
+        else:
+            shutil.rmtree(version_dir(folder, v['hash']), ignore_errors=True)
+
+
+def history(folder):
+    """[(nome, hash ativo ou None, versões do mais recente ao mais antigo)] de todos os arquivos versionados."""
+    files = read_manifest(folder)['files']
+    return [(name, active_digest(folder, name), list(reversed(entry['versions'])))
+            for name, entry in sorted(files.items())]
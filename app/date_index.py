@@ -0,0 +1,53 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+# Dia 0 dos ordinais (mesma origem do datetime64[D] do NumPy)
+EPOCH = date(1970, 1, 1)
+
+
+def parse_day(text):
+    """'dd/mm/YYYY' ou 'YYYY-MM-DD' (input type=date) → date; None se vazio/inválido."""
+    text = (text or '').strip()
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def day_ordinal(day):
+    return (day - EPOCH).days
+
+
+class DayIndex:
+    """
+    Índice das linhas de um frame pelo dia (coluna 'dd/mm/YYYY'): ordinais
+    inteiros ordenados + a permutação que os ordena. Um intervalo [início, fim]
+    vira duas buscas binárias e uma fatia, sem comparar texto linha a linha.
+    Linhas sem data válida ficam fora de qualquer intervalo.
+    """
+
+    def __init__(self, dates):
+        parsed = pd.to_datetime(pd.Series(dates, dtype=object), format='%d/%m/%Y', errors='coerce')
+        days = parsed.values.astype('datetime64[D]')
+        valid = ~np.isnat(days)
+        ordinals = np.where(valid, days.astype(np.int64), np.iinfo(np.int64).min)
+        self.order = np.argsort(ordinals, kind='stable')
+        self.days = ordinals[self.order]
+        self._first_valid = int(len(ordinals) - valid.sum())
+        self.size = len(ordinals)
+
+    def rows(self, start=None, end=None):
+        """Posições (em ordem original) das linhas com start <= dia <= end."""
+        lo = self._first_valid if start is None else max(
+            self._first_valid, int(np.searchsorted(self.days, day_ordinal(start), 'left')))
+        hi = self.size if end is None else int(np.searchsorted(self.days, day_ordinal(end), 'right'))
+        return np.sort(self.order[lo:hi]) if lo < hi else np.empty(0, dtype=np.intp)
+
+    def mask(self, start=None, end=None):
+        out = np.zeros(self.size, dtype=bool)
+        out[self.rows(start, end)] = True
+        return out
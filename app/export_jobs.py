@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import offload
+
+logger = logging.getLogger(__name__)
+
+# Exportações prontas ficam em <pasta de dados>/.exports, uma por (tipo, versão dos dados, filtros)
+EXPORTS_DIR = '.exports'
+
+# Estado de cada job em <UPLOAD_FOLDER>/.export_jobs/<id>.json: com vários
+# workers (gunicorn) o acompanhamento e o download podem cair em outro processo
+JOBS_DIR = '.export_jobs'
+
+# Jobs encerrados ficam consultáveis por esse tempo (segundos)
+JOB_TTL = 3600
+
+# Intervalo mínimo entre gravações do progresso em disco (segundos)
+SAVE_INTERVAL = 0.5
+
+_jobs = {}
+_lock = threading.Lock()
+_executor = None
+
+
+class ExportJob:
+    """Estado de uma exportação em segundo plano (consultado por /exports/<id>)."""
+
+    # atributos gravados em disco (ver save/load)
+    FIELDS = ('id', 'kind', 'path', 'download_name', 'owner', 'users', 'project', 'status',
+              'progress', 'message', 'error', 'cached', 'created', 'finished')
+
+    def __init__(self, kind, path, download_name, owner, project, state_dir):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.path = path
+        self.download_name = download_name
+        self.owner = owner
+        self.users = [owner]
+        self.project = project
+        self.state_dir = state_dir
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = ''
+        self.error = None
+        self.cached = False
+        self.created = time.time()
+        self.finished = None
+        self._saved = 0.0
+
+    @property
+    def done(self):
+        return self.status in ('done', 'error')
+
+    def visible_to(self, user):
+        """Quem pediu a exportação (ou pediu a mesma enquanto ela rodava) e admins."""
+        return getattr(user, 'role', None) == 'admin' or user.username in self.users
+
+    def update(self, progress, message=None):
+        """Chamado pelo gerador da planilha: progresso de 0 a 1 e etapa atual."""
+        self.progress = max(0.0, min(1.0, float(progress)))
+        if message is not None:
+            self.message = message
+        if time.monotonic() - self._saved >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Grava o estado do job para os demais workers (arquivo temporário + os.replace)."""
+        path = _state_path(self.state_dir, self.id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({name: getattr(self, name) for name in self.FIELDS}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            logger.warning(f"Não foi possível gravar o estado da exportação {self.id}", exc_info=True)
+        self._saved = time.monotonic()
+
+    @classmethod
+    def load(cls, state_dir, job_id):
+        """Job gravado por outro worker, ou None."""
+        try:
+            with open(_state_path(state_dir, job_id), encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        job = cls.__new__(cls)
+        job.__dict__.update({name: state.get(name) for name in cls.FIELDS}, state_dir=state_dir, _saved=0.0)
+        return job
+
+    def as_dict(self):
+        return {
+            'id': self.id, 'kind': self.kind, 'status': self.status,
+            'progress': round(self.progress, 3), 'message': self.message,
+            'error': self.error, 'cached': self.cached,
+            'download_name': self.download_name, 'project': self.project,
+        }
+
+
+def jobs_dir(app):
+    return os.path.join(app.config['UPLOAD_FOLDER'], JOBS_DIR)
+
+
+def _state_path(state_dir, job_id):
+    return os.path.join(state_dir, f"{os.path.basename(job_id)}.json")
+
+
+def export_path(folder, kind, version, filters, ext='xlsx'):
+    """Arquivo da exportação para essa versão dos dados e esses filtros."""
+    digest = hashlib.sha1(repr((version, sorted(filters.items()))).encode('utf-8')).hexdigest()
+    return os.path.join(folder, EXPORTS_DIR, f"{kind}_{digest}.{ext}")
+
+
+def _pool(workers):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='export')
+        return _executor
+
+
+def _prune(folder, keep):
+    """Mantém só as `keep` exportações mais recentes da pasta."""
+    exports = os.path.join(folder, EXPORTS_DIR)
+    try:
+        files = [os.path.join(exports, f) for f in os.listdir(exports) if '.tmp-' not in f]
+    except FileNotFoundError:
+        return
+    files.sort(key=os.path.getmtime, reverse=True)
+    for path in files[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _forget_old(state_dir):
+    limit = time.time() - JOB_TTL
+    with _lock:
+        for job_id in [j.id for j in _jobs.values() if j.done and j.finished < limit]:
+            del _jobs[job_id]
+    # estados em disco (de qualquer worker) sem atualização há mais de JOB_TTL
+    try:
+        names = os.listdir(state_dir)
+    except FileNotFoundError:
+        return
+    for name in names:
+        path = os.path.join(state_dir, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _write_file(path, writer, progress):
+    """Executado no processo filho (ver offload.run): grava a planilha em `path`."""
+    with open(path, 'wb') as f:
+        writer(f, progress)
+
+
+def _run(app, project, job, writer):
+    tmp = f"{job.path}.tmp-{job.id}"
+    job.status = 'running'
+    job.save()
+    start = time.perf_counter()
+    try:
+        # Contexto próprio: data_folder() e os caches enxergam o projeto de quem pediu
+        with app.test_request_context(query_string={'project': project} if project else None):
+            os.makedirs(os.path.dirname(job.path), exist_ok=True)
+            # o cálculo e a gravação rodam em um processo filho, fora do GIL deste worker
+            offload.run(_write_file, tmp, writer, progress=job.update,
+                        workers=app.config['OFFLOAD_WORKERS'], timeout=app.config['EXPORT_TIMEOUT'])
+            os.replace(tmp, job.path)
+            _prune(os.path.dirname(os.path.dirname(job.path)), app.config['EXPORT_CACHE_FILES'])
+        job.progress, job.status = 1.0, 'done'
+        logger.info(f"Exportação {job.kind} pronta em {time.perf_counter() - start:.2f}s ({job.download_name})")
+    except Exception as e:
+        job.status, job.error = 'error', str(e)
+        logger.exception(f"Falha na exportação {job.kind} ({job.download_name})")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    finally:
+        job.finished = time.time()
+        job.save()
+
+
+def submit(app, project, user, kind, path, download_name, writer):
+    """
+    Agenda a exportação `writer(fileobj, progress)` gravando em `path`, pedida
+    por `user` no projeto `project`. Se o arquivo já existe o job nasce concluído;
+    se a mesma exportação já está em andamento, devolve o job existente (que
+    passa a ser visível também para `user`) em vez de gerar de novo.
+    """
+    state_dir = jobs_dir(app)
+    _forget_old(state_dir)
+    with _lock:
+        for job in _jobs.values():
+            if job.path == path and not job.done:
+                if user not in job.users:
+                    job.users.append(user)
+                    job.save()
+                return job
+        job = ExportJob(kind, path, download_name, user, project, state_dir)
+        _jobs[job.id] = job
+    if os.path.exists(path):
+        job.status, job.progress, job.cached, job.finished = 'done', 1.0, True, time.time()
+        job.save()
+        return job
+    job.save()
+    _pool(app.config['EXPORT_WORKERS']).submit(_run, app, project, job, writer)
+    return job
+
+
+def get_job(app, job_id):
+    """Job deste worker ou, se foi criado em outro, o estado gravado em disco."""
+    with _lock:
+        job = _jobs.get(job_id)
+    return job if job is not None else ExportJob.load(jobs_dir(app), job_id)
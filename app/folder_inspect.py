@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Inspeção de uma pasta de planilhas: para cada arquivo lista abas, colunas,
+tipo detectado de cada coluna, nº de linhas e tempo de leitura, em JSON.
+
+Os arquivos são lidos em paralelo (um processo por arquivo) e a detecção de
+datas usa apenas uma amostra de valores por coluna, com o formato de cada
+"forma" de texto (ex.: '99/99/9999') descoberto uma única vez.
+
+Uso:
+    python -m app.folder_inspect uploads/ --workers 4 --sample 200
+    flask --app wsgi inspect uploads/
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, date
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+DATE_FORMATS = [
+    '%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y',
+    '%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%y',
+]
+
+_NUMBER_RE = re.compile(r'^[+-]?(\d+([.,]\d*)?|[.,]\d+)([eE][+-]?\d+)?$')
+
+
+def _shape(text):
+    """Troca dígitos por '9' para agrupar valores com o mesmo formato."""
+    return re.sub(r'\d', '9', text)
+
+
+@lru_cache(maxsize=1024)
+def _formats_for_shape(shape):
+    """Formatos de data compatíveis com uma forma, testados uma única vez."""
+    probe = shape.replace('9', '1')
+    found = []
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.strptime(probe, fmt)
+            found.append(fmt)
+        except ValueError:
+            pass
+    return tuple(found)
+
+
+def _is_date_text(text):
+    for fmt in _formats_for_shape(_shape(text)):
+        try:
+            datetime.strptime(text, fmt)
+            return True
+        except ValueError:
+            continue
+    return False
+
+
+def _value_type(value):
+    if isinstance(value, (datetime, date)):
+        return 'date'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, (int, float)):
+        return 'number'
+    text = str(value).strip()
+    if not text:
+        return None
+    if _NUMBER_RE.match(text):
+        return 'number'
+    if _is_date_text(text):
+        return 'date'
+    return 'text'
+
+
+def detect_type(samples, threshold=0.9):
+    """Tipo predominante de uma amostra ('date', 'number', 'bool', 'text', 'mixed' ou 'empty')."""
+    counts = {}
+    for v in samples:
+        t = _value_type(v)
+        if t:
+            counts[t] = counts.get(t, 0) + 1
+    total = sum(counts.values())
+    if not total:
+        return 'empty'
+    kind, n = max(counts.items(), key=lambda kv: kv[1])
+    return kind if n >= total * threshold else 'mixed'
+
+
+def inspect_workbook(path, sample_size=200):
+    """Relatório de um arquivo: abas, colunas com tipo detectado e nº de linhas."""
+    from openpyxl import load_workbook
+    start = time.perf_counter()
+    report = {'file': os.path.basename(path), 'size_bytes': os.path.getsize(path), 'sheets': []}
+    try:
+        wb = load_workbook(filename=path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                rows = ws.iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    report['sheets'].append({'name': ws.title, 'rows': 0, 'columns': []})
+                    continue
+                width = len(header)
+                samples = [[] for _ in range(width)]
+                n_rows = 0
+                for row in rows:
+                    n_rows += 1
+                    if n_rows <= sample_size:
+                        for i in range(min(width, len(row))):
+                            if row[i] is not None:
+                                samples[i].append(row[i])
+                report['sheets'].append({
+                    'name': ws.title,
+                    'rows': n_rows,
+                    'columns': [
+                        {'name': '' if h is None else str(h), 'type': detect_type(samples[i])}
+                        for i, h in enumerate(header)
+                    ],
+                })
+        finally:
+            wb.close()
+    except Exception as e:
+        report['error'] = str(e)
+    report['parse_seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def list_workbooks(folder):
+    return sorted(
+        os.path.join(folder, f) for f in os.listdir(folder)
+        if f.lower().endswith(EXCEL_EXTENSIONS) and not f.startswith('~$')
+    )
+
+
+def inspect_folder(folder, workers=None, sample_size=200):
+    """Inspeciona todas as planilhas da pasta em um pool de processos."""
+    paths = list_workbooks(folder)
+    if not paths:
+        return []
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        return [inspect_workbook(p, sample_size) for p in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(inspect_workbook, paths, [sample_size] * len(paths)))
+
+
+def _run(folder, workers, sample, output):
+    if not os.path.isdir(folder):
+        print(f"Diretório não encontrado: {folder}", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    result = {
+        'folder': os.path.abspath(folder),
+        'files': inspect_folder(folder, workers, sample),
+    }
+    result['total_seconds'] = round(time.perf_counter() - start, 3)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+@click.command('inspect')
+@click.argument('folder', required=False)
+@click.option('--workers', type=int, default=None, help='Nº de processos (padrão: nº de CPUs).')
+@click.option('--sample', type=int, default=200, help='Linhas amostradas por coluna para detectar o tipo.')
+@click.option('--output', default=None, help='Arquivo JSON de saída (padrão: stdout).')
+def inspect_command(folder, workers, sample, output):
+    """Inspeciona as planilhas de FOLDER (padrão: UPLOAD_FOLDER) e imprime um relatório JSON."""
+    from flask import current_app
+    folder = folder or current_app.config['UPLOAD_FOLDER']
+    sys.exit(_run(folder, workers, sample, output))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('folder', nargs='?', default=os.path.join(os.getcwd(), 'uploads'),
+                        help='Pasta com as planilhas (padrão: ./uploads)')
+    parser.add_argument('--workers', type=int, default=None, help='Nº de processos (padrão: nº de CPUs)')
+    parser.add_argument('--sample', type=int, default=200, help='Linhas amostradas por coluna')
+    parser.add_argument('--output', default=None, help='Arquivo JSON de saída (padrão: stdout)')
+    args = parser.parse_args(argv)
+    return _run(args.folder, args.workers, args.sample, args.output)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+# Formato das regras (ver Config.HOURS_RULES): um total diário está OK
+# se cair em qualquer uma das regras da lista.
+#   {'min': a, 'max': b}        → a <= total <= b
+#   {'value': v, 'tol': t}      → |total - v| <= t
+
+
+def _ok_mask(totals, rules):
+    """Avalia uma lista de regras sobre um array de totais (vetorizado)."""
+    ok = np.zeros(len(totals), dtype=bool)
+    for rule in rules:
+        if 'value' in rule:
+            ok |= np.abs(totals - float(rule['value'])) <= float(rule.get('tol', 0.0))
+        else:
+            lo = float(rule.get('min', -np.inf))
+            hi = float(rule.get('max', np.inf))
+            ok |= (totals >= lo) & (totals <= hi)
+    return ok
+
+
+def evaluate_errors(totals: pd.Series, disciplines: pd.Series, rules) -> np.ndarray:
+    """
+    Retorna um array booleano (True = ERRO) para cada total diário.
+    Disciplinas com sobrescrita usam suas próprias regras; as demais, a lista 'ok'.
+    """
+    values = pd.to_numeric(totals, errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    ok = _ok_mask(values, rules.get('ok', []))
+
+    overrides = rules.get('disciplines') or {}
+    if overrides:
+        disc = disciplines.to_numpy()
+        for name, disc_rules in overrides.items():
+            sel = disc == name
+            if sel.any():
+                ok[sel] = _ok_mask(values[sel], disc_rules)
+    return ~ok
+
+
+def rules_fingerprint(rules):
+    """Representação estável das regras, usada na chave de cache."""
+    disc = rules.get('disciplines') or {}
+    return repr((rules.get('ok', []), sorted(disc.items())))
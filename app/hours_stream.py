@@ -0,0 +1,40 @@
+import pandas as pd
+
+KEYS = ['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR']
+SUMS = ['HORA NORMAL', 'HORA EXTRA']
+
+
+class DailyTotalsAccumulator:
+    """
+    Soma horas e conta registros por colaborador/disciplina/dia bloco a bloco.
+    Cada bloco é agregado e dobrado no acumulado, então a memória depende do
+    nº de colaborador-dias e não do nº de linhas da planilha.
+    """
+
+    def __init__(self):
+        self._acc = None
+        self.rows = 0
+        self.chunks = 0
+
+    def add(self, chunk):
+        if chunk.empty:
+            return
+        for col in SUMS:
+            if col not in chunk.columns:
+                chunk = chunk.assign(**{col: 0.0})
+        part = chunk.groupby(KEYS, sort=False).agg(**{
+            'HORA NORMAL': ('HORA NORMAL', 'sum'),
+            'HORA EXTRA': ('HORA EXTRA', 'sum'),
+            'REGISTROS': ('HORA NORMAL', 'size'),
+        })
+        self._acc = part if self._acc is None else self._acc.add(part, fill_value=0)
+        self.rows += len(chunk)
+        self.chunks += 1
+
+    def result(self):
+        """Totais no mesmo formato do groupby de _daily_totals (ordenados pelas chaves)."""
+        if self._acc is None:
+            return pd.DataFrame(columns=KEYS + SUMS + ['REGISTROS'])
+        out = self._acc.sort_index().reset_index()
+        out['REGISTROS'] = out['REGISTROS'].astype('int64')
+        return out
@@ -0,0 +1,238 @@
+import os
+import logging
+
+from . import dataset_store
+from .dataset_cache import shared_build, folder_version, file_version
+from .lazy import LazyModule
+
+pd = LazyModule('pandas')
+openpyxl = LazyModule('openpyxl')
+
+logger = logging.getLogger(__name__)
+
+# Núcleo de leitura das planilhas de horas, sem dependência de requisição:
+# usado pelo app principal (views) e pelo app legado em Validação/. A leitura
+# normalizada fica em <pasta>/.cache por versão do arquivo, então os dois apps
+# apontando para a mesma pasta fazem uma única leitura da planilha.
+CACHE_DIR = '.cache'
+
+# Planilha de onde vem o mapa OBSERVAÇÃO → DISCIPLINA (colunas A e B)
+DEFAULT_MAPPING = 'Efetivo.xlsx'
+
+
+class HoursReadError(Exception):
+    """A planilha de horas não pôde ser lida; quem constrói caches levanta em vez de guardar a falha."""
+
+    def __init__(self, filename):
+        super().__init__(filename)
+        self.filename = filename
+
+    def __str__(self):
+        return f"Erro ao abrir o arquivo {self.filename}."
+
+
+def project_header(header, columns):
+    """
+    Índices e nomes das colunas do cabeçalho necessárias para produzir `columns`.
+    DATARDO_STR vem de DATARDO; sem cabeçalho 'OBSERVAÇÃO' usa-se a primeira coluna.
+    A comparação ignora espaços e maiúsculas; o nome devolvido é o canônico pedido.
+    """
+    wanted = {c.strip().upper(): c for c in columns}
+    if 'DATARDO_STR' in wanted:
+        wanted.setdefault('DATARDO', 'DATARDO')
+    norm = ['' if h is None else str(h).strip().upper() for h in header]
+    idx, names = [], []
+    for i, h in enumerate(norm):
+        if h in wanted:
+            idx.append(i)
+            names.append(wanted[h])
+    if 'OBSERVAÇÃO' in wanted and 'OBSERVAÇÃO' not in norm and header and 0 not in idx:
+        idx.insert(0, 0)
+        names.insert(0, header[0])
+    return idx, names
+
+
+def load_hours(folder, filename, columns=None, mapping=DEFAULT_MAPPING, raw_names=False, digest=None):
+    """
+    Planilha de horas normalizada e com DISCIPLINA mapeada por `mapping`
+    (ver discipline_map para `raw_names`).
+    Em duas etapas cacheadas em disco: a leitura (só depende do arquivo de
+    horas) e o mapeamento de disciplinas; trocar o mapa não relê a planilha.
+    Construções simultâneas são feitas uma única vez entre threads e processos.
+    Arquivos versionados (ver dataset_store) guardam as duas etapas na pasta da
+    versão: voltar a uma versão anterior reaproveita a leitura já feita.
+    `digest` lê uma versão guardada no acervo em vez da ativa.
+    """
+    if digest is None:
+        digest = dataset_store.active_digest(folder, filename)
+    source = dataset_store.version_dir(folder, digest) if digest else folder
+    cache_dir = source if digest else os.path.join(folder, CACHE_DIR)
+    cols = tuple(columns) if columns is not None else None
+    version = folder_version(source, [filename])
+
+    def build():
+        raw = shared_build(('hours_raw', folder, filename, cols), version,
+                           lambda: read_hours(source, filename, columns), cache_dir)
+        if raw.empty:
+            return raw
+        return map_disciplines(raw, discipline_map(folder, mapping, raw_names), columns)
+
+    return shared_build(('load_df', folder, filename, cols, mapping, raw_names),
+                        version + (file_version(os.path.join(folder, mapping)),), build, cache_dir)
+
+
+def read_hours(folder, filename, columns=None):
+    """
+    Lê todas as abas do Excel em um DataFrame e formata colunas essenciais
+    (ver normalize), sem mapear disciplinas. Com `columns`, só essas colunas são
+    montadas (as demais são descartadas na leitura) e os passos de data/limpeza
+    tocam apenas nelas.
+    """
+    path = os.path.join(folder, filename)
+    wb = openpyxl.load_workbook(filename=path, read_only=True, data_only=True)
+
+    # 1) junta todas as abas
+    sheets = []
+    for ws in wb.worksheets:
+        vals = ws.values
+        try:
+            header = next(vals)
+        except StopIteration:
+            continue
+        if columns is None:
+            df_sheet = pd.DataFrame(vals, columns=header, dtype=str)
+        else:
+            idx, names = project_header(header, columns)
+            rows = ([r[i] if i < len(r) else None for i in idx] for r in vals)
+            df_sheet = pd.DataFrame(rows, columns=names, dtype=str)
+        sheets.append(df_sheet)
+    wb.close()
+    df = pd.concat(sheets, ignore_index=True) if sheets else pd.DataFrame()
+    if df.empty:
+        return df
+
+    df = normalize(df)
+    logger.info(f"Arquivo {filename}: {len(df)} linhas carregadas")
+    return df
+
+
+def read_chunks(folder, filename, columns, chunk_rows, mapping=DEFAULT_MAPPING):
+    """
+    Como load_hours, mas lendo direto da planilha e entregando blocos de até
+    `chunk_rows` linhas já normalizados, sem nunca montar a planilha inteira em memória.
+    """
+    path = os.path.join(folder, filename)
+    disc_map = discipline_map(folder, mapping)
+    wb = openpyxl.load_workbook(filename=path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            vals = ws.values
+            try:
+                header = next(vals)
+            except StopIteration:
+                continue
+            idx, names = project_header(header, columns)
+            block = []
+            for r in vals:
+                block.append([r[i] if i < len(r) else None for i in idx])
+                if len(block) == chunk_rows:
+                    yield _chunk(block, names, disc_map, columns)
+                    block = []
+            if block:
+                yield _chunk(block, names, disc_map, columns)
+    finally:
+        wb.close()
+
+
+def _chunk(block, names, disc_map, columns):
+    df = normalize(pd.DataFrame(block, columns=names, dtype=str))
+    return map_disciplines(df, disc_map, columns)
+
+
+def discipline_map(folder, mapping=DEFAULT_MAPPING, raw_names=False):
+    """
+    Mapa OBSERVAÇÃO → DISCIPLINA da primeira aba de `mapping` (colunas A e B), ou None.
+    Com `raw_names` os nomes ficam como estão na planilha (sem strip, vazios como ''),
+    como o app de Validação/ sempre leu o mapping.xlsx.
+    """
+    map_path = os.path.join(folder, mapping)
+    if not os.path.exists(map_path):
+        return None
+    try:
+        dm = pd.read_excel(map_path, usecols=[0, 1], dtype=str, na_filter=not raw_names)
+        dm.columns = ['OBSERVAÇÃO', 'DISCIPLINA']
+        if not raw_names:
+            dm['OBSERVAÇÃO'] = dm['OBSERVAÇÃO'].str.strip()
+        return dm.drop_duplicates('OBSERVAÇÃO')
+    except Exception:
+        logger.warning(f"Falha no mapeamento de disciplinas via {mapping}", exc_info=True)
+        return None
+
+
+def normalize(df):
+    """
+    Formata as colunas essenciais de um bloco de linhas lidas da planilha.
+    Garante que a primeira coluna vire 'OBSERVAÇÃO' se o cabeçalho original não bater.
+    Também padroniza todas as colunas de texto para datetime no padrão MM/DD/YYYY.
+    """
+    # 2) se não houver coluna 'OBSERVAÇÃO', força a primeira coluna
+    if 'OBSERVAÇÃO' not in df.columns:
+        first = df.columns[0]
+        df = df.rename(columns={first: 'OBSERVAÇÃO'})
+
+    # 3) Normaliza TODAS as colunas de texto para datetime (MM/DD/YYYY)
+    for col in df.columns:
+        if df[col].dtype == object:
+            # 1ª tentativa: formato europeu (dia primeiro)
+            parsed = pd.to_datetime(
+                df[col],
+                dayfirst=True,
+                errors='coerce'
+            )
+            # 2ª tentativa: formato americano MM/DD/YYYY
+            mask = parsed.isna() & df[col].notna()
+            if mask.any():
+                us_dates = pd.to_datetime(
+                    df.loc[mask, col],
+                    format='%m/%d/%Y',
+                    errors='coerce'
+                )
+                parsed.loc[mask] = us_dates
+            # aceita coluna como data se ao menos 10% convertido
+            if parsed.notna().sum() >= len(df) * 0.1:
+                df[col] = parsed
+
+    # 4) consolida 'DATARDO' → 'DATARDO_STR'
+    if 'DATARDO' in df.columns and pd.api.types.is_datetime64_any_dtype(df['DATARDO']):
+        df['DATARDO_STR'] = df['DATARDO'].dt.strftime('%d/%m/%Y').fillna('')
+    elif 'DATARDO_STR' not in df.columns:
+        df['DATARDO_STR'] = ''
+
+    # 5) horas numéricas
+    for col in ['HORA NORMAL', 'HORA EXTRA']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+
+    # 6) limpa texto
+    for col in ['OBSERVAÇÃO', 'ORDEM', 'OPERAÇÃO', 'T_ATIV']:
+        if col in df.columns:
+            df[col] = df[col].fillna('').astype(str)
+    return df
+
+
+def map_disciplines(df, disc_map, columns=None):
+    """Aplica o mapa de disciplinas (ver discipline_map) e a projeção final de colunas."""
+    # 7) mapeamento de DISCIPLINA
+    if disc_map is not None:
+        df = df.merge(disc_map, on='OBSERVAÇÃO', how='left')
+    else:
+        df = df.copy()
+
+    # 8) garante coluna DISCIPLINA
+    if 'DISCIPLINA' not in df.columns:
+        df['DISCIPLINA'] = ''
+    df['DISCIPLINA'] = df['DISCIPLINA'].fillna('').astype(str)
+
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
@@ -0,0 +1,21 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Substituto de um módulo que só é importado no primeiro acesso a um atributo.
+    Usado para pandas/openpyxl nas rotas: create_app e /auth/login não pagam a
+    importação, que acontece na primeira rota que realmente lê planilhas.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Teste de carga local: gera planilhas sintéticas, sobe a aplicação em uma
+thread (ou usa um servidor já rodando com --url), faz login em /auth/login
+e repete uma mistura de rotas (dashboard, validação, pendentes, POST de
+atestado e exportações) com vários usuários simultâneos.
+Ao final mostra, por rota: requisições, vazão, latência p50/p95/p99 e erros.
+Rotas que gravam dados (POST de atestado) só entram contra o servidor local
+com dados sintéticos; com --url é preciso pedir --allow-writes.
+
+Uso:
+    python -m app.loadtest --users 8 --duration 30
+    python -m app.loadtest --url http://127.0.0.1:8000 --username admin --password admin123
+    flask --app wsgi loadtest --people 500
+"""
+import os
+import sys
+import json
+import math
+import logging
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, datetime, timedelta
+
+import click
+
+DISCIPLINES = ['ACESSO', 'ALPINISMO', 'ANDAIME', 'CALDEIRARIA', 'ELETRICA', 'ISOLAMENTO', 'PINTURA', 'SOLDA']
+FIRST_NAMES = ['ANA', 'BRUNO', 'CARLOS', 'DANIEL', 'EDUARDO', 'FABIO', 'GABRIEL', 'HELENA', 'IGOR',
+               'JOAO', 'KLEBER', 'LUCAS', 'MARIA', 'NELSON', 'OTAVIO', 'PAULO', 'RAFAEL', 'SERGIO']
+LAST_NAMES = ['ALMEIDA', 'BARBOSA', 'COSTA', 'DIAS', 'FERREIRA', 'GOMES', 'LIMA', 'MORAES',
+              'NASCIMENTO', 'OLIVEIRA', 'PEREIRA', 'RAMOS', 'SANTOS', 'SILVA', 'SOUZA']
+HOURS_COLUMNS = ['ORDEM', 'OPERAÇÃO', 'T_ATIV', 'DATARDO', 'PROGRAMADO', 'H_INICIO', 'H_FIM',
+                 'STATUS DECLARADO', 'OBSERVAÇÃO', 'ILHA', 'CONFIRMAÇÃO', 'HORA NORMAL', 'HORA EXTRA']
+
+LOADTEST_USER = {'id': 1, 'username': 'loadtest', 'password': 'loadtest', 'role': 'admin'}
+
+# (rota, peso na mistura, método); métodos diferentes de GET gravam dados
+ROUTE_MIX = [
+    ('/', 3, 'GET'),
+    ('/validation?file=dados.xlsx', 2, 'GET'),
+    ('/validation/data?file=dados.xlsx', 2, 'GET'),
+    ('/pending?file=dados.xlsx', 2, 'GET'),
+    ('/atestado?file=dados.xlsx', 1, 'POST'),
+    ('/export_pendentes?file=dados.xlsx', 1, 'GET'),
+    ('/export_validation?file=dados.xlsx', 1, 'GET'),
+    ('/export_dashboard?file=dados.xlsx', 1, 'GET'),
+]
+
+
+# --- Planilhas sintéticas --------------------------------------------------
+
+def _write_xlsx(path, sheets):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for title, rows in sheets:
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    wb.save(path)
+
+
+def _people(n, rnd):
+    names = set()
+    while len(names) < n:
+        names.add(f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {rnd.choice(LAST_NAMES)} {len(names):04d}")
+    return [(name, DISCIPLINES[i % len(DISCIPLINES)]) for i, name in enumerate(sorted(names))]
+
+
+def seed_workbooks(folder, people=300, month=None, seed=42):
+    """
+    Grava em `folder` um conjunto completo de planilhas sintéticas no formato
+    esperado pela aplicação (dados.xlsx, Efetivo.xlsx, ferias_inss.xlsx,
+    calendar.xlsx, Justificativas.xlsx, atestado_falta.xlsx) e um users.json.
+    Retorna a lista de (nome, disciplina) gerada.
+    """
+    rnd = random.Random(seed)
+    if month is None:
+        month = (date.today().replace(day=1) - timedelta(days=1)).replace(day=1)
+    days = []
+    d = month
+    while d.month == month.month:
+        days.append(d)
+        d += timedelta(days=1)
+    workdays = [d for d in days if d.weekday() < 5]
+    staff = _people(people, rnd)
+    os.makedirs(folder, exist_ok=True)
+
+    hours_rows = [HOURS_COLUMNS]
+    order = 100000
+    for name, disc in staff:
+        for d in workdays:
+            if rnd.random() < 0.08:          # dia sem apontamento → pendente
+                continue
+            total = rnd.choice([8.15, 8.15, 8.15, 9.0, 10.0, 7.5, 11.0])
+            parts = rnd.randint(1, 3)
+            for k in range(parts):
+                order += 1
+                normal = round(min(total, 8.8) / parts, 2)
+                extra = round(max(total - 8.8, 0) / parts, 2)
+                hours_rows.append([
+                    str(order), f"{10 * (k + 1):04d}", 'MANUT', datetime(d.year, d.month, d.day),
+                    'SIM', '07:00', '17:00', 'CONCLUIDO', name, f'ILHA {rnd.randint(1, 9)}',
+                    'OK', normal, extra,
+                ])
+    _write_xlsx(os.path.join(folder, 'dados.xlsx'), [('Sheet1', hours_rows)])
+
+    _write_xlsx(os.path.join(folder, 'Efetivo.xlsx'), [
+        ('Planilha1', [['COLABORADOR', 'DISCIPLINA', 'TIME (MOD)']] +
+                      [[n, disc, 'MOD'] for n, disc in staff]),
+        ('Planilha2', [['COLABORADOR', 'DISCIPLINA', 'DATA']] +
+                      [[n, disc, datetime(month.year, month.month, 10)] for n, disc in staff[:5]]),
+        ('Planilha3', [['COLABORADOR', 'DISCIPLINA', 'DATA']] +
+                      [[n, disc, datetime(month.year, month.month, 20)] for n, disc in staff[5:10]]),
+    ])
+
+    vac = staff[10:20]
+    _write_xlsx(os.path.join(folder, 'ferias_inss.xlsx'), [
+        ('Férias', [['NOME', 'DISCIPLINA', 'Férias - Início', 'Férias - Término']] +
+                   [[n, disc, datetime(month.year, month.month, 5), datetime(month.year, month.month, 15)]
+                    for n, disc in vac]),
+        ('INSS', [['NOME', 'DISCIPLINA', 'Início', 'Término']] +
+                 [[n, disc, datetime(month.year, month.month, 1), datetime(month.year, month.month, 28)]
+                  for n, disc in staff[20:25]]),
+    ])
+
+    _write_xlsx(os.path.join(folder, 'calendar.xlsx'), [
+        ('Calendário', [['DATA', 'COBRAR?']] +
+                       [[datetime(d.year, d.month, d.day), 'Sim' if d.weekday() < 5 else 'Não'] for d in days]),
+    ])
+
+    just = [[n, disc, datetime(d.year, d.month, d.day), 'DEP', rnd.choice(['D', 'AT', 'AU'])]
+            for n, disc in rnd.sample(staff, min(30, len(staff))) for d in rnd.sample(workdays, 2)]
+    header = ['OBSERVAÇÃO', 'DISCIPLINA', 'DATA', 'FRENTE DE TRABALHO', 'CODIGO']
+    _write_xlsx(os.path.join(folder, 'Justificativas.xlsx'), [('Justificativas', [header] + just)])
+    # atestado_falta.xlsx no formato gravado pela rota /atestado
+    atestados = [[n, disc, dt.strftime('%d/%m/%Y'), 'Atestado', frente] for n, disc, dt, frente, _ in just[:10]]
+    _write_xlsx(os.path.join(folder, 'atestado_falta.xlsx'), [
+        ('Atestados', [['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'DESVIO', 'FRENTE DE TRABALHO']] + atestados),
+    ])
+
+    with open(os.path.join(folder, 'users.json'), 'w', encoding='utf-8') as f:
+        json.dump([LOADTEST_USER], f, ensure_ascii=False, indent=2)
+    return staff
+
+
+# --- Servidor local ----------------------------------------------------------
+
+def start_server(folder, port=0):
+    """Sobe a aplicação (servidor threaded do werkzeug) em uma thread; retorna (url, server)."""
+    from werkzeug.serving import make_server
+    from app import create_app
+    app = create_app()
+    app.config['UPLOAD_FOLDER'] = folder
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)   # sem log por requisição
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='loadtest-server', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+# --- Cliente -----------------------------------------------------------------
+
+class _Client:
+    """Sessão HTTP com cookies (um por usuário virtual)."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+
+    def request(self, method, path, form=None):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                resp.read()
+                return resp.status, resp.geturl()
+        except urllib.error.HTTPError as e:
+            return e.code, path
+
+    def login(self, username, password):
+        status, final_url = self.request('POST', '/auth/login', {'username': username, 'password': password})
+        return status < 400 and '/auth/login' not in final_url
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def run_load(base_url, username, password, users=4, duration=20.0, max_requests=None,
+             staff=None, warmup=True, timeout=120.0, seed=1, writes=False):
+    """
+    Executa a mistura de rotas com `users` usuários simultâneos por `duration`
+    segundos (ou até `max_requests` no total) e devolve o relatório por rota.
+    Sem `writes` só as rotas GET da mistura são usadas.
+    """
+    staff = staff or [('COLABORADOR', 'ACESSO')]
+    mix = [entry for entry in ROUTE_MIX if writes or entry[2] == 'GET']
+    routes = [r for r, _, _ in mix]
+    weights = [w for _, w, _ in mix]
+    methods = {r: m for r, _, m in mix}
+    samples = {r: [] for r in routes}
+    errors = {r: 0 for r in routes}
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration
+
+    def atestado_form(rnd):
+        name, disc = rnd.choice(staff)
+        return {'discipline': disc, 'collaborator': name,
+                'date': (date.today() - timedelta(days=rnd.randint(20, 40))).strftime('%d/%m/%Y'),
+                'deviation': rnd.choice(['Atestado', 'Ausente', 'SP', 'DEP'])}
+
+    def call(client, route, rnd):
+        form = atestado_form(rnd) if methods[route] == 'POST' else None
+        start = time.perf_counter()
+        try:
+            status, _ = client.request(methods[route], route, form)
+            ok = status < 400
+        except Exception:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    cold = {}
+    if warmup:
+        client = _Client(base_url, timeout)
+        if not client.login(username, password):
+            raise RuntimeError(f"Falha no login de {username} em {base_url}")
+        for route in routes:
+            ok, elapsed = call(client, route, random.Random(seed))
+            cold[route] = round(elapsed, 3)
+
+    def worker(n):
+        rnd = random.Random(seed + n)
+        client = _Client(base_url, timeout)
+        if not client.login(username, password):
+            with lock:
+                errors['/'] += 1
+            return
+        while time.perf_counter() < deadline:
+            with lock:
+                if max_requests is not None and issued[0] >= max_requests:
+                    return
+                issued[0] += 1
+            route = rnd.choices(routes, weights)[0]
+            ok, elapsed = call(client, route, rnd)
+            with lock:
+                samples[route].append(elapsed)
+                if not ok:
+                    errors[route] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    report = {'base_url': base_url, 'users': users, 'seconds': round(wall, 2), 'writes': writes, 'routes': []}
+    total = 0
+    for route in routes:
+        lat = sorted(samples[route])
+        total += len(lat)
+        report['routes'].append({
+            'route': route,
+            'method': methods[route],
+            'requests': len(lat),
+            'errors': errors[route],
+            'error_rate': round(errors[route] / len(lat), 4) if lat else 0.0,
+            'rps': round(len(lat) / wall, 2) if wall else 0.0,
+            'cold_s': cold.get(route),
+            'p50_ms': round(_percentile(lat, 50) * 1000, 1),
+            'p95_ms': round(_percentile(lat, 95) * 1000, 1),
+            'p99_ms': round(_percentile(lat, 99) * 1000, 1),
+            'max_ms': round(lat[-1] * 1000, 1) if lat else 0.0,
+        })
+    report['requests'] = total
+    report['rps'] = round(total / wall, 2) if wall else 0.0
+    return report
+
+
+def format_report(report):
+    lines = [
+        f"{report['requests']} requisições em {report['seconds']}s com {report['users']} usuário(s) "
+        f"→ {report['rps']} req/s ({report['base_url']})",
+        f"{'rota':<42}{'req':>6}{'req/s':>8}{'erros':>7}{'frio s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}",
+    ]
+    for r in report['routes']:
+        cold = '' if r['cold_s'] is None else f"{r['cold_s']:.2f}"
+        lines.append(
+            f"{(r['method'] + ' ' + r['route'])[:41]:<42}{r['requests']:>6}{r['rps']:>8}"
+            f"{r['errors']:>7}{cold:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+        )
+    return '\n'.join(lines)
+
+
+def _run(url, folder, people, users, duration, max_requests, username, password, output, keep,
+         allow_writes=False):
+    staff = None
+    server = None
+    tmp = None
+    # servidor informado em --url pode ter dados reais: gravações só se pedidas
+    writes = allow_writes or url is None
+    if url is None:
+        tmp = folder or tempfile.mkdtemp(prefix='loadtest_')
+        print(f"Gerando planilhas sintéticas em {tmp} ({people} colaboradores)...", file=sys.stderr)
+        staff = seed_workbooks(tmp, people)
+        url, server = start_server(tmp)
+        username, password = LOADTEST_USER['username'], LOADTEST_USER['password']
+    try:
+        report = run_load(url, username, password, users, duration, max_requests, staff, writes=writes)
+    finally:
+        if server is not None:
+            server.shutdown()
+        if tmp and not folder and not keep:
+            shutil.rmtree(tmp, ignore_errors=True)
+    print(format_report(report))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if all(r['errors'] == 0 for r in report['routes']) else 1
+
+
+@click.command('loadtest')
+@click.option('--url', default=None, help='Servidor já rodando (padrão: sobe um local com dados sintéticos).')
+@click.option('--folder', default=None, help='Pasta para as planilhas sintéticas (padrão: temporária).')
+@click.option('--people', type=int, default=300, help='Colaboradores nas planilhas sintéticas.')
+@click.option('--users', type=int, default=4, help='Usuários simultâneos.')
+@click.option('--duration', type=float, default=20.0, help='Duração em segundos.')
+@click.option('--requests', 'max_requests', type=int, default=None, help='Limite total de requisições.')
+@click.option('--username', default=LOADTEST_USER['username'])
+@click.option('--password', default=LOADTEST_USER['password'])
+@click.option('--output', default=None, help='Grava o relatório em JSON.')
+@click.option('--keep', is_flag=True, help='Mantém a pasta temporária com as planilhas.')
+@click.option('--allow-writes', is_flag=True, help='Com --url, inclui rotas que gravam dados (POST de atestado).')
+def loadtest_command(url, folder, people, users, duration, max_requests, username, password, output, keep,
+                     allow_writes):
+    """Teste de carga local com relatório de vazão, latências e erros por rota."""
+    sys.exit(_run(url, folder, people, users, duration, max_requests, username, password, output, keep,
+                  allow_writes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=None, help='Servidor já rodando (padrão: sobe um local com dados sintéticos)')
+    parser.add_argument('--folder', default=None, help='Pasta para as planilhas sintéticas (padrão: temporária)')
+    parser.add_argument('--people', type=int, default=300, help='Colaboradores nas planilhas sintéticas')
+    parser.add_argument('--users', type=int, default=4, help='Usuários simultâneos')
+    parser.add_argument('--duration', type=float, default=20.0, help='Duração em segundos')
+    parser.add_argument('--requests', dest='max_requests', type=int, default=None, help='Limite total de requisições')
+    parser.add_argument('--username', default=LOADTEST_USER['username'])
+    parser.add_argument('--password', default=LOADTEST_USER['password'])
+    parser.add_argument('--output', default=None, help='Grava o relatório em JSON')
+    parser.add_argument('--keep', action='store_true', help='Mantém a pasta temporária com as planilhas')
+    parser.add_argument('--allow-writes', action='store_true',
+                        help='Com --url, inclui rotas que gravam dados (POST de atestado)')
+    args = parser.parse_args(argv)
+    return _run(args.url, args.folder, args.people, args.users, args.duration, args.max_requests,
+                args.username, args.password, args.output, args.keep, args.allow_writes)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
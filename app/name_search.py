@@ -0,0 +1,75 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+def fold(text):
+    """Forma de busca: sem acentos, maiúscula e com espaços simples ('João  Conceição' → 'JOAO CONCEICAO')."""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return ' '.join(text.upper().split())
+
+
+def _trigrams(text):
+    return {text[k:k + 3] for k in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    Índice de trigramas sem acento sobre os nomes distintos de uma coluna.
+    Cada linha da coluna vira um código (posição do nome em `names`), então a
+    busca devolve códigos e o filtro das linhas é um `isin` sobre inteiros.
+    """
+
+    def __init__(self, names):
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object), sort=True)
+        self.row_codes = codes.astype(np.int32)
+        self.names = [str(n) for n in uniques]
+        self.folded = [fold(n) for n in self.names]
+        postings = {}
+        for code, text in enumerate(self.folded):
+            for gram in _trigrams(text):
+                postings.setdefault(gram, []).append(code)
+        self._postings = {g: np.asarray(c, dtype=np.int32) for g, c in postings.items()}
+
+    def search(self, text):
+        """Códigos dos nomes que contêm `text` (sem diferenciar acentos e maiúsculas)."""
+        query = fold(text)
+        if not query:
+            return np.arange(len(self.names), dtype=np.int32)
+        if len(query) < 3:
+            candidates = range(len(self.names))
+        else:
+            lists = []
+            for gram in _trigrams(query):
+                hit = self._postings.get(gram)
+                if hit is None:
+                    return np.empty(0, dtype=np.int32)
+                lists.append(hit)
+            lists.sort(key=len)
+            candidates = lists[0]
+            for other in lists[1:]:
+                candidates = np.intersect1d(candidates, other, assume_unique=True)
+        # trigramas comuns não garantem a substring inteira: confirma
+        return np.asarray([c for c in candidates if query in self.folded[c]], dtype=np.int32)
+
+    def mask(self, text):
+        """Máscara booleana das linhas cujo nome casa com `text`."""
+        return np.isin(self.row_codes, self.search(text))
+
+    def suggest(self, text, limit=10):
+        """Nomes para o autocompletar: início do nome, depois início de palavra, depois o resto."""
+        query = fold(text)
+        codes = self.search(text)
+
+        def rank(code):
+            name = self.folded[code]
+            if name.startswith(query):
+                return 0
+            if (' ' + query) in name:
+                return 1
+            return 2
+
+        ordered = sorted(codes.tolist(), key=lambda c: (rank(c), self.folded[c]))
+        return [self.names[c] for c in ordered[:limit]]
@@ -0,0 +1,159 @@
+import os
+import time
+import select
+import socket
+import logging
+import threading
+import multiprocessing as mp
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Processos filhos são criados por fork: herdam o contexto da requisição e
+# os caches já carregados, e a função não precisa ser importável/pickle.
+# Onde não há fork (Windows) a função roda na própria thread.
+# O fork parte de um processo com várias threads (requisições, exportações):
+# o filho só tem a thread que chamou run, então todo lock de módulo usado no
+# cálculo precisa ser recriado no filho (os.register_at_fork em dataset_cache
+# e validation_grid; o logging já faz o mesmo com os seus). Um lock novo de
+# módulo que o filho possa tomar deve seguir o mesmo padrão.
+_CAN_FORK = 'fork' in mp.get_all_start_methods()
+
+_slots = None
+_slots_lock = threading.Lock()
+
+# chave → environs das requisições que esperam pelo mesmo cálculo (ver watching)
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+class OffloadTimeout(Exception):
+    """A tarefa passou do tempo limite e o processo foi encerrado."""
+
+
+class OffloadCancelled(Exception):
+    """O cliente desconectou e o processo foi encerrado."""
+
+
+def _get_slots(workers):
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(workers)
+        return _slots
+
+
+def client_disconnected(environ):
+    """
+    True se o cliente da requisição já fechou a conexão (socket legível sem
+    dados). Usa o socket exposto pelo gunicorn ou pelo servidor do werkzeug;
+    sem acesso ao socket, considera o cliente conectado.
+    """
+    sock = environ.get('gunicorn.socket') or environ.get('werkzeug.socket')
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+@contextmanager
+def watching(key, environ):
+    """
+    Registra a requisição (`environ`) como interessada no cálculo `key` enquanto
+    o bloco roda e devolve o `cancelled()` para `run`: só fica verdadeiro quando
+    todas as requisições interessadas desconectaram, então quem lidera um cálculo
+    compartilhado (single_flight) e desconecta não derruba quem ainda espera.
+    """
+    with _watchers_lock:
+        _watchers.setdefault(key, []).append(environ)
+
+    def cancelled():
+        with _watchers_lock:
+            environs = list(_watchers.get(key, ()))
+        return all(client_disconnected(e) for e in environs)
+
+    try:
+        yield cancelled
+    finally:
+        with _watchers_lock:
+            environs = _watchers[key]
+            environs.remove(environ)
+            if not environs:
+                del _watchers[key]
+
+
+def _child(conn, fn, args, with_progress):
+    try:
+        if with_progress:
+            value = fn(*args, lambda p, msg=None: conn.send(('progress', p, msg)))
+        else:
+            value = fn(*args)
+        conn.send(('ok', value, None))
+    except BaseException as e:
+        try:
+            conn.send(('error', e, None))
+        except Exception:
+            # exceção que não passa pelo pipe: vai só o texto
+            conn.send(('error', RuntimeError(f"{type(e).__name__}: {e}"), None))
+    finally:
+        conn.close()
+
+
+def run(fn, *args, workers, timeout, cancelled=None, progress=None):
+    """
+    Executa `fn(*args)` em um processo filho e devolve o resultado (que deve
+    ser serializável). No máximo `workers` processos ao mesmo tempo; quem chega
+    com todos ocupados espera por uma vaga (dentro do mesmo `timeout`).
+    O processo é encerrado se passar de `timeout` segundos (OffloadTimeout) ou se
+    `cancelled()` ficar verdadeiro (OffloadCancelled). Com `progress`, `fn`
+    recebe um último argumento `report(fração, mensagem)` repassado a `progress`.
+    Exceções de `fn` são levantadas aqui com o mesmo tipo (RuntimeError com o
+    texto, se não puderem ser serializadas).
+    `workers` = 0 (ou sem fork) roda na própria thread.
+    """
+    extra = (progress,) if progress is not None else ()
+    if not workers or not _CAN_FORK:
+        return fn(*args, *extra)
+
+    deadline = time.monotonic() + timeout
+    slots = _get_slots(workers)
+    while not slots.acquire(timeout=0.2):
+        if cancelled is not None and cancelled():
+            raise OffloadCancelled()
+        if time.monotonic() > deadline:
+            raise OffloadTimeout(f"Tempo limite de {timeout}s excedido aguardando vaga")
+
+    ctx = mp.get_context('fork')
+    parent, child = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_child, args=(child, fn, args, progress is not None), daemon=True)
+    start = time.perf_counter()
+    try:
+        proc.start()
+        child.close()
+        while True:
+            if parent.poll(0.2):
+                try:
+                    kind, value, msg = parent.recv()
+                except EOFError:
+                    raise RuntimeError(f"Processo {proc.pid} terminou sem resultado (código {proc.exitcode})")
+                if kind == 'progress':
+                    progress(value, msg)
+                    continue
+                if kind == 'error':
+                    raise value
+                return value
+            if cancelled is not None and cancelled():
+                logger.info(f"Cliente desconectou; processo {proc.pid} encerrado após {time.perf_counter() - start:.1f}s")
+                raise OffloadCancelled()
+            if time.monotonic() > deadline:
+                logger.warning(f"Tempo limite de {timeout}s excedido; processo {proc.pid} encerrado")
+                raise OffloadTimeout(f"Tempo limite de {timeout}s excedido")
+    finally:
+        if proc.is_alive():
+            proc.terminate()
+        proc.join(5)
+        parent.close()
+        slots.release()
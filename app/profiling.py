@@ -0,0 +1,195 @@
+import io
+import os
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+
+from flask import g, request, url_for
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+# Perfil sob demanda: um admin acrescenta ?_profile=cpu (cProfile) ou
+# ?_profile=mem (tracemalloc) a qualquer rota e a requisição roda sob o
+# perfilador. O relatório (texto + .prof para o modo cpu) fica em
+# <UPLOAD_FOLDER>/.profiles e é listado em /admin/profiles. Respostas em
+# streaming (send_file) só são medidas até a resposta ser montada.
+PROFILES_DIR = '.profiles'
+MODES = ('cpu', 'mem')
+
+# Linhas por seção do relatório
+TOP = 40
+
+# tracemalloc é global ao processo: um perfil de memória por vez
+_mem_lock = threading.Lock()
+
+
+def profiles_dir(app):
+    return os.path.join(app.config['UPLOAD_FOLDER'], PROFILES_DIR)
+
+
+def requested_mode():
+    """Modo pedido em ?_profile=, se o usuário for admin; senão None."""
+    mode = request.args.get('_profile')
+    if mode not in MODES:
+        return None
+    if not (current_user.is_authenticated and getattr(current_user, 'role', None) == 'admin'):
+        return None
+    return mode
+
+
+def active():
+    """True durante uma requisição perfilada (o cálculo pesado não vai para processos filhos)."""
+    return g.get('_profile') is not None
+
+
+def _start():
+    mode = requested_mode()
+    if mode is None:
+        return
+    if mode == 'mem':
+        if not _mem_lock.acquire(blocking=False):
+            logger.warning(f"Perfil de memória já em andamento; {request.path} roda sem perfil")
+            return
+        tracemalloc.start(25)
+        g._profile = ('mem', None, time.perf_counter())
+    else:
+        prof = cProfile.Profile()
+        g._profile = ('cpu', prof, time.perf_counter())
+        prof.enable()
+
+
+def _cpu_report(prof):
+    out = io.StringIO()
+    stats = pstats.Stats(prof, stream=out)
+    stats.strip_dirs()
+    out.write('== Funções por tempo acumulado ==\n')
+    stats.sort_stats('cumulative').print_stats(TOP)
+    out.write('\n== Funções por tempo próprio ==\n')
+    stats.sort_stats('tottime').print_stats(TOP)
+    return out.getvalue()
+
+
+def _mem_report(snapshot, current, peak):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ])
+    lines = [f"Memória alocada ao fim da requisição: {current / 2**20:.1f} MB (pico {peak / 2**20:.1f} MB)",
+             'tracemalloc é global: alocações de outras requisições simultâneas também aparecem.', '']
+    lines.append('== Linhas que mais alocaram ==')
+    for stat in snapshot.statistics('lineno')[:TOP]:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size / 1024:10.1f} KB {stat.count:8d} blocos  {frame.filename}:{frame.lineno}")
+    lines += ['', '== Arquivos que mais alocaram ==']
+    for stat in snapshot.statistics('filename')[:TOP]:
+        lines.append(f"{stat.size / 1024:10.1f} KB {stat.count:8d} blocos  {stat.traceback[0].filename}")
+    lines += ['', '== Pilhas das 10 maiores alocações ==']
+    for stat in snapshot.statistics('traceback')[:10]:
+        lines.append(f"{stat.size / 1024:.1f} KB em {stat.count} blocos")
+        lines += [f"    {line}" for line in stat.traceback.format(limit=8)]
+    return '\n'.join(lines)
+
+
+def _finish(app, status):
+    mode, prof, start = g.pop('_profile')
+    seconds = time.perf_counter() - start
+    if mode == 'cpu':
+        prof.disable()
+        text = _cpu_report(prof)
+    else:
+        try:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            _mem_lock.release()
+        text = _mem_report(snapshot, current, peak)
+
+    report_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    meta = {
+        'id': report_id, 'mode': mode, 'method': request.method, 'url': request.full_path,
+        'user': current_user.username, 'status': status, 'seconds': round(seconds, 3),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    folder = profiles_dir(app)
+    try:
+        os.makedirs(folder, exist_ok=True)
+        if prof is not None:
+            prof.dump_stats(os.path.join(folder, f"{report_id}.prof"))
+        with open(os.path.join(folder, f"{report_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, report=text), f, ensure_ascii=False)
+        _prune(folder, app.config['PROFILE_KEEP'])
+    except OSError:
+        logger.warning("Não foi possível gravar o relatório de perfil", exc_info=True)
+        return None
+    logger.info(f"Perfil {mode} de {request.full_path}: {seconds:.2f}s, relatório {report_id}")
+    return report_id
+
+
+def _prune(folder, keep):
+    reports = sorted((f for f in os.listdir(folder) if f.endswith('.json')), reverse=True)
+    for name in reports[keep:]:
+        for ext in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(folder, name[:-5] + ext))
+            except OSError:
+                pass
+
+
+def list_reports(app):
+    """Metadados dos relatórios gravados, do mais recente ao mais antigo."""
+    folder = profiles_dir(app)
+    try:
+        names = sorted((f for f in os.listdir(folder) if f.endswith('.json')), reverse=True)
+    except FileNotFoundError:
+        return []
+    reports = []
+    for name in names:
+        report = load_report(app, name[:-5])
+        if report is not None:
+            report.pop('report', None)
+            reports.append(report)
+    return reports
+
+
+def load_report(app, report_id):
+    path = os.path.join(profiles_dir(app), f"{os.path.basename(report_id)}.json")
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def prof_path(app, report_id):
+    """Arquivo .prof (pstats) de um relatório de cpu, ou None."""
+    path = os.path.join(profiles_dir(app), f"{os.path.basename(report_id)}.prof")
+    return path if os.path.exists(path) else None
+
+
+def init_app(app):
+    """Liga ?_profile= em todas as rotas da aplicação."""
+    @app.before_request
+    def _profile_start():
+        _start()
+
+    @app.after_request
+    def _profile_finish(response):
+        if g.get('_profile') is not None:
+            report_id = _finish(app, response.status_code)
+            if report_id:
+                response.headers['X-Profile-Report'] = url_for('main.profile_report', report_id=report_id)
+        return response
+
+    @app.teardown_request
+    def _profile_abort(exc):
+        # exceção não tratada: after_request não roda, mas o perfilador precisa parar
+        if g.get('_profile') is not None:
+            _finish(app, 500)
@@ -0,0 +1,54 @@
+import os
+import re
+
+from flask import current_app, request, session
+
+# Projetos: cada um tem sua própria pasta de planilhas em uploads/projects/<nome>
+# (com dados.xlsx, Efetivo.xlsx, calendar.xlsx...). O projeto padrão ('') é a
+# própria pasta de uploads. Caches e grades são separados por pasta.
+DEFAULT_PROJECT = ''
+_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,40}$')
+
+
+def projects_root():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'projects')
+
+
+def valid_name(name):
+    return bool(_NAME_RE.match(name or ''))
+
+
+def list_projects():
+    root = projects_root()
+    if not os.path.isdir(root):
+        return []
+    return sorted(d for d in os.listdir(root) if valid_name(d) and os.path.isdir(os.path.join(root, d)))
+
+
+def create_project(name):
+    """Cria a pasta do projeto; retorna False se o nome for inválido."""
+    if not valid_name(name):
+        return False
+    os.makedirs(os.path.join(projects_root(), name), exist_ok=True)
+    return True
+
+
+def current_project():
+    """
+    Projeto selecionado: `?project=` na URL (que passa a valer para a sessão)
+    ou o último escolhido na sessão. Projetos inexistentes voltam ao padrão.
+    """
+    if 'project' in request.args:
+        session['project'] = request.args.get('project', DEFAULT_PROJECT)
+    name = session.get('project', DEFAULT_PROJECT)
+    if name and (not valid_name(name) or not os.path.isdir(os.path.join(projects_root(), name))):
+        session['project'] = name = DEFAULT_PROJECT
+    return name
+
+
+def data_folder():
+    """Pasta de planilhas do projeto selecionado na requisição atual."""
+    name = current_project()
+    if not name:
+        return current_app.config['UPLOAD_FOLDER']
+    return os.path.join(projects_root(), name)
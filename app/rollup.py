@@ -0,0 +1,101 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+CELL_KEYS = ['DISCIPLINA', 'DATARDO_STR', 'ERROR']
+
+
+class RollupCube:
+    """
+    Agregados pré-calculados a partir dos totais diários (um registro por
+    colaborador/disciplina/dia), no grão disciplina × dia × status de erro:
+      HORA NORMAL, HORA EXTRA, TOTAL_HH, REGISTROS (linhas brutas),
+      DIAS (colaborador-dias) e PEOPLE (códigos dos colaboradores da célula).
+    Também guarda o resumo por colaborador. Consultas tocam apenas o cubo:
+    para cada combinação de filtros há um índice valores → posições das
+    células, então uma consulta custa o tamanho do resultado, não do cubo.
+    """
+
+    def __init__(self, totals: pd.DataFrame):
+        codes, names = pd.factorize(totals['OBSERVAÇÃO'], sort=True)
+        self.names = np.asarray(names, dtype=object)
+        t = totals.assign(_CODE=codes)
+
+        cells = t.groupby(CELL_KEYS, as_index=False, sort=True).agg(**{
+            'HORA NORMAL': ('HORA NORMAL', 'sum'),
+            'HORA EXTRA': ('HORA EXTRA', 'sum'),
+            'TOTAL_HH': ('TOTAL_HH', 'sum'),
+            'REGISTROS': ('REGISTROS', 'sum'),
+            'DIAS': ('_CODE', 'size'),
+        })
+        cells['PEOPLE'] = [np.unique(g.to_numpy()) for _, g in t.groupby(CELL_KEYS, sort=True)['_CODE']]
+        self.cells = cells
+
+        # (colunas filtradas) → {(valores): posições em self.cells}, para toda combinação de filtros
+        self._index = {}
+        for n in range(1, len(CELL_KEYS) + 1):
+            for keys in combinations(CELL_KEYS, n):
+                groups = cells.groupby(list(keys), sort=False).indices if len(cells) else {}
+                self._index[keys] = {(k if n > 1 else (k,)): pos for k, pos in groups.items()}
+
+        t['_ERR_DAY'] = t['ERROR'].astype(int)
+        self.collaborators = (
+            t.groupby(['OBSERVAÇÃO', 'DISCIPLINA'], as_index=False, sort=True)
+             .agg(**{
+                 'HORA NORMAL': ('HORA NORMAL', 'sum'),
+                 'HORA EXTRA': ('HORA EXTRA', 'sum'),
+                 'TOTAL_HH': ('TOTAL_HH', 'sum'),
+                 'REGISTROS': ('REGISTROS', 'sum'),
+                 'DIAS': ('DATARDO_STR', 'size'),
+                 'DIAS_ERRO': ('_ERR_DAY', 'sum'),
+             })
+        )
+
+    def _select(self, discipline='All', date='All', error='All'):
+        filters = [(key, value) for key, value in zip(CELL_KEYS, (discipline, date, error)) if value != 'All']
+        if not filters:
+            return self.cells
+        keys = tuple(key for key, _ in filters)
+        values = tuple((value == 'Erro') if key == 'ERROR' else value for key, value in filters)
+        positions = self._index[keys].get(values)
+        if positions is None:
+            return self.cells.iloc[:0]
+        return self.cells.iloc[positions]
+
+    @staticmethod
+    def _distinct(people):
+        if len(people) == 0:
+            return 0
+        return int(np.unique(np.concatenate(list(people))).size)
+
+    def cards(self, discipline='All', date='All', error='All'):
+        """Retorna (registros, colaboradores distintos) para os filtros do dashboard."""
+        sel = self._select(discipline, date, error)
+        return int(sel['REGISTROS'].sum()), self._distinct(sel['PEOPLE'])
+
+    def _rollup_by(self, key, sel):
+        out = []
+        for value, grp in sel.groupby(key, sort=True):
+            out.append({
+                key: value,
+                'HORA NORMAL': round(float(grp['HORA NORMAL'].sum()), 2),
+                'HORA EXTRA': round(float(grp['HORA EXTRA'].sum()), 2),
+                'TOTAL_HH': round(float(grp['TOTAL_HH'].sum()), 2),
+                'REGISTROS': int(grp['REGISTROS'].sum()),
+                'COLABORADORES': self._distinct(grp['PEOPLE']),
+                'ERROS': int(grp.loc[grp['ERROR'], 'DIAS'].sum()),
+            })
+        return out
+
+    def by_discipline(self, date='All', error='All'):
+        return self._rollup_by('DISCIPLINA', self._select(date=date, error=error))
+
+    def by_day(self, discipline='All', error='All'):
+        return self._rollup_by('DATARDO_STR', self._select(discipline=discipline, error=error))
+
+    def by_collaborator(self, discipline='All'):
+        c = self.collaborators
+        if discipline != 'All':
+            c = c[c['DISCIPLINA'] == discipline]
+        return c.round(2).to_dict('records')
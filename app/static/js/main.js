@@ -89,4 +89,150 @@ document.addEventListener('DOMContentLoaded', () => {
   document.querySelectorAll('a').forEach(link => {
     link.addEventListener('click', (e) => handlePageTransition(e, link.href));
   });
-});
\ No newline at end of file
+});
+// Validation grid: payload colunar (/validation/data) + linhas virtualizadas
+function decodeBase64(b64) {
+  const bin = atob(b64);
+  const bytes = new Uint8Array(bin.length);
+  for (let i = 0; i < bin.length; i++) {
+    bytes[i] = bin.charCodeAt(i);
+  }
+  return bytes.buffer;
+}
+
+function escapeHtml(text) {
+  return String(text).replace(/[&<>"']/g, c => (
+    { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c]
+  ));
+}
+
+// Mesma forma de busca do servidor: sem acentos e sem diferenciar maiúsculas
+function foldText(text) {
+  return String(text).normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase();
+}
+
+function initValidationGrid(container, searchInput) {
+  const url = container && container.dataset.url;
+  if (!url) return;
+  const OVERSCAN = 10;
+  const COL_OVERSCAN = 3;
+  const thead = container.querySelector('thead');
+  const tbody = container.querySelector('tbody');
+
+  fetch(url, { credentials: 'same-origin' })
+    .then(resp => resp.json())
+    .then(data => {
+      const [nRows, nDays] = data.shape;
+      const buf = decodeBase64(data.codes);
+      const codes = data.codes_dtype === 'int8' ? new Int8Array(buf) : new Int16Array(buf);
+      const hours = new Float32Array(decodeBase64(data.hours));
+      const titles = new Map(data.titles.map(([i, j, t]) => [i * nDays + j, t]));
+      const names = data.names.map(foldText);
+      let visible = Array.from({ length: nRows }, (_, i) => i);
+      let rowHeight = 0;
+      let colWidth = 0;
+      let rendered = null;
+
+      // Colunas de dia com largura fixa (medida no primeiro cabeçalho de data)
+      function dayStyle() {
+        return colWidth ? ` style="min-width:${colWidth}px;max-width:${colWidth}px;overflow:hidden"` : '';
+      }
+
+      function colSpacer(tag, width) {
+        return width > 0 ? `<${tag} style="min-width:${width}px;width:${width}px;padding:0;border:0"></${tag}>` : '';
+      }
+
+      function headHtml(c0, c1) {
+        let html = '<tr><th>OBSERVAÇÃO</th><th>DISCIPLINA</th>' + colSpacer('th', c0 * colWidth);
+        for (let j = c0; j < c1; j++) {
+          html += `<th${dayStyle()}>${data.dates[j]}</th>`;
+        }
+        return html + colSpacer('th', (nDays - c1) * colWidth) + '</tr>';
+      }
+
+      function rowHtml(i, c0, c1) {
+        let html = `<tr><td>${escapeHtml(data.names[i])}</td><td>${escapeHtml(data.disciplines[i])}</td>` +
+          colSpacer('td', c0 * colWidth);
+        for (let j = c0; j < c1; j++) {
+          const k = i * nDays + j;
+          const code = codes[k];
+          const text = code === 1 ? hours[k].toFixed(2).replace('.', ',') : escapeHtml(data.labels[code]);
+          const title = titles.get(k);
+          html += `<td class="${data.classes[code]}"${dayStyle()}${title ? ` title="${escapeHtml(title)}"` : ''}>${text}</td>`;
+        }
+        return html + colSpacer('td', (nDays - c1) * colWidth) + '</tr>';
+      }
+
+      function spacer(height) {
+        return height > 0 ? `<tr style="height:${height}px"></tr>` : '';
+      }
+
+      // Janela de colunas de dia sob a área visível (as duas primeiras são fixas)
+      function columnWindow() {
+        if (!colWidth || !nDays) return [0, nDays];
+        const fixed = Array.from(thead.rows[0].cells).slice(0, 2)
+          .reduce((w, th) => w + th.getBoundingClientRect().width, 0);
+        const c0 = Math.max(0, Math.floor(container.scrollLeft / colWidth) - COL_OVERSCAN);
+        const c1 = Math.min(nDays, c0 + Math.ceil(Math.max(0, container.clientWidth - fixed) / colWidth) + 2 * COL_OVERSCAN);
+        return [c0, c1];
+      }
+
+      // Só as linhas e colunas visíveis (mais uma margem) ficam no DOM
+      function render() {
+        if (!colWidth && nDays) {
+          thead.innerHTML = headHtml(0, 1);
+          colWidth = Math.ceil(thead.rows[0].cells[2].getBoundingClientRect().width) || 90;
+        }
+        if (!visible.length) {
+          rendered = null;
+          thead.innerHTML = headHtml(0, nDays);
+          tbody.innerHTML = `<tr><td colspan="${nDays + 2}" class="text-center py-4 text-gray-600">Nenhum registro encontrado.</td></tr>`;
+          return;
+        }
+        const [c0, c1] = columnWindow();
+        if (!rowHeight) {
+          thead.innerHTML = headHtml(c0, c1);
+          tbody.innerHTML = rowHtml(visible[0], c0, c1);
+          rowHeight = tbody.rows[0].getBoundingClientRect().height || 40;
+        }
+        const offset = Math.max(0, container.scrollTop - thead.getBoundingClientRect().height);
+        const first = Math.max(0, Math.floor(offset / rowHeight) - OVERSCAN);
+        const last = Math.min(visible.length, first + Math.ceil(container.clientHeight / rowHeight) + 2 * OVERSCAN);
+        if (rendered && rendered.join() === [first, last, c0, c1].join()) return;
+        rendered = [first, last, c0, c1];
+        thead.innerHTML = headHtml(c0, c1);
+        let html = spacer(first * rowHeight);
+        for (let k = first; k < last; k++) {
+          html += rowHtml(visible[k], c0, c1);
+        }
+        tbody.innerHTML = html + spacer((visible.length - last) * rowHeight);
+      }
+
+      let pending = false;
+      container.addEventListener('scroll', () => {
+        if (pending) return;
+        pending = true;
+        requestAnimationFrame(() => { pending = false; render(); });
+      });
+
+      if (searchInput) {
+        const filter = () => {
+          const term = foldText(searchInput.value.trim());
+          visible = [];
+          for (let i = 0; i < nRows; i++) {
+            if (names[i].includes(term)) visible.push(i);
+          }
+          rendered = null;
+          container.scrollTop = 0;
+          render();
+        };
+        searchInput.addEventListener('input', debounce(filter, 300));
+        filter();
+      } else {
+        render();
+      }
+    })
+    .catch(() => {
+      tbody.innerHTML = '<tr><td class="text-center py-4 text-gray-600">Erro ao carregar a grade.</td></tr>';
+    });
+}
@@ -0,0 +1,263 @@
+import os
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from openpyxl import load_workbook
+from werkzeug.utils import secure_filename
+
+from . import dataset_store
+
+logger = logging.getLogger(__name__)
+
+# Só .xlsx: a leitura (openpyxl) não abre o formato binário antigo .xls
+EXCEL_EXTENSIONS = ('.xlsx',)
+
+# Colunas obrigatórias da planilha de horas (qualquer nome de arquivo)
+HOURS_COLUMNS = ['DATARDO', 'HORA NORMAL', 'HORA EXTRA']
+
+
+def _norm(value):
+    """Normaliza um cabeçalho para comparação (sem espaços extras, minúsculo)."""
+    if value is None:
+        return ''
+    return str(value).strip().lower().replace('_', ' ').replace('-', ' ')
+
+
+def _read_headers(path, max_sheets=None):
+    """
+    Lê apenas a primeira linha de cada aba em modo read_only.
+    Retorna lista de (nome_da_aba, [cabeçalhos]) — aba vazia vem com lista vazia.
+    """
+    wb = load_workbook(filename=path, read_only=True, data_only=True)
+    try:
+        sheets = []
+        for ws in wb.worksheets[:max_sheets]:
+            header = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            sheets.append((ws.title, [h for h in header if h is not None]))
+        return sheets
+    finally:
+        wb.close()
+
+
+def _check_hours(sheets):
+    errors = []
+    filled = [(name, hdr) for name, hdr in sheets if hdr]
+    if not filled:
+        return ['Nenhuma aba com cabeçalho encontrada.']
+    for name, hdr in filled:
+        present = {_norm(h) for h in hdr}
+        missing = [c for c in HOURS_COLUMNS if _norm(c) not in present]
+        if missing:
+            errors.append(f"Aba '{name}': colunas ausentes {', '.join(missing)}")
+    return errors
+
+
+def _check_efetivo(sheets):
+    errors = []
+    if len(sheets) < 3:
+        return [f"Efetivo.xlsx precisa de 3 abas (efetivo, admissões, desligamentos); encontradas {len(sheets)}."]
+    labels = ['efetivo', 'admissões', 'desligamentos']
+    for label, (name, hdr) in zip(labels, sheets[:3]):
+        if len(hdr) < 3:
+            errors.append(f"Aba '{name}' ({label}): esperadas ao menos 3 colunas (nome, disciplina, {'status' if label == 'efetivo' else 'data'}).")
+    return errors
+
+
+def _check_ferias_inss(sheets):
+    errors = []
+    by_name = {name.strip(): hdr for name, hdr in sheets}
+    vac = by_name.get('Férias')
+    if vac is None:
+        errors.append("Aba 'Férias' não encontrada.")
+    else:
+        present = [_norm(h) for h in vac]
+        for col in ['NOME', 'DISCIPLINA']:
+            if _norm(col) not in present:
+                errors.append(f"Aba 'Férias': coluna {col} ausente.")
+        if not any('início' in h or 'inicio' in h for h in present):
+            errors.append("Aba 'Férias': coluna de início ausente.")
+        if not any('término' in h or 'termino' in h for h in present):
+            errors.append("Aba 'Férias': coluna de término ausente.")
+    ins = by_name.get('INSS')
+    if ins is None:
+        errors.append("Aba 'INSS' não encontrada.")
+    else:
+        present = {str(h).strip() for h in ins}
+        for col in ['NOME', 'DISCIPLINA', 'Início', 'Término']:
+            if col not in present:
+                errors.append(f"Aba 'INSS': coluna {col} ausente.")
+    return errors
+
+
+def _check_calendar(sheets):
+    if not sheets or not sheets[0][1]:
+        return ['calendar.xlsx sem cabeçalho na primeira aba.']
+    present = {str(h).strip() for h in sheets[0][1]}
+    return [f"Coluna {c} ausente." for c in ['DATA', 'COBRAR?'] if c not in present]
+
+
+def _missing_columns(sheets, sheet, columns):
+    """Erros de colunas ausentes na aba `sheet` (comparação como em _norm)."""
+    hdr = {name.strip(): hdr for name, hdr in sheets}.get(sheet)
+    if hdr is None:
+        return [f"Aba '{sheet}' não encontrada."]
+    present = {_norm(h) for h in hdr}
+    return [f"Aba '{sheet}': coluna {c} ausente." for c in columns if _norm(c) not in present]
+
+
+def _check_justificativas(sheets):
+    return _missing_columns(sheets, 'Justificativas',
+                            ['OBSERVAÇÃO', 'DISCIPLINA', 'DATA', 'FRENTE DE TRABALHO', 'CODIGO'])
+
+
+def _check_atestados(sheets):
+    # colunas lidas pela rota /atestado e pela sincronização de justificativas
+    return _missing_columns(sheets, 'Atestados', ['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'DESVIO'])
+
+
+def _check_mapping(sheets):
+    if not sheets or len(sheets[0][1]) < 2:
+        return ['Primeira aba precisa de ao menos 2 colunas (colaborador, disciplina).']
+    return []
+
+
+def _check_admissions(sheets):
+    if not sheets or len(sheets[0][1]) < 3:
+        return ['Primeira aba precisa de ao menos 3 colunas (nome, disciplina, data).']
+    return []
+
+
+# Nome de destino → (tipo, função de verificação). Demais planilhas são tratadas como horas.
+SCHEMAS = {
+    'efetivo.xlsx': ('efetivo', _check_efetivo),
+    'ferias_inss.xlsx': ('ferias_inss', _check_ferias_inss),
+    'calendar.xlsx': ('calendario', _check_calendar),
+    'justificativas.xlsx': ('justificativas', _check_justificativas),
+    'atestado_falta.xlsx': ('atestados', _check_atestados),
+    'mapping.xlsx': ('disciplinas', _check_mapping),
+    'admissoes_desligamentos.xlsx': ('admissoes_desligamentos', _check_admissions),
+}
+
+
+def check_workbook(path, target_name):
+    """
+    Valida abas e cabeçalhos de uma planilha já gravada em disco.
+    Retorna um relatório (dict) com 'ok', 'errors', 'sheets' e o tempo gasto.
+    """
+    kind, checker = SCHEMAS.get(target_name.lower(), ('horas', _check_hours))
+    start = time.perf_counter()
+    report = {'file': target_name, 'kind': kind, 'ok': False, 'errors': [], 'sheets': []}
+    try:
+        sheets = _read_headers(path)
+        report['sheets'] = [name for name, _ in sheets]
+        report['errors'] = checker(sheets)
+    except Exception as e:
+        logger.warning(f"Falha ao ler {target_name} durante validação", exc_info=True)
+        report['errors'] = [f"Arquivo ilegível: {e}"]
+    report['ok'] = not report['errors']
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def stream_to_file(fs, path, chunk_size):
+    """Grava o stream de um FileStorage em `path` em blocos, calculando o SHA-256 no caminho."""
+    digest = hashlib.sha256()
+    with open(path, 'wb') as out:
+        while True:
+            chunk = fs.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(path):
+    """
+    SHA-256 do arquivo ativo em `path` (None se não existir). Vem do manifesto
+    do acervo quando o arquivo é a versão ativa intacta; senão é calculado e
+    fica em memória pela versão (mtime, tamanho) do arquivo.
+    """
+    folder, name = os.path.split(path)
+    return dataset_store.active_digest(folder, name) or dataset_store.file_hash(folder, name)
+
+
+def store_upload(fs, upload_folder, target_name, chunk_size, user=None, keep=0):
+    """
+    Grava um upload como `target_name` na pasta de dados, passando por
+    uploads/.staging em blocos e com o hash calculado durante a cópia.
+    Conteúdo idêntico ao do arquivo ativo é descartado sem tocar nele (mtime
+    intacto, então nenhum cache é invalidado); o resto vira uma nova versão no
+    acervo (ver dataset_store.commit). Retorna True se substituiu o arquivo.
+    """
+    staging = os.path.join(upload_folder, '.staging')
+    os.makedirs(staging, exist_ok=True)
+    tmp_path = os.path.join(staging, f"{uuid.uuid4().hex}.upload")
+    try:
+        digest = stream_to_file(fs, tmp_path, chunk_size)
+        dest = os.path.join(upload_folder, target_name)
+        if content_hash(dest) == digest:
+            logger.info(f"Upload de {target_name} idêntico ao arquivo atual; nada a recarregar")
+            return False
+        dataset_store.commit(upload_folder, target_name, tmp_path, digest, user, keep)
+        return True
+    finally:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def stage_uploads(files, upload_folder, chunk_size):
+    """
+    Grava cada FileStorage em uploads/.staging/<lote>/ lendo o stream em blocos.
+    Retorna (diretório_do_lote, [(nome_destino, caminho_temporário, sha256)], [relatórios de rejeição]).
+    """
+    batch_dir = os.path.join(upload_folder, '.staging', uuid.uuid4().hex)
+    os.makedirs(batch_dir, exist_ok=True)
+    staged, rejected = [], []
+    for fs in files:
+        name = secure_filename(fs.filename or '')
+        if not name or not name.lower().endswith(EXCEL_EXTENSIONS):
+            rejected.append({'file': fs.filename or '', 'kind': None, 'ok': False,
+                             'errors': ['Extensão não suportada (use .xlsx; salve arquivos .xls como .xlsx).'], 'sheets': []})
+            continue
+        tmp_path = os.path.join(batch_dir, name)
+        staged.append((name, tmp_path, stream_to_file(fs, tmp_path, chunk_size)))
+    return batch_dir, staged, rejected
+
+
+def check_staged(staged, max_workers):
+    """Valida as planilhas do lote em paralelo, preservando a ordem de envio."""
+    if not staged:
+        return []
+    workers = max(1, min(max_workers, len(staged)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda item: check_workbook(item[1], item[0]), staged))
+
+
+def unchanged_staged(staged, upload_folder):
+    """Nomes do lote cujo conteúdo é igual ao do arquivo ativo (mesmo SHA-256)."""
+    return [name for name, _, digest in staged
+            if content_hash(os.path.join(upload_folder, name)) == digest]
+
+
+def promote_staged(staged, upload_folder, user=None, keep=0):
+    """
+    Substitui os arquivos ativos pelos do lote, cada um como nova versão no
+    acervo. Arquivos com o mesmo conteúdo do ativo ficam como estão.
+    Retorna os nomes que não mudaram.
+    """
+    unchanged = unchanged_staged(staged, upload_folder)
+    for name, tmp_path, digest in staged:
+        if name not in unchanged:
+            dataset_store.commit(upload_folder, name, tmp_path, digest, user, keep)
+    return unchanged
+
+
+def discard_batch(batch_dir):
+    shutil.rmtree(batch_dir, ignore_errors=True)
@@ -0,0 +1,94 @@
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.comments import Comment
+from openpyxl.styles import NamedStyle, Font, PatternFill, Alignment
+
+from .validation_grid import NC, HOURS, X
+
+# Mesmas cores de style.css (classe CSS → (fundo, cor da fonte, negrito))
+CLASS_COLORS = {
+    'code-F': ('0291FF', '000000', False),
+    'code-I': ('FF6F00', '000000', False),
+    'code-AG': ('FB00FB', '000000', False),
+    'code-DL': ('FF8A8A', '000000', False),
+    'code-AT': ('FFD900', '000000', False),
+    'code-AU': ('FF0000', '000000', False),
+    'code-D': ('A500CA', '000000', False),
+    'code-SP': ('8A8A8A', '000000', False),
+    'code-X': ('000000', 'FFFFFF', False),
+    'code-nocharge': ('374151', 'FFFFFF', False),
+    'empty-cell': ('E5E7EB', '000000', False),
+    'hours-cell': ('D1FAE5', '065F46', True),
+    'code-other': ('FDE68A', '000000', False),
+    'header': ('F97316', 'FFFFFF', True),
+    'name': ('FFFFFF', '000000', False),
+}
+
+
+def _named_styles():
+    """Um NamedStyle por classe, registrado uma única vez no workbook."""
+    styles = {}
+    for cls, (bg, fg, bold) in CLASS_COLORS.items():
+        st = NamedStyle(name=cls)
+        st.fill = PatternFill('solid', start_color=bg, end_color=bg)
+        st.font = Font(color=fg, bold=bold)
+        if cls not in ('name', 'header'):
+            st.alignment = Alignment(horizontal='center')
+        if cls == 'hours-cell':
+            st.number_format = '0.00'
+        styles[cls] = st
+    return styles
+
+
+def write_validation_xlsx(grid, fileobj, discipline='All'):
+    """
+    Grava a grade de validação em `fileobj` usando o modo write-only do openpyxl
+    (linhas vão direto para disco; memória constante no nº de linhas).
+    Horas são gravadas como número; justificativas levam a FRENTE DE TRABALHO como comentário.
+    """
+    wb = Workbook(write_only=True)
+    styles = _named_styles()
+    for st in styles.values():
+        wb.add_named_style(st)
+    ws = wb.create_sheet('Validação')
+    ws.freeze_panes = 'C2'
+    ws.column_dimensions['A'].width = 40
+    ws.column_dimensions['B'].width = 18
+
+    # Estilo de cada código da grade, resolvido uma vez
+    code_style = []
+    for code, label in enumerate(grid.labels):
+        if code == NC:
+            code_style.append('code-nocharge')
+        elif code == HOURS:
+            code_style.append('hours-cell')
+        elif code == X:
+            code_style.append('empty-cell')
+        else:
+            cls = f'code-{label}'
+            code_style.append(cls if cls in styles else 'code-other')
+
+    def cell(value, style):
+        c = WriteOnlyCell(ws, value=value)
+        c.style = style
+        return c
+
+    ws.append([cell(h, 'header') for h in ['OBSERVAÇÃO', 'DISCIPLINA'] + list(grid.dates)])
+
+    n_days = len(grid.dates)
+    for i in grid.ordered_rows(discipline):
+        nome, disc = grid.rows[i]
+        row = [cell(nome, 'name'), cell(disc, 'name')]
+        for j in range(n_days):
+            code = int(grid.codes[j][i])
+            if code == HOURS:
+                row.append(cell(round(float(grid.hours[j][i]), 2), 'hours-cell'))
+                continue
+            c = cell(grid.labels[code], code_style[code])
+            title = grid.titles.get((i, j))
+            if title:
+                c.comment = Comment(title, 'Validação')
+            row.append(c)
+        ws.append(row)
+
+    wb.save(fileobj)
@@ -0,0 +1,635 @@
+import os
+import copy
+import pickle
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from .business_calendar import BusinessCalendar
+from .dataset_cache import single_flight, file_lock, track, touch, on_evict
+
+logger = logging.getLogger(__name__)
+
+# Códigos fixos de célula; justificativas entram a partir de JUST_BASE
+NC, HOURS, X, DL, F, I, AG = range(7)
+JUST_BASE = 7
+FIXED_LABELS = ['', '', 'X', 'DL', 'F', 'I', 'AG']
+
+# Proveniência: regra que decidiu cada célula (int8) + linha de origem (int32)
+(R_NOT_CHARGEABLE, R_JUSTIFICATION, R_TERMINATED, R_VACATION,
+ R_INSS, R_ADMISSION, R_HOURS, R_MISSING) = range(8)
+RULES = [
+    # (descrição, planilha de origem, aba) — a origem é None quando não há linha
+    ('Dia não cobrável no calendário', None, None),
+    ('Justificativa lançada', 'Justificativas.xlsx', 'Justificativas'),
+    ('Colaborador desligado antes do dia', 'Efetivo.xlsx', 'aba 3 (desligamentos)'),
+    ('Colaborador em férias', 'ferias_inss.xlsx', 'Férias'),
+    ('Colaborador afastado pelo INSS', 'ferias_inss.xlsx', 'INSS'),
+    ('Colaborador ainda não admitido', 'Efetivo.xlsx', 'aba 2 (admissões)'),
+    ('Horas apontadas no dia', None, None),
+    ('Dia cobrável sem horas e sem justificativa', None, None),
+]
+
+# DataFrame de load_reference() que contém a linha de origem de cada regra
+RULE_FRAMES = {R_JUSTIFICATION: 'just_df', R_TERMINATED: 'term_df', R_VACATION: 'vac_df',
+               R_INSS: 'inss_df', R_ADMISSION: 'adm_df'}
+
+# Muda quando o formato da grade persistida muda (grades antigas são refeitas)
+GRID_FORMAT = 4
+
+# Formato do dicionário de load_reference (entra na versão do cache de referência)
+REFERENCE_FORMAT = 2
+
+DEFAULT_MONTH = pd.Timestamp('2025-07-01').to_period('M')
+
+
+def load_reference(folder):
+    """
+    Lê as planilhas de referência da pasta de uploads:
+    calendário, efetivo (MOD), admissões, desligamentos, férias, INSS e justificativas.
+    """
+    ref = {}
+
+    # Calendário (todas as datas com COBRAR? = Sim; o corte é aplicado depois)
+    ref['calendar'] = BusinessCalendar.from_excel(os.path.join(folder, 'calendar.xlsx'))
+
+    # Férias & INSS
+    fer_inss = os.path.join(folder, 'ferias_inss.xlsx')
+    if os.path.exists(fer_inss):
+        vac_df = pd.read_excel(fer_inss, sheet_name='Férias')
+        vac_df.columns = vac_df.columns.str.strip()
+        col_map = {}
+        for col in vac_df.columns:
+            low = col.lower().replace('_', ' ').replace('-', ' ').strip()
+            if 'início' in low or 'inicio' in low:
+                col_map[col] = 'Férias - Início'
+            if 'término' in low or 'termino' in low:
+                col_map[col] = 'Férias - Término'
+        vac_df = vac_df.rename(columns=col_map)
+        vac_df['Férias - Início'] = pd.to_datetime(vac_df['Férias - Início'], dayfirst=True, errors='coerce').dt.date
+        vac_df['Férias - Término'] = pd.to_datetime(vac_df['Férias - Término'], dayfirst=True, errors='coerce').dt.date
+        vac_df['NOME'] = vac_df['NOME'].str.strip()
+        vac_df['DISCIPLINA'] = vac_df['DISCIPLINA'].fillna('').astype(str)
+
+        inss_df = pd.read_excel(fer_inss, sheet_name='INSS', dtype=str)
+        inss_df['Início'] = pd.to_datetime(inss_df['Início'], dayfirst=False, errors='coerce').dt.date
+        inss_df['Término'] = pd.to_datetime(inss_df['Término'], dayfirst=False, errors='coerce').dt.date
+        inss_df['NOME'] = inss_df['NOME'].str.strip()
+        inss_df['DISCIPLINA'] = inss_df['DISCIPLINA'].fillna('').astype(str)
+    else:
+        vac_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Férias - Início', 'Férias - Término'])
+        inss_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Início', 'Término'])
+    ref['vac_df'] = vac_df
+    ref['inss_df'] = inss_df
+
+    # Efetivo, admissões e desligamentos
+    ef_path = os.path.join(folder, 'Efetivo.xlsx')
+    ref['has_efetivo'] = os.path.exists(ef_path)
+    if ref['has_efetivo']:
+        all_eff = pd.read_excel(ef_path, sheet_name=0, dtype=str)
+        status_col = all_eff.columns[2]
+        is_mod = all_eff[status_col].str.strip() == 'MOD'
+        eff_df = pd.DataFrame({
+            'OBSERVAÇÃO': all_eff.loc[is_mod, all_eff.columns[0]].str.strip().tolist(),
+            'DISCIPLINA': all_eff.loc[is_mod, all_eff.columns[1]].str.strip().tolist(),
+        })
+
+        adm_raw = pd.read_excel(ef_path, sheet_name=1, dtype=str)
+        adm_df = pd.DataFrame({
+            'OBSERVAÇÃO': adm_raw.iloc[:, 0].str.strip(),
+            'DISCIPLINA': adm_raw.iloc[:, 1].fillna('').astype(str),
+            'DATA': pd.to_datetime(adm_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
+        })
+
+        term_raw = pd.read_excel(ef_path, sheet_name=2, dtype=str)
+        term_df = pd.DataFrame({
+            'OBSERVAÇÃO': term_raw.iloc[:, 0].str.strip(),
+            'DISCIPLINA': term_raw.iloc[:, 1].fillna('').astype(str),
+            'DATA': pd.to_datetime(term_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
+        })
+    else:
+        eff_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA'])
+        adm_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
+        term_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
+    ref['eff_df'] = eff_df
+    ref['adm_df'] = adm_df
+    ref['term_df'] = term_df
+
+    # Justificativas
+    just_path = os.path.join(folder, 'Justificativas.xlsx')
+    if os.path.exists(just_path):
+        just_raw = pd.read_excel(just_path, sheet_name='Justificativas')
+        just_raw['OBSERVAÇÃO'] = just_raw['OBSERVAÇÃO'].str.strip()
+        just_raw['DISCIPLINA'] = just_raw['DISCIPLINA'].fillna('').str.strip()
+        just_raw['DATA'] = pd.to_datetime(just_raw['DATA'], dayfirst=True, errors='coerce')
+        just_raw['DATARDO_STR'] = just_raw['DATA'].dt.strftime('%d/%m/%Y')
+        just_raw['FRENTE DE TRABALHO'] = just_raw['FRENTE DE TRABALHO'].fillna('').astype(str)
+        just_raw['CODIGO'] = just_raw['CODIGO'].fillna('').astype(str).str.strip()
+        just_df = just_raw[['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO']]
+    else:
+        just_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO'])
+    ref['just_df'] = just_df
+    return ref
+
+
+def _first_date_by_key(df, name_col):
+    """{(nome, disciplina): (primeira DATA, índice da linha)} — equivale ao .iloc[0] por colaborador."""
+    out = {}
+    for idx, nome, disc, dt in zip(df.index, df[name_col], df['DISCIPLINA'], df['DATA']):
+        out.setdefault((nome, disc), (None if pd.isna(dt) else dt, idx))
+    return out
+
+
+def _intervals_by_key(df, name_col, ini_col, fim_col):
+    """{(nome, disciplina): [(início, término, índice da linha), ...]} ignorando intervalos incompletos."""
+    out = {}
+    for idx, nome, disc, ini, fim in zip(df.index, df[name_col], df['DISCIPLINA'], df[ini_col], df[fim_col]):
+        if pd.isna(ini) or pd.isna(fim):
+            continue
+        out.setdefault((nome, disc), []).append((ini, fim, idx))
+    return out
+
+
+def _interval_source(intervals, day):
+    """Índice da linha do primeiro intervalo que contém `day`, ou None."""
+    for ini, fim, idx in intervals:
+        if ini <= day <= fim:
+            return idx
+    return None
+
+
+def _grid_month(totals):
+    """Mês da planilha: o que concentra mais registros (padrão julho/2025 sem datas)."""
+    dates = pd.to_datetime(totals['DATARDO_STR'], format='%d/%m/%Y', errors='coerce')
+    if not dates.notna().any():
+        return DEFAULT_MONTH
+    months = dates.dt.to_period('M')
+    weights = totals['REGISTROS'] if 'REGISTROS' in totals.columns else pd.Series(1, index=totals.index)
+    return weights.groupby(months).sum().idxmax()
+
+
+class ValidationGrid:
+    """
+    Grade colaborador × dia da aba de Validação para um mês.
+
+    Na construção guarda apenas o contexto de cada linha (horas por dia,
+    desligamento, admissão, férias, INSS, justificativas e calendário);
+    as colunas de dia são calculadas por `extend_to(cutoff)` e acrescentadas
+    conforme a data de corte avança, sem recalcular os dias já prontos.
+    """
+
+    def __init__(self, version, totals, ref):
+        self.version = version
+        self.format = GRID_FORMAT
+        self.calendar = ref['calendar']
+
+        eff_df = ref['eff_df']
+        eff_names = set(eff_df['OBSERVAÇÃO'])
+        if ref['has_efetivo']:
+            totals = totals[totals['OBSERVAÇÃO'].isin(eff_names)]
+        self.month = _grid_month(totals)
+        self.eff_disciplines = sorted(eff_df['DISCIPLINA'].unique())
+        self.data_disciplines = set(totals['DISCIPLINA'].unique())
+
+        # Linhas: colaboradores com registros (ordem do pivot) + cadastrados sem registros
+        keys = totals[['OBSERVAÇÃO', 'DISCIPLINA']].drop_duplicates().sort_values(['OBSERVAÇÃO', 'DISCIPLINA'])
+        rows = list(zip(keys['OBSERVAÇÃO'], keys['DISCIPLINA']))
+        seen = set(rows)
+        names_src = pd.concat([
+            ref['vac_df'][['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
+            ref['inss_df'][['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
+            eff_df[['OBSERVAÇÃO', 'DISCIPLINA']]
+        ]).drop_duplicates()
+        for nome, disc in zip(names_src['OBSERVAÇÃO'], names_src['DISCIPLINA']):
+            if nome in eff_names and (nome, disc) not in seen:
+                rows.append((nome, disc))
+                seen.add((nome, disc))
+        self.rows = rows
+
+        # Contexto por linha
+        row_index = {key: i for i, key in enumerate(rows)}
+        self.row_hours = [dict() for _ in rows]
+        self.row_records = [dict() for _ in rows]
+        records = totals['REGISTROS'] if 'REGISTROS' in totals.columns else pd.Series(1, index=totals.index)
+        for nome, disc, dt, total, n in zip(totals['OBSERVAÇÃO'], totals['DISCIPLINA'],
+                                            totals['DATARDO_STR'], totals['TOTAL_HH'], records):
+            i = row_index[(nome, disc)]
+            self.row_hours[i][dt] = total
+            self.row_records[i][dt] = int(n)
+
+        term = _first_date_by_key(ref['term_df'], 'OBSERVAÇÃO')
+        adm = _first_date_by_key(ref['adm_df'], 'OBSERVAÇÃO')
+        vac = _intervals_by_key(ref['vac_df'], 'NOME', 'Férias - Início', 'Férias - Término')
+        inss = _intervals_by_key(ref['inss_df'], 'NOME', 'Início', 'Término')
+        self.row_term = [term.get(k, (None, None)) for k in rows]
+        self.row_adm = [adm.get(k, (None, None)) for k in rows]
+        self.row_vac = [vac.get(k, []) for k in rows]
+        self.row_inss = [inss.get(k, []) for k in rows]
+
+        just = ref['just_df'].drop_duplicates(['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], keep='first')
+        self.labels = list(FIXED_LABELS)
+        label_index = {}
+        self.just = {}
+        for idx, nome, disc, dt, text, code in zip(just.index, just['OBSERVAÇÃO'], just['DISCIPLINA'],
+                                                   just['DATARDO_STR'], just['FRENTE DE TRABALHO'], just['CODIGO']):
+            if (nome, disc) not in row_index:
+                continue
+            if code not in label_index:
+                label_index[code] = len(self.labels)
+                self.labels.append(code)
+            self.just[(row_index[(nome, disc)], dt)] = (label_index[code], text, idx)
+
+        # Colunas calculadas (uma por dia, até self.cutoff)
+        self.cutoff = None
+        self.dates = []
+        self.codes = []
+        self.hours = []
+        self.titles = {}
+        self.rules = []
+        self.sources = []
+
+    @property
+    def month_start(self):
+        return self.month.start_time.date()
+
+    @property
+    def month_end(self):
+        return self.month.end_time.date()
+
+    def chargeable(self, day):
+        return self.calendar.is_chargeable(day)
+
+    def _classify_day(self, day, charge):
+        dt = day.strftime('%d/%m/%Y')
+        j = len(self.dates)
+        n = len(self.rows)
+        codes = np.empty(n, dtype=np.int16)
+        hours = np.zeros(n, dtype=np.float64)
+        # Proveniência: regra aplicada e linha de origem (-1 = sem linha, como
+        # nas horas; o nº de apontamentos do dia fica em row_records)
+        rules = np.empty(n, dtype=np.int8)
+        sources = np.full(n, -1, dtype=np.int32)
+        for i in range(n):
+            raw = self.row_hours[i].get(dt, 0.0)
+            has_hours = not (raw == 0 or pd.isna(raw))
+            if has_hours:
+                hours[i] = raw
+
+            if not charge:
+                codes[i] = HOURS if has_hours else NC
+                rules[i] = R_NOT_CHARGEABLE
+                continue
+
+            just = self.just.get((i, dt))
+            if just is not None:
+                codes[i] = just[0]
+                self.titles[(i, j)] = just[1]
+                rules[i], sources[i] = R_JUSTIFICATION, just[2]
+                continue
+
+            term, term_src = self.row_term[i]
+            if term is not None and day > term:
+                codes[i], rules[i], sources[i] = DL, R_TERMINATED, term_src
+                continue
+            src = _interval_source(self.row_vac[i], day)
+            if src is not None:
+                codes[i], rules[i], sources[i] = F, R_VACATION, src
+                continue
+            src = _interval_source(self.row_inss[i], day)
+            if src is not None:
+                codes[i], rules[i], sources[i] = I, R_INSS, src
+                continue
+            adm, adm_src = self.row_adm[i]
+            if adm is not None and day < adm:
+                codes[i], rules[i], sources[i] = AG, R_ADMISSION, adm_src
+            elif has_hours:
+                codes[i], rules[i] = HOURS, R_HOURS
+            else:
+                codes[i], rules[i] = X, R_MISSING
+        self.dates.append(dt)
+        self.codes.append(codes)
+        self.hours.append(hours)
+        self.rules.append(rules)
+        self.sources.append(sources)
+
+    def extend_to(self, cutoff):
+        """
+        Calcula as colunas de dia que passaram a ser cobráveis até `cutoff`.
+        Retorna o nº de dias calculados (0 se a grade já estava em dia).
+        """
+        last = min(self.month_end, cutoff)
+        day = self.month_start + timedelta(days=len(self.dates))
+        added = 0
+        for charge in self.calendar.mask(day, last):
+            self._classify_day(day, bool(charge))
+            day += timedelta(days=1)
+            added += 1
+        self.cutoff = cutoff
+        return added
+
+    def extended(self, cutoff):
+        """
+        Cópia da grade com `extend_to(cutoff)` aplicado e o nº de dias calculados.
+        A grade original (publicada e lida sem lock por outras threads) não muda;
+        as colunas já prontas são compartilhadas entre as duas.
+        """
+        grid = copy.copy(self)
+        grid.dates, grid.codes, grid.hours = list(self.dates), list(self.codes), list(self.hours)
+        grid.rules, grid.sources, grid.titles = list(self.rules), list(self.sources), dict(self.titles)
+        return grid, grid.extend_to(cutoff)
+
+    # --- Consultas -------------------------------------------------------
+
+    def row_indices(self, discipline='All'):
+        return [i for i, (_, disc) in enumerate(self.rows) if discipline == 'All' or disc == discipline]
+
+    def ordered_rows(self, discipline='All'):
+        """Índices das linhas ordenados por disciplina e nome (ordem da tela)."""
+        return sorted(self.row_indices(discipline), key=lambda i: (self.rows[i][1], self.rows[i][0]))
+
+    def disciplines(self, discipline='All'):
+        """Lista do filtro de disciplinas, como nas rotas originais."""
+        if discipline == 'All':
+            return self.eff_disciplines
+        return [discipline] if discipline in self.data_disciplines else []
+
+    def chargeable_mask(self, j0=0, j1=None):
+        """Máscara de dias cobráveis das colunas [j0, j1)."""
+        j1 = len(self.dates) if j1 is None else j1
+        if j1 <= j0:
+            return np.zeros(0, dtype=bool)
+        return self.calendar.mask(self.month_start + timedelta(days=j0), self.month_start + timedelta(days=j1 - 1))
+
+    def chargeable_dates(self):
+        if not self.dates:
+            return []
+        days = self.calendar.days(self.month_start, self.month_start + timedelta(days=len(self.dates) - 1))
+        return [d.item().strftime('%d/%m/%Y') for d in days]
+
+    def cell(self, i, j):
+        """(texto exibido, classe CSS, título) de uma célula."""
+        code = int(self.codes[j][i])
+        if code == NC:
+            return '', 'code-nocharge', None
+        if code == HOURS:
+            return f"{self.hours[j][i]:.2f}".replace('.', ','), 'hours-cell', None
+        if code == X:
+            return 'X', 'empty-cell', None
+        label = self.labels[code]
+        return label, f'code-{label}', self.titles.get((i, j))
+
+    def pivot(self, discipline='All'):
+        """Registros no formato usado por validation.html, ordenados por disciplina/nome."""
+        out = []
+        for i in self.ordered_rows(discipline):
+            nome, disc = self.rows[i]
+            rec = {'OBSERVAÇÃO': nome, 'DISCIPLINA': disc}
+            for j, dt in enumerate(self.dates):
+                text, cls, title = self.cell(i, j)
+                rec[dt] = text
+                rec[f'{dt}_class'] = cls
+                if title is not None:
+                    rec[f'{dt}_title'] = title
+            out.append(rec)
+        return out
+
+    def columnar(self, discipline='All'):
+        """
+        Grade em formato colunar compacto (usado por /validation/data):
+        nomes/disciplinas por linha, datas, matriz de códigos int8 e matriz de
+        horas float32 (linhas × dias, little-endian) e títulos esparsos [i, j, texto].
+        As linhas seguem a ordem da tela (disciplina, nome).
+        """
+        order = np.asarray(self.ordered_rows(discipline), dtype=np.intp)
+        n_days = len(self.dates)
+        if n_days and len(order):
+            codes = np.stack(self.codes, axis=1)[order]
+            hours = np.stack(self.hours, axis=1)[order]
+            hours[codes != HOURS] = 0
+        else:
+            codes = np.zeros((len(order), n_days), dtype=np.int16)
+            hours = np.zeros((len(order), n_days))
+        position = {int(i): k for k, i in enumerate(order)}
+        titles = [[position[i], j, t] for (i, j), t in self.titles.items() if i in position]
+        return {
+            'names': [self.rows[i][0] for i in order],
+            'disciplines': [self.rows[i][1] for i in order],
+            'dates': list(self.dates),
+            'labels': list(self.labels),
+            'classes': ['code-nocharge', 'hours-cell', 'empty-cell'] + [f'code-{l}' for l in self.labels[X + 1:]],
+            'codes': codes.astype(np.int8 if len(self.labels) <= 127 else '<i2'),
+            'hours': hours.astype('<f4'),
+            'titles': titles,
+        }
+
+    def cells(self, discipline='All', start=None, end=None, names=None):
+        """
+        Grade em formato longo, uma linha por colaborador × dia (API de leitura):
+        NOME, DISCIPLINA, DATA, CODIGO, ROTULO e HORAS (só nas células de horas).
+        Linhas na ordem da tela; `names` restringe a um conjunto de colaboradores.
+        """
+        rows = np.asarray([i for i in self.ordered_rows(discipline) if names is None or self.rows[i][0] in names],
+                          dtype=np.intp)
+        j0, j1 = self.day_span(start, end)
+        if not len(rows) or j1 <= j0:
+            return pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'DATA', 'CODIGO', 'ROTULO', 'HORAS'])
+        codes = np.stack(self.codes[j0:j1], axis=1)[rows]
+        hours = np.stack(self.hours[j0:j1], axis=1)[rows].astype(float)
+        hours[codes != HOURS] = 0
+        n_days = j1 - j0
+        return pd.DataFrame({
+            'NOME': np.repeat([self.rows[i][0] for i in rows], n_days),
+            'DISCIPLINA': np.repeat([self.rows[i][1] for i in rows], n_days),
+            'DATA': np.tile(self.dates[j0:j1], len(rows)),
+            'CODIGO': codes.ravel().astype(np.int16),
+            'ROTULO': np.asarray(self.labels, dtype=object)[codes.ravel()],
+            'HORAS': hours.ravel(),
+        })
+
+    def explain(self, nome, disc, dt, ref=None):
+        """
+        Por que a célula (colaborador, disciplina, dia) tem esse código: regra
+        aplicada e linha de origem (com os valores da linha se `ref`, o resultado
+        de load_reference, for informado). None se a linha ou o dia não estiverem na grade.
+        """
+        try:
+            i = self.rows.index((nome, disc))
+            j = self.dates.index(dt)
+        except ValueError:
+            return None
+        text, cls, title = self.cell(i, j)
+        rule = int(self.rules[j][i])
+        src = int(self.sources[j][i])
+        description, workbook, sheet = RULES[rule]
+        out = {
+            'OBSERVAÇÃO': nome, 'DISCIPLINA': disc, 'DATA': dt,
+            'valor': text, 'classe': cls, 'titulo': title,
+            'regra': rule, 'descricao': description,
+        }
+        if cls == 'hours-cell':
+            out['apontamentos'] = self.row_records[i].get(dt, 0)
+        if workbook is not None and src >= 0:
+            # índice do DataFrame lido com cabeçalho na 1ª linha → linha do Excel = índice + 2
+            out['origem'] = {'arquivo': workbook, 'aba': sheet, 'indice': src, 'linha_excel': src + 2}
+            frame = ref.get(RULE_FRAMES[rule]) if ref is not None else None
+            if frame is not None and src in frame.index:
+                out['origem']['valores'] = {
+                    str(k): ('' if pd.isna(v) else str(v)) for k, v in frame.loc[src].items()
+                }
+        return out
+
+    def day_span(self, start=None, end=None):
+        """Fatia de colunas [j0, j1) dos dias entre start e end (colunas são dias consecutivos)."""
+        j0 = 0 if start is None else max(0, (start - self.month_start).days)
+        j1 = len(self.dates) if end is None else min(len(self.dates), (end - self.month_start).days + 1)
+        return j0, max(j0, j1)
+
+    def pending(self, discipline='All', date='All', start=None, end=None):
+        """Células sem horas e sem justificativa em dias cobráveis (opcionalmente entre start e end)."""
+        j0, j1 = self.day_span(start, end)
+        cols = j0 + np.flatnonzero(self.chargeable_mask(j0, j1))
+        if date != 'All':
+            cols = cols[[self.dates[j] == date for j in cols]] if len(cols) else cols
+        rows = np.asarray(self.row_indices(discipline), dtype=np.intp)
+        if not len(cols) or not len(rows):
+            return []
+        # linhas × dias cobráveis; nonzero percorre linha a linha, dia a dia
+        missing = np.stack([self.codes[j] for j in cols], axis=1)[rows] == X
+        return [
+            {'NOME': self.rows[rows[a]][0], 'DISCIPLINA': self.rows[rows[a]][1], 'DATA': self.dates[cols[b]]}
+            for a, b in zip(*np.nonzero(missing))
+        ]
+
+    def pending_by_discipline(self, date='All', start=None, end=None):
+        """
+        pending() de todas as disciplinas em uma única passada pela grade:
+        {disciplina: linhas}, cada lista na mesma ordem de pending(disciplina).
+        """
+        groups = {}
+        for line in self.pending('All', date, start, end):
+            groups.setdefault(line['DISCIPLINA'], []).append(line)
+        return groups
+
+
+# --- Persistência por (versão dos dados, mês) ----------------------------
+
+_grids = {}
+_lock = threading.Lock()
+
+
+def _drop_folder(folder):
+    with _lock:
+        for key in [k for k in _grids if k[0] == folder]:
+            del _grids[key]
+
+
+on_evict(_drop_folder)
+
+
+def _before_fork():
+    _lock.acquire()
+
+
+def _after_fork_in_parent():
+    _lock.release()
+
+
+def _after_fork_in_child():
+    # processo filho do offload (ver dataset_cache): só existe a thread que fez o fork
+    global _lock
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork, after_in_parent=_after_fork_in_parent,
+                        after_in_child=_after_fork_in_child)
+
+
+def _grid_path(folder, filename, disk_dir=None):
+    digest = hashlib.sha1(f"{folder}|{filename}".encode('utf-8')).hexdigest()[:16]
+    return os.path.join(disk_dir or os.path.join(folder, '.cache'), f'grid_{digest}.pkl')
+
+
+def _read_grid(path):
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def _write_grid(path, grid):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(grid, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _usable(grid, version, cutoff):
+    return (grid is not None and getattr(grid, 'format', 1) == GRID_FORMAT and grid.version == version
+            and not (grid.cutoff and grid.cutoff > cutoff))
+
+
+def grid_ready(folder, filename, version, cutoff):
+    """True se get_grid devolveria a grade em memória sem calcular nada."""
+    with _lock:
+        grid = _grids.get((folder, filename))
+    return _usable(grid, version, cutoff) and grid.cutoff == cutoff
+
+
+def get_grid(folder, filename, version, cutoff, load_totals, load_ref, disk_dir=None):
+    """
+    Devolve a grade de `filename` atualizada até `cutoff`.
+    Reaproveita a grade em memória ou em disco se a versão dos dados for a mesma;
+    nesse caso só os dias novos (cutoff avançou) são calculados.
+    A construção é feita uma única vez por arquivo: threads esperam pela mesma
+    construção e workers esperam o lock de arquivo e leem a grade gravada.
+    `disk_dir` troca a pasta da grade gravada (padrão <folder>/.cache), p.ex.
+    pela pasta da versão ativa do arquivo no acervo (ver dataset_store).
+    """
+    key = (folder, filename)
+    with _lock:
+        grid = _grids.get(key)
+    if _usable(grid, version, cutoff) and grid.cutoff == cutoff:
+        touch(folder)
+        return grid
+    return single_flight(('grid', key, version, cutoff), lambda: _update_grid(key, version, cutoff, load_totals, load_ref, disk_dir))
+
+
+def _update_grid(key, version, cutoff, load_totals, load_ref, disk_dir):
+    folder, filename = key
+    path = _grid_path(folder, filename, disk_dir)
+    with file_lock(f"{path}.lock"):
+        with _lock:
+            grid = _grids.get(key)
+        if not _usable(grid, version, cutoff) or grid.cutoff != cutoff:
+            # outro worker pode ter gravado uma grade mais nova
+            disk = _read_grid(path)
+            if _usable(disk, version, cutoff) and (not _usable(grid, version, cutoff) or disk.cutoff > grid.cutoff):
+                grid = disk
+
+        if not _usable(grid, version, cutoff):
+            logger.info(f"Grade de validação reconstruída para {filename}")
+            grid = ValidationGrid(version, load_totals(), load_ref())
+            changed = True
+        else:
+            changed = False
+
+        # nunca estende no lugar: a grade pode ser a publicada em _grids
+        grid, added = grid.extended(cutoff)
+        if added:
+            logger.info(f"Grade de validação de {filename}: {added} dia(s) calculado(s) até {cutoff.strftime('%d/%m/%Y')}")
+        if changed or added:
+            try:
+                _write_grid(path, grid)
+            except OSError:
+                logger.warning("Não foi possível gravar a grade de validação em disco", exc_info=True)
+        with _lock:
+            _grids[key] = grid
+    track(folder, ('grid', filename), grid)
+    return grid
@@ -1,120 +1,384 @@
 import os
 import io
+import time
+import base64
 import logging
-import pandas as pd
 from datetime import datetime, timedelta
 from flask import (
     Blueprint, current_app, render_template,
-    request, redirect, url_for, flash, send_file
+    request, redirect, url_for, flash, send_file, jsonify, session
 )
-from flask_login import login_required
+from flask_login import login_required, current_user
 from .auth import roles_required
-from openpyxl import load_workbook
+from .dataset_cache import cached, folder_version, single_flight
+from .ingest import HoursReadError
+from .projects import data_folder, current_project, list_projects, create_project
+from .lazy import LazyModule
+
+# pandas/openpyxl (e os módulos de cálculo que dependem deles) são importados
+# no primeiro uso, para não pesar na inicialização nem no login.
+pd = LazyModule('pandas')
+openpyxl = LazyModule('openpyxl')
 
 bp = Blueprint('main', __name__)
 logger = logging.getLogger(__name__)
 
-def _load_df(filename):
+# Colunas lidas por cada grupo de rotas (projeção aplicada em _load_df)
+GRID_COLUMNS = ['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'HORA NORMAL', 'HORA EXTRA']
+PICKER_COLUMNS = ['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR']
+
+def _cache_dir():
+    """Pasta dos caches compartilhados entre workers (uploads/.cache)."""
+    return os.path.join(data_folder(), '.cache')
+
+@bp.app_context_processor
+def _inject_projects():
+    """Projetos disponíveis e o selecionado, para o seletor da barra lateral."""
+    if request.endpoint and request.endpoint.startswith('auth.'):
+        return {}
+    return {'projects': list_projects(), 'current_project': current_project()}
+
+@bp.errorhandler(HoursReadError)
+def _hours_read_error(e):
+    """
+    Planilha de horas ilegível em qualquer rota: os caches não guardaram a falha
+    (a próxima requisição tenta ler de novo). Páginas avisam e voltam ao
+    Dashboard; chamadas de API/fetch recebem o erro em JSON.
+    """
+    if request.accept_mimetypes.best != 'text/html':
+        return jsonify({'error': str(e)}), 422
+    _flash_once(str(e), 'danger')
+    return redirect(url_for('main.dashboard'))
+
+def _flash_once(message, category):
+    """flash() que não repete uma mensagem ainda não exibida (p.ex. rota que falhou e o Dashboard para onde voltou)."""
+    if (category, message) not in session.get('_flashes', []):
+        flash(message, category)
+
+def _read_hours(filename, columns=None):
     """
-    Carrega todas as abas do Excel em um DataFrame e formata colunas essenciais.
-    Garante que a primeira coluna vire 'OBSERVAÇÃO' se o cabeçalho original não bater,
-    e mapeia a disciplina pela primeira aba de Efetivo.xlsx (colunas A e B).
-    Também padroniza todas as colunas de texto para datetime no padrão MM/DD/YYYY.
+    Planilha de horas normalizada do projeto atual (ver ingest.load_hours).
+    Leituras simultâneas do mesmo arquivo/colunas/versão são feitas uma única
+    vez, inclusive entre workers e com o app legado de Validação/: o resultado
+    fica em uploads/.cache. Em caso de erro levanta HoursReadError, para que os
+    caches construídos a partir da leitura não guardem a falha.
     """
-    folder = current_app.config['UPLOAD_FOLDER']
-    path = os.path.join(folder, filename)
+    from .ingest import load_hours
     try:
-        wb = load_workbook(filename=path, read_only=True, data_only=True)
-    except Exception:
+        return load_hours(data_folder(), filename, columns)
+    except Exception as e:
         logger.exception(f"Erro ao abrir {filename}")
-        flash(f"Erro ao abrir o arquivo {filename}.", 'danger')
+        raise HoursReadError(filename) from e
+
+def _load_df(filename, columns=None):
+    """Como _read_hours, para uso direto nas rotas: em caso de erro avisa o usuário e devolve um DataFrame vazio."""
+    try:
+        return _read_hours(filename, columns)
+    except HoursReadError as e:
+        flash(str(e), 'danger')
         return pd.DataFrame()
 
-    # 1) junta todas as abas
-    sheets = []
-    for ws in wb.worksheets:
-        vals = ws.values
-        try:
-            header = next(vals)
-        except StopIteration:
-            continue
-        df_sheet = pd.DataFrame(vals, columns=header, dtype=str)
-        sheets.append(df_sheet)
-    df = pd.concat(sheets, ignore_index=True) if sheets else pd.DataFrame()
-    if df.empty:
-        return df
-
-    # 2) se não houver coluna 'OBSERVAÇÃO', força a primeira coluna
-    if 'OBSERVAÇÃO' not in df.columns:
-        first = df.columns[0]
-        df = df.rename(columns={first: 'OBSERVAÇÃO'})
-
-    # 3) Normaliza TODAS as colunas de texto para datetime (MM/DD/YYYY)
-    for col in df.columns:
-        if df[col].dtype == object:
-            # 1ª tentativa: formato europeu (dia primeiro)
-            parsed = pd.to_datetime(
-                df[col],
-                dayfirst=True,
-                infer_datetime_format=True,
-                errors='coerce'
-            )
-            # 2ª tentativa: formato americano MM/DD/YYYY
-            mask = parsed.isna() & df[col].notna()
-            if mask.any():
-                us_dates = pd.to_datetime(
-                    df.loc[mask, col],
-                    format='%m/%d/%Y',
-                    errors='coerce'
-                )
-                parsed.loc[mask] = us_dates
-            # aceita coluna como data se ao menos 10% convertido
-            if parsed.notna().sum() >= len(df) * 0.1:
-                df[col] = parsed
-
-    # 4) consolida 'DATARDO' → 'DATARDO_STR'
-    if 'DATARDO' in df.columns and pd.api.types.is_datetime64_any_dtype(df['DATARDO']):
-        df['DATARDO_STR'] = df['DATARDO'].dt.strftime('%d/%m/%Y').fillna('')
-    elif 'DATARDO_STR' not in df.columns:
-        df['DATARDO_STR'] = ''
-
-    # 5) horas numéricas
-    for col in ['HORA NORMAL', 'HORA EXTRA']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
-
-    # 6) limpa texto
-    for col in ['OBSERVAÇÃO', 'ORDEM', 'OPERAÇÃO', 'T_ATIV']:
-        if col in df.columns:
-            df[col] = df[col].fillna('').astype(str)
-
-    # 7) mapeamento de DISCIPLINA via Efetivo.xlsx
-    map_path = os.path.join(folder, 'Efetivo.xlsx')
-    if os.path.exists(map_path):
-        try:
-            dm = pd.read_excel(map_path, usecols=[0, 1], dtype=str)
-            dm.columns = ['OBSERVAÇÃO', 'DISCIPLINA']
-            dm['OBSERVAÇÃO'] = dm['OBSERVAÇÃO'].str.strip()
-            dm = dm.drop_duplicates('OBSERVAÇÃO')
-            df = df.merge(dm, on='OBSERVAÇÃO', how='left')
-        except Exception:
-            logger.warning("Falha no mapeamento de disciplinas via Efetivo.xlsx", exc_info=True)
+def _version_dir(filename):
+    """Pasta da versão ativa de `filename` no acervo (ver dataset_store), onde seus derivados são gravados; None se não versionado."""
+    from .dataset_store import active_dir
+    return active_dir(data_folder(), filename)
+
+def _save_sheet(path, df, sheet_name):
+    """
+    Grava `df` como planilha de uma aba em `path` substituindo o arquivo de uma
+    vez (arquivo temporário + os.replace): leitores nunca veem a planilha pela
+    metade e uma cópia guardada no acervo (dataset_store) nunca é alterada.
+    """
+    root, ext = os.path.splitext(path)
+    tmp = f"{root}.{os.getpid()}.tmp{ext}"
+    try:
+        with pd.ExcelWriter(tmp, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name=sheet_name)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def _hours_version(filename):
+    """Versão dos dados de horas: o próprio arquivo + Efetivo.xlsx (mapa de disciplinas) + regras."""
+    from .hours_rules import rules_fingerprint
+    folder = data_folder()
+    return (
+        folder_version(folder, [filename, 'Efetivo.xlsx']),
+        rules_fingerprint(current_app.config['HOURS_RULES'])
+    )
+
+def _daily_totals(filename):
+    """
+    Totais diários por colaborador/disciplina/data com a coluna ERROR avaliada
+    pelas regras de Config.HOURS_RULES. Calculado uma vez por versão dos dados;
+    planilha ilegível levanta HoursReadError (nada é guardado).
+    """
+    from .hours_rules import evaluate_errors
+    folder = data_folder()
+
+    chunk_rows = current_app.config['HOURS_CHUNK_ROWS']
+
+    def build():
+        if chunk_rows:
+            grp = _streamed_totals(folder, filename, chunk_rows)
+        else:
+            df = _read_hours(filename, GRID_COLUMNS)
+            grp = None if df.empty else (
+                df.groupby(['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], as_index=False)
+                  .agg(**{
+                      'HORA NORMAL': ('HORA NORMAL', 'sum'),
+                      'HORA EXTRA': ('HORA EXTRA', 'sum'),
+                      'REGISTROS': ('HORA NORMAL', 'size'),
+                  }))
+        if grp is None or grp.empty:
+            return pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR',
+                                         'HORA NORMAL', 'HORA EXTRA', 'REGISTROS', 'TOTAL_HH', 'ERROR'])
+        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
+        grp['ERROR'] = evaluate_errors(grp['TOTAL_HH'], grp['DISCIPLINA'],
+                                       current_app.config['HOURS_RULES'])
+        return grp
+
+    return cached(('daily_totals', folder, filename), _hours_version(filename), build,
+                  disk_dir=_version_dir(filename))
+
+def _streamed_totals(folder, filename, chunk_rows):
+    """
+    Modo de agregação em blocos (Config.HOURS_CHUNK_ROWS): lê a planilha de
+    `chunk_rows` em `chunk_rows` linhas e dobra cada bloco nos totais diários,
+    sem reter as linhas brutas. Levanta HoursReadError se o arquivo não puder ser lido.
+    """
+    from .hours_stream import DailyTotalsAccumulator
+    from .ingest import read_chunks
+    acc = DailyTotalsAccumulator()
+    try:
+        for chunk in read_chunks(folder, filename, GRID_COLUMNS, chunk_rows):
+            acc.add(chunk)
+    except Exception as e:
+        logger.exception(f"Erro ao abrir {filename}")
+        raise HoursReadError(filename) from e
+    logger.info(f"Arquivo {filename}: {acc.rows} linhas agregadas em {acc.chunks} bloco(s)")
+    return acc.result()
+
+def _hours_frame(filename):
+    """Linhas de horas com TOTAL_HH e ERROR do dia já anexados (cacheado por versão)."""
+    folder = data_folder()
+
+    def build():
+        df = _read_hours(filename, GRID_COLUMNS)
+        if df.empty:
+            return df
+        grp = _daily_totals(filename)
+        return df.merge(
+            grp[['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'TOTAL_HH', 'ERROR']],
+            on=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], how='left'
+        )
+
+    return cached(('hours_frame', folder, filename), _hours_version(filename), build)
+
+def _rollup(filename):
+    """Cubo disciplina × dia × erro materializado junto com os totais diários."""
+    from .rollup import RollupCube
+    folder = data_folder()
+    return cached(('rollup', folder, filename), _hours_version(filename),
+                  lambda: RollupCube(_daily_totals(filename)))
+
+def _name_index(filename):
+    """Índice de busca sem acentos sobre os colaboradores das linhas de _hours_frame."""
+    from .name_search import NameIndex
+    folder = data_folder()
+
+    def build():
+        df = _hours_frame(filename)
+        return NameIndex(df['OBSERVAÇÃO'] if 'OBSERVAÇÃO' in df.columns else [])
 
-    # 8) garante coluna DISCIPLINA
-    if 'DISCIPLINA' not in df.columns:
-        df['DISCIPLINA'] = ''
-    df['DISCIPLINA'] = df['DISCIPLINA'].fillna('').astype(str)
+    return cached(('name_index', folder, filename), _hours_version(filename), build,
+                  disk_dir=_version_dir(filename))
 
-    logger.info(f"Arquivo {filename}: {len(df)} linhas carregadas")
+def _day_index(filename):
+    """Índice de dias (ordinais ordenados) sobre as linhas de _hours_frame."""
+    from .date_index import DayIndex
+    folder = data_folder()
+
+    def build():
+        df = _hours_frame(filename)
+        return DayIndex(df['DATARDO_STR'] if 'DATARDO_STR' in df.columns else [])
+
+    return cached(('day_index', folder, filename), _hours_version(filename), build,
+                  disk_dir=_version_dir(filename))
+
+def _date_range():
+    """Filtros ?from=&to= (dd/mm/YYYY ou YYYY-MM-DD) → (date|None, date|None)."""
+    from .date_index import parse_day
+    return parse_day(request.args.get('from')), parse_day(request.args.get('to'))
+
+def _select_rows(filename, df, search_text, start, end):
+    """
+    Aplica intervalo de datas e busca por nome sobre o frame completo de
+    _hours_frame: o intervalo é uma fatia do índice de dias (busca binária) e
+    a busca só é conferida nas posições dentro dele.
+    """
+    if start or end:
+        positions = _day_index(filename).rows(start, end)
+        if search_text:
+            positions = positions[_name_index(filename).mask(search_text)[positions]]
+        return df.iloc[positions]
+    if search_text:
+        return df[_name_index(filename).mask(search_text)]
     return df
 
+REFERENCE_FILES = ['calendar.xlsx', 'ferias_inss.xlsx', 'Efetivo.xlsx', 'Justificativas.xlsx']
+
+def _reference_data():
+    """Planilhas de referência (calendário, efetivo, férias/INSS, justificativas), cacheadas por versão."""
+    from .validation_grid import load_reference, REFERENCE_FORMAT
+    folder = data_folder()
+    return cached(('reference', folder), (REFERENCE_FORMAT, folder_version(folder, REFERENCE_FILES)),
+                  lambda: load_reference(folder), disk_dir=_cache_dir())
+
+def _validation_grid(filename):
+    """
+    Grade de validação do arquivo atualizada até ontem (data de corte).
+    Persistida por versão dos dados; quando o corte avança só os dias novos são calculados.
+    """
+    from .validation_grid import get_grid
+    version, cutoff_date = _grid_version(filename)
+    logger.info(f"Data de corte para cobrança: {cutoff_date.strftime('%d/%m/%Y')}")
+    return get_grid(data_folder(), filename, version, cutoff_date,
+                    lambda: _daily_totals(filename), _reference_data, _version_dir(filename))
+
+def _offload(fn, *args, cancelled=None):
+    """
+    Roda fn(*args) em um processo do pool (Config.OFFLOAD_WORKERS), com tempo
+    limite Config.OFFLOAD_TIMEOUT e cancelado se o cliente desta requisição
+    desconectar (ou quando `cancelled()` ficar verdadeiro, se informado).
+    """
+    from . import offload, profiling
+    environ = request.environ
+    # requisição perfilada (?_profile=): o cálculo fica nesta thread para entrar no relatório
+    return offload.run(fn, *args,
+                       workers=0 if profiling.active() else current_app.config['OFFLOAD_WORKERS'],
+                       timeout=current_app.config['OFFLOAD_TIMEOUT'],
+                       cancelled=cancelled or (lambda: offload.client_disconnected(environ)))
+
+def _ready_grid(filename):
+    """
+    Grade de validação para as rotas: se ainda não está pronta em memória, é
+    calculada em um processo do pool (que a grava em .cache) e então lida do
+    disco aqui, sem ocupar a thread da requisição com o cálculo.
+    O processo só é encerrado quando todas as requisições que esperam pela
+    grade desconectaram; quem segue conectado depois de um cancelamento recomeça.
+    """
+    from . import offload
+    from .validation_grid import grid_ready
+    folder = data_folder()
+    version, cutoff = _grid_version(filename)
+    key = ('offload_grid', folder, filename, version, cutoff)
+    with offload.watching(key, request.environ) as cancelled:
+        while not grid_ready(folder, filename, version, cutoff):
+            try:
+                single_flight(key, lambda: _offload(_build_grid, filename, cancelled=cancelled))
+                break
+            except offload.OffloadCancelled:
+                if offload.client_disconnected(request.environ):
+                    raise
+    return _validation_grid(filename)
+
+def _build_grid(filename):
+    """Executado no processo filho: calcula e grava a grade; nada volta pelo pipe."""
+    _validation_grid(filename)
+
+def _grid_version(filename):
+    """(versão dos dados, data de corte) da grade de validação: corte é ontem."""
+    cutoff_date = datetime.now().date() - timedelta(days=1)
+    return (_hours_version(filename), folder_version(data_folder(), REFERENCE_FILES)), cutoff_date
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def _sheet_name(name):
+    """Nome de aba válido no Excel (até 31 caracteres, sem []:*?/\\, não vazio)."""
+    name = ''.join('_' if ch in '[]:*?/\\' else ch for ch in str(name)).strip()[:31]
+    return name or 'SEM DISCIPLINA'
+
+def _unique_names(names, make, reserved=()):
+    """`make(nome)` para cada nome, com sufixo (2), (3)... quando coincide com outro ou com `reserved`."""
+    seen, out = {r.lower() for r in reserved}, []
+    for name in names:
+        base = candidate = make(name)
+        n = 2
+        while candidate.lower() in seen:
+            suffix = f" ({n})"
+            candidate = base[:31 - len(suffix)] + suffix
+            n += 1
+        seen.add(candidate.lower())
+        out.append(candidate)
+    return out
+
+def _export_mimetype(download_name):
+    return 'application/zip' if download_name.endswith('.zip') else XLSX_MIMETYPE
+
+def _start_export(kind, filters, version, download_name, writer):
+    """
+    Exportação em segundo plano: `writer(fileobj, progress)` roda em um job e o
+    resultado fica em disco por (versão dos dados, filtros), então o mesmo pedido
+    depois é servido direto do arquivo. Clientes JSON (?async=1 ou Accept JSON)
+    recebem o job (202); no navegador, uma página acompanha o progresso e baixa o arquivo.
+    A extensão de `download_name` (.xlsx ou .zip) define a do arquivo gravado.
+    """
+    from .export_jobs import export_path, submit
+    path = export_path(data_folder(), kind, version, filters, ext=download_name.rsplit('.', 1)[-1])
+    wants_json = (request.args.get('async') == '1'
+                  or request.accept_mimetypes.best == 'application/json')
+    if os.path.exists(path) and not wants_json:
+        return send_file(path, download_name=download_name, as_attachment=True,
+                         mimetype=_export_mimetype(download_name))
+
+    job = submit(current_app._get_current_object(), current_project(), current_user.username,
+                 kind, path, download_name, writer)
+    payload = dict(job.as_dict(),
+                   status_url=url_for('main.export_status', job_id=job.id),
+                   download_url=url_for('main.export_download', job_id=job.id))
+    if wants_json:
+        return jsonify(payload), 202
+    return render_template('export_status.html', job=payload)
+
+def prewarm(app):
+    """
+    Carrega nos caches as planilhas de Config.PREWARM_FILES e as de referência,
+    registrando o tempo de cada etapa. Roda em uma thread ao subir a aplicação;
+    como os resultados também vão para uploads/.cache, os demais workers os reaproveitam.
+    """
+    t0 = time.perf_counter()
+    steps = []
+
+    def step(name, fn):
+        start = time.perf_counter()
+        fn()
+        steps.append(f"{name} {time.perf_counter() - start:.2f}s")
+
+    with app.test_request_context():
+        folder = data_folder()
+        try:
+            step('pandas/openpyxl', lambda: (pd.DataFrame, openpyxl.load_workbook))
+            step('referência', _reference_data)
+            for filename in current_app.config['PREWARM_FILES']:
+                if not os.path.exists(os.path.join(folder, filename)):
+                    continue
+                step(f'{filename}: totais', lambda: _daily_totals(filename))
+                step(f'{filename}: linhas', lambda: _hours_frame(filename))
+                step(f'{filename}: cubo', lambda: _rollup(filename))
+                step(f'{filename}: validação', lambda: _validation_grid(filename))
+        except Exception:
+            logger.exception("Falha no pré-aquecimento dos caches")
+    logger.info(f"Pré-aquecimento em {time.perf_counter() - t0:.2f}s ({', '.join(steps)})")
+
 def _sync_justificativas():
     """
     Sincroniza os dados de atestado_falta.xlsx com Justificativas.xlsx.
     Atualiza, adiciona ou remove registros de justificativas com base nos atestados,
     preservando justificativas não relacionadas a atestados.
     """
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     atestado_path = os.path.join(folder, 'atestado_falta.xlsx')
     just_path = os.path.join(folder, 'Justificativas.xlsx')
 
@@ -181,8 +445,7 @@ def _sync_justificativas():
         )
 
         # Salva o arquivo atualizado
-        with pd.ExcelWriter(just_path, engine='openpyxl') as writer:
-            updated_just_df.to_excel(writer, index=False, sheet_name='Justificativas')
+        _save_sheet(just_path, updated_just_df, 'Justificativas')
         logger.info(f"Justificativas.xlsx atualizado com {len(updated_just_df)} registros")
     except Exception as e:
         logger.error(f"Erro ao sincronizar Justificativas.xlsx: {str(e)}")
@@ -191,7 +454,7 @@ def _sync_justificativas():
 @bp.route('/')
 @login_required
 def dashboard():
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     sel_file = 'dados.xlsx'
     path_file = os.path.join(folder, sel_file)
 
@@ -203,44 +466,51 @@ def dashboard():
             disciplines=[], selected_discipline='All',
             dates=[], selected_date='All',
             error_options=['All', 'Ok', 'Erro'], selected_error='All',
-            search_text='',
+            search_text='', date_from='', date_to='',
             cards=[], entries=[]
         )
 
-    df = _load_df(sel_file)
-
-    grp = (df.groupby(['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], as_index=False)
-             .agg({'HORA NORMAL': 'sum', 'HORA EXTRA': 'sum'}))
-    grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
-    tol = 0.01
-    grp['ERROR'] = ~(
-        grp['TOTAL_HH'].between(7.95, 10.00)
-    )
-    df = df.merge(
-        grp[['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'TOTAL_HH', 'ERROR']],
-        on=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], how='left'
-    )
+    try:
+        df = _hours_frame(sel_file)
+    except HoursReadError as e:
+        # planilha ilegível: avisa e mostra o painel vazio (nada fica em cache)
+        _flash_once(str(e), 'danger')
+        return render_template('dashboard.html',
+            files=[sel_file],
+            selected_file=sel_file,
+            disciplines=[], selected_discipline='All',
+            dates=[], selected_date='All',
+            error_options=['All', 'Ok', 'Erro'], selected_error='All',
+            search_text='', date_from='', date_to='',
+            cards=[], entries=[]
+        )
 
     sel_disc = request.args.get('discipline', 'All')
     sel_date = request.args.get('date', 'All')
     sel_err = request.args.get('error', 'All')
     search_text = request.args.get('search', '').strip()
+    start, end = _date_range()
 
+    # Intervalo e busca por nome via índices; ambos sobre o frame completo
+    df = _select_rows(sel_file, df, search_text, start, end)
     if sel_disc != 'All':
         df = df[df['DISCIPLINA'] == sel_disc]
     if sel_date != 'All':
         df = df[df['DATARDO_STR'] == sel_date]
     if sel_err != 'All':
         df = df[df['ERROR'] == (sel_err == 'Erro')]
-    if search_text:
-        df = df[df['OBSERVAÇÃO'].str.contains(search_text, case=False, na=False)]
 
     disciplines = sorted(df['DISCIPLINA'].unique())
     dates = sorted(df['DATARDO_STR'].unique())
 
+    # Cards saem do cubo; busca por texto e intervalo não são dimensões dele
+    if search_text or start or end:
+        n_records, n_people = len(df), df['OBSERVAÇÃO'].nunique()
+    else:
+        n_records, n_people = _rollup(sel_file).cards(sel_disc, sel_date, sel_err)
     cards = [
-        {'title': 'Registros', 'value': len(df), 'icon': 'fa-file-alt'},
-        {'title': 'Colaboradores', 'value': df['OBSERVAÇÃO'].nunique(), 'icon': 'fa-users'}
+        {'title': 'Registros', 'value': n_records, 'icon': 'fa-file-alt'},
+        {'title': 'Colaboradores', 'value': n_people, 'icon': 'fa-users'}
     ]
     entries = df.to_dict('records')
 
@@ -251,62 +521,185 @@ def dashboard():
         dates=dates, selected_date=sel_date,
         error_options=['All', 'Ok', 'Erro'], selected_error=sel_err,
         search_text=search_text,
+        date_from=start.isoformat() if start else '', date_to=end.isoformat() if end else '',
         cards=cards, entries=entries
     )
 
+@bp.route('/projects', methods=['GET', 'POST'])
+@login_required
+def projects():
+    """Lista os projetos (GET) ou cria um novo (POST, admin) e o seleciona."""
+    if request.method == 'POST':
+        if current_user.role != 'admin':
+            return jsonify({'error': 'Apenas administradores podem criar projetos.'}), 403
+        name = (request.values.get('name') or '').strip()
+        if not create_project(name):
+            return jsonify({'error': 'Nome inválido (use letras, números, - ou _).'}), 400
+        session['project'] = name
+        logger.info(f"Projeto criado: {name}")
+    return jsonify({'projects': list_projects(), 'current': current_project()})
+
+@bp.route('/search/names')
+@login_required
+def search_names():
+    """Autocompletar de colaboradores: ?q=texto&file=dados.xlsx&limit=10 (sem diferenciar acentos)."""
+    sel_file = request.args.get('file', 'dados.xlsx')
+    q = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    if not q or not os.path.exists(os.path.join(data_folder(), sel_file)):
+        return jsonify({'q': q, 'names': []})
+    return jsonify({'q': q, 'names': _name_index(sel_file).suggest(q, limit)})
+
+@bp.route('/rollup/<dimension>')
+@login_required
+def rollup(dimension):
+    """
+    Drill-down do cubo: /rollup/discipline, /rollup/day ou /rollup/collaborator.
+    Aceita os mesmos filtros do dashboard (discipline, date, error).
+    """
+    sel_file = request.args.get('file', 'dados.xlsx')
+    path_file = os.path.join(data_folder(), sel_file)
+    if not os.path.exists(path_file):
+        return jsonify({'error': f"Arquivo '{sel_file}' não encontrado."}), 404
+
+    cube = _rollup(sel_file)
+    sel_disc = request.args.get('discipline', 'All')
+    sel_date = request.args.get('date', 'All')
+    sel_err = request.args.get('error', 'All')
+    if dimension == 'discipline':
+        rows = cube.by_discipline(date=sel_date, error=sel_err)
+    elif dimension == 'day':
+        rows = cube.by_day(discipline=sel_disc, error=sel_err)
+    elif dimension == 'collaborator':
+        rows = cube.by_collaborator(discipline=sel_disc)
+    else:
+        return jsonify({'error': f"Dimensão inválida: {dimension}"}), 404
+    return jsonify({'file': sel_file, 'dimension': dimension, 'rows': rows})
+
+def _person_names(filename, text):
+    """Colaboradores cujo nome contém `text` (sem acentos/maiúsculas), pelo índice de nomes."""
+    index = _name_index(filename)
+    return {index.names[c] for c in index.search(text)}
+
+def _totals_day_index(filename):
+    """Índice de dias sobre as linhas de _daily_totals."""
+    from .date_index import DayIndex
+    return cached(('totals_day_index', data_folder(), filename), _hours_version(filename),
+                  lambda: DayIndex(_daily_totals(filename)['DATARDO_STR']))
+
+def _api_hours(filename, disc, start, end, person):
+    df = _select_rows(filename, _hours_frame(filename), person, start, end)
+    return df[df['DISCIPLINA'] == disc] if disc != 'All' and not df.empty else df
+
+def _api_daily_totals(filename, disc, start, end, person):
+    df = _daily_totals(filename)
+    if start or end:
+        df = df.iloc[_totals_day_index(filename).rows(start, end)]
+    if disc != 'All':
+        df = df[df['DISCIPLINA'] == disc]
+    if person:
+        df = df[df['OBSERVAÇÃO'].isin(_person_names(filename, person))]
+    return df
+
+def _api_validation(filename, disc, start, end, person):
+    names = _person_names(filename, person) if person else None
+    return _ready_grid(filename).cells(disc, start, end, names)
+
+def _api_pending(filename, disc, start, end, person):
+    lines = _ready_grid(filename).pending(disc, 'All', start, end)
+    df = pd.DataFrame(lines, columns=['NOME', 'DISCIPLINA', 'DATA'])
+    if person:
+        df = df[df['NOME'].isin(_person_names(filename, person))]
+    return df
+
+# Conjuntos da API de leitura → função (arquivo, disciplina, início, fim, pessoa) → DataFrame
+API_DATASETS = {
+    'hours': _api_hours,
+    'daily_totals': _api_daily_totals,
+    'validation': _api_validation,
+    'pending': _api_pending,
+}
+
+@bp.route('/api/<dataset>')
+@login_required
+@roles_required('admin', 'editor')
+def read_api(dataset):
+    """
+    API de leitura para BI, servida dos dados já normalizados em cache:
+    /api/hours, /api/daily_totals, /api/validation (grade em formato longo) e
+    /api/pending. Filtros: file (obrigatório), discipline, from/to (dd/mm/YYYY
+    ou YYYY-MM-DD), person (trecho do nome, sem acentos); fields=A,B escolhe as
+    colunas. format=json (colunar), csv (em blocos) ou arrow (requer pyarrow),
+    ou pelo cabeçalho Accept.
+    """
+    from .columnar import negotiate, select_fields, respond, UnsupportedFormat
+    from .offload import OffloadTimeout, OffloadCancelled
+    build = API_DATASETS.get(dataset)
+    if build is None:
+        return jsonify({'error': f"Conjunto inválido: {dataset} (use {', '.join(API_DATASETS)})."}), 404
+    sel_file = request.args.get('file')
+    if not sel_file:
+        return jsonify({'error': 'Parâmetro file é obrigatório.'}), 400
+    if not os.path.exists(os.path.join(data_folder(), sel_file)):
+        return jsonify({'error': f"Arquivo '{sel_file}' não encontrado."}), 404
+    try:
+        fmt = negotiate(request.args.get('format'), request.accept_mimetypes)
+    except UnsupportedFormat as e:
+        return jsonify({'error': str(e)}), 406
+
+    start, end = _date_range()
+    try:
+        df = build(sel_file, request.args.get('discipline', 'All'), start, end,
+                   request.args.get('person', '').strip())
+        df = select_fields(df, request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except (OffloadTimeout, OffloadCancelled):
+        return jsonify({'error': 'O cálculo da grade demorou demais; tente novamente em instantes.'}), 503
+    logger.info(f"[API] {dataset} de {sel_file}: {len(df)} linhas em {fmt}")
+    return respond(df, fmt, f"{dataset}_{os.path.splitext(sel_file)[0]}")
+
 @bp.route('/export_dashboard')
 @login_required
 @roles_required('admin', 'editor')
 def export_dashboard():
-    folder = current_app.config['UPLOAD_FOLDER']
     sel_file = request.args.get('file')
     sel_disc = request.args.get('discipline', 'All')
     sel_date = request.args.get('date', 'All')
     sel_err = request.args.get('error', 'All')
     search = request.args.get('search', '').strip()
+    start, end = _date_range()
+    if not sel_file:
+        flash('Selecione um arquivo para exportar.', 'warning')
+        return redirect(url_for('main.dashboard'))
 
-    df = _load_df(sel_file) if sel_file else pd.DataFrame()
-    grp = (df.groupby(['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], as_index=False)
-             .agg({'HORA NORMAL': 'sum', 'HORA EXTRA': 'sum'}))
-    grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
-    tol = 0.01
-    grp['ERROR'] = ~(
-        grp['TOTAL_HH'].between(7.95, 8.80) |
-        grp['TOTAL_HH'].sub(9).abs().le(tol) |
-        grp['TOTAL_HH'].sub(10).abs().le(tol)
-    )
-    df = df.merge(
-        grp[['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'TOTAL_HH', 'ERROR']],
-        on=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], how='left'
-    )
-    if sel_disc != 'All': df = df[df['DISCIPLINA'] == sel_disc]
-    if sel_date != 'All': df = df[df['DATARDO_STR'] == sel_date]
-    if sel_err != 'All': df = df[df['ERROR'] == (sel_err == 'Erro')]
-    if search: df = df[df['OBSERVAÇÃO'].str.contains(search, case=False, na=False)]
-
-    export_df = df[[
-        'DATARDO_STR', 'OBSERVAÇÃO', 'DISCIPLINA', 'TOTAL_HH', 'ERROR', 'HORA NORMAL', 'HORA EXTRA'
-    ]].copy()
-    export_df.columns = [
-        'DATA', 'COLABORADOR', 'DISCIPLINA', 'TOTAL HH', 'STATUS_ERRO', 'HH NORMAL', 'HH EXTRA'
-    ]
-
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
-        export_df.to_excel(writer, index=False, sheet_name='Dashboard')
-    buf.seek(0)
-    return send_file(
-        buf,
-        download_name=f"dashboard_export_{sel_file or 'all'}.xlsx",
-        as_attachment=True,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    def write(f, progress):
+        progress(0.1, 'Filtrando registros')
+        df = _select_rows(sel_file, _hours_frame(sel_file), search, start, end)
+        if sel_disc != 'All': df = df[df['DISCIPLINA'] == sel_disc]
+        if sel_date != 'All': df = df[df['DATARDO_STR'] == sel_date]
+        if sel_err != 'All': df = df[df['ERROR'] == (sel_err == 'Erro')]
+
+        export_df = df[[
+            'DATARDO_STR', 'OBSERVAÇÃO', 'DISCIPLINA', 'TOTAL_HH', 'ERROR', 'HORA NORMAL', 'HORA EXTRA'
+        ]].copy()
+        export_df.columns = [
+            'DATA', 'COLABORADOR', 'DISCIPLINA', 'TOTAL HH', 'STATUS_ERRO', 'HH NORMAL', 'HH EXTRA'
+        ]
+        progress(0.5, f'Gravando {len(export_df)} linhas')
+        with pd.ExcelWriter(f, engine='openpyxl') as writer:
+            export_df.to_excel(writer, index=False, sheet_name='Dashboard')
+
+    filters = {'file': sel_file, 'discipline': sel_disc, 'date': sel_date, 'error': sel_err,
+               'search': search, 'from': start, 'to': end}
+    return _start_export('dashboard', filters, _hours_version(sel_file),
+                         f"dashboard_export_{sel_file}.xlsx", write)
 
 @bp.route('/save_justifications', methods=['POST'])
 @login_required
 @roles_required('admin', 'editor')
 def save_justifications():
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     sel_file = request.form.get('file')
     records = []
     for key, val in request.form.items():
@@ -332,53 +725,247 @@ def save_justifications():
 @login_required
 @roles_required('admin', 'editor')
 def export_all():
+    """Todas as linhas do arquivo: uma aba por disciplina e a aba 'Todos' (em segundo plano)."""
     sel_file = request.args.get('file')
-    df = _load_df(sel_file)
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
-        for disc, grp in df.groupby('DISCIPLINA'):
-            grp.to_excel(writer, sheet_name=disc[:31], index=False)
-        df.to_excel(writer, sheet_name='Todos', index=False)
-    buf.seek(0)
-    return send_file(buf,
-        download_name=f"export_{sel_file}.xlsx",
-        as_attachment=True,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+    start, end = _date_range()
+    if not sel_file:
+        flash('Selecione um arquivo para exportar.', 'warning')
+        return redirect(url_for('main.dashboard'))
+
+    def write(f, progress):
+        progress(0.0, 'Lendo planilha')
+        # HoursReadError encerra o job com erro; nada fica em .exports
+        df = _read_hours(sel_file)
+        if (start or end) and not df.empty:
+            from .date_index import DayIndex
+            df = df.iloc[DayIndex(df['DATARDO_STR']).rows(start, end)]
+        groups = list(df.groupby('DISCIPLINA')) if not df.empty else []
+        with pd.ExcelWriter(f, engine='openpyxl') as writer:
+            for k, (disc, grp) in enumerate(groups):
+                progress(0.1 + 0.8 * k / len(groups), f'Aba {disc}')
+                grp.to_excel(writer, sheet_name=_sheet_name(disc), index=False)
+            progress(0.9, 'Aba Todos')
+            df.to_excel(writer, sheet_name='Todos', index=False)
+
+    return _start_export('all', {'file': sel_file, 'from': start, 'to': end},
+                         _hours_version(sel_file), f"export_{sel_file}.xlsx", write)
+
+@bp.route('/exports/<job_id>')
+@login_required
+@roles_required('admin', 'editor')
+def export_status(job_id):
+    """Progresso de uma exportação em segundo plano (JSON)."""
+    from .export_jobs import get_job
+    job = get_job(current_app, job_id)
+    if job is None or not job.visible_to(current_user):
+        return jsonify({'error': 'Exportação não encontrada.'}), 404
+    return jsonify(dict(job.as_dict(), download_url=url_for('main.export_download', job_id=job.id)))
+
+@bp.route('/exports/<job_id>/download')
+@login_required
+@roles_required('admin', 'editor')
+def export_download(job_id):
+    from .export_jobs import get_job
+    job = get_job(current_app, job_id)
+    if job is None or not job.visible_to(current_user) or job.status != 'done' or not os.path.exists(job.path):
+        flash('Exportação não encontrada ou ainda em andamento.', 'warning')
+        return redirect(url_for('main.dashboard'))
+    return send_file(job.path, download_name=job.download_name, as_attachment=True,
+                     mimetype=_export_mimetype(job.download_name))
 
 @bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 @roles_required('admin', 'editor')
 def upload():
     if request.method == 'POST':
-        h = request.files.get('file')
-        d = request.files.get('discipline_file')
-        if h and h.filename.lower().endswith(('.xls', '.xlsx')):
-            h.save(os.path.join(current_app.config['UPLOAD_FOLDER'], h.filename))
-            flash('Horas carregadas!', 'success')
-        if d and d.filename.lower().endswith(('.xls', '.xlsx')):
-            d.save(os.path.join(current_app.config['UPLOAD_FOLDER'], 'mapping.xlsx'))
-            flash('Disciplinas carregadas!', 'success')
-        a = request.files.get('admissions_file')
-        if a and a.filename.lower().endswith(('.xls', '.xlsx')):
-            a.save(os.path.join(current_app.config['UPLOAD_FOLDER'], 'admissoes_desligamentos.xlsx'))
-            flash('Admissões/Desligamentos carregados!', 'success')
-        v = request.files.get('vacation_file')
-        if v and v.filename.lower().endswith(('.xls', '.xlsx')):
-            v.save(os.path.join(current_app.config['UPLOAD_FOLDER'], 'ferias_inss.xlsx'))
-            flash('Férias/INSS carregados!', 'success')
+        from werkzeug.utils import secure_filename
+        from .upload_check import store_upload, EXCEL_EXTENSIONS
+        folder = data_folder()
+        chunk_size = current_app.config['UPLOAD_CHUNK_SIZE']
+        # (campo do formulário, nome de destino — None mantém o enviado, mensagem)
+        fields = [
+            ('file', None, 'Horas carregadas!'),
+            ('discipline_file', 'mapping.xlsx', 'Disciplinas carregadas!'),
+            ('admissions_file', 'admissoes_desligamentos.xlsx', 'Admissões/Desligamentos carregados!'),
+            ('vacation_file', 'ferias_inss.xlsx', 'Férias/INSS carregados!'),
+        ]
+        for field, target, message in fields:
+            f = request.files.get(field)
+            if not (f and f.filename):
+                continue
+            if not f.filename.lower().endswith(EXCEL_EXTENSIONS):
+                flash(f"'{f.filename}': formato não suportado (use .xlsx; salve arquivos .xls como .xlsx).", 'danger')
+                continue
+            # mesmo saneamento do upload em lote: o nome enviado não escolhe o caminho
+            name = target or secure_filename(f.filename)
+            if not name.lower().endswith(EXCEL_EXTENSIONS):
+                flash(f"Nome de arquivo inválido: '{f.filename}'.", 'danger')
+                continue
+            if store_upload(f, folder, name, chunk_size,
+                            current_user.username, current_app.config['DATASET_VERSIONS_KEEP']):
+                flash(message, 'success')
+            else:
+                flash(f"'{f.filename}' é idêntico ao arquivo atual; nada foi recarregado.", 'info')
         return redirect(url_for('main.dashboard'))
     return render_template('upload.html')
 
+@bp.route('/upload/bulk', methods=['POST'])
+@login_required
+@roles_required('admin', 'editor')
+def upload_bulk():
+    """
+    Recebe várias planilhas de uma vez, grava cada uma em área temporária
+    e valida abas/cabeçalhos em paralelo. Só substitui os arquivos ativos
+    se TODAS passarem (ou nunca, com dry_run=1). Retorna relatório por arquivo.
+    """
+    from .upload_check import stage_uploads, check_staged, promote_staged, unchanged_staged, discard_batch
+    folder = data_folder()
+    files = [f for f in request.files.getlist('files') if f and f.filename]
+    dry_run = request.values.get('dry_run', '0') in ('1', 'true', 'on')
+    if not files:
+        return jsonify({'ok': False, 'promoted': False, 'files': [], 'error': 'Nenhum arquivo enviado.'}), 400
+
+    batch_dir, staged, rejected = stage_uploads(
+        files, folder, current_app.config['UPLOAD_CHUNK_SIZE']
+    )
+    try:
+        reports = check_staged(staged, current_app.config['UPLOAD_CHECK_WORKERS']) + rejected
+        all_ok = all(r['ok'] for r in reports)
+        promoted = all_ok and not dry_run
+        # no dry run também: o relatório diz quais arquivos não mudariam
+        unchanged = unchanged_staged(staged, folder)
+        if promoted:
+            unchanged = promote_staged(staged, folder, current_user.username,
+                                       current_app.config['DATASET_VERSIONS_KEEP'])
+            logger.info(f"Upload em lote: {len(staged) - len(unchanged)} arquivo(s) substituído(s), {len(unchanged)} sem alteração")
+        else:
+            logger.info(f"Upload em lote não aplicado ({sum(not r['ok'] for r in reports)} arquivo(s) inválido(s), dry_run={dry_run})")
+    finally:
+        discard_batch(batch_dir)
+
+    for r in reports:
+        r['unchanged'] = r['file'] in unchanged
+    return jsonify({'ok': all_ok, 'promoted': promoted, 'files': reports}), (200 if all_ok else 422)
+
+def _version_summary(folder, filename, digest):
+    """Resumo de uma versão guardada da planilha de horas (lida do cache da própria versão)."""
+    from .ingest import load_hours
+    df = load_hours(folder, filename, GRID_COLUMNS, digest=digest)
+    if df.empty:
+        return {'rows': 0, 'collaborators': [], 'first_day': None, 'last_day': None,
+                'normal_hours': 0.0, 'overtime_hours': 0.0, 'disciplines': {}}
+    days = pd.to_datetime(df['DATARDO_STR'], format='%d/%m/%Y', errors='coerce')
+    by_disc = df.groupby('DISCIPLINA')[['HORA NORMAL', 'HORA EXTRA']].sum().sum(axis=1)
+    return {
+        'rows': int(len(df)),
+        'collaborators': sorted(df['OBSERVAÇÃO'].unique()),
+        'first_day': days.min().strftime('%d/%m/%Y') if days.notna().any() else None,
+        'last_day': days.max().strftime('%d/%m/%Y') if days.notna().any() else None,
+        'normal_hours': round(float(df['HORA NORMAL'].sum()), 2),
+        'overtime_hours': round(float(df['HORA EXTRA'].sum()), 2),
+        'disciplines': {k or 'SEM DISCIPLINA': round(float(v), 2) for k, v in by_disc.items()},
+    }
+
+@bp.route('/versions')
+@login_required
+@roles_required('admin', 'editor')
+def versions():
+    """Histórico de versões de cada planilha enviada, com a versão ativa."""
+    from .dataset_store import history
+    return render_template('versions.html', files=history(data_folder()))
+
+@bp.route('/versions/activate', methods=['POST'])
+@login_required
+@roles_required('admin', 'editor')
+def activate_version():
+    """Volta (ou avança) um arquivo para outra versão guardada, sem reenviar nem reler a planilha."""
+    from .dataset_store import activate
+    name = request.form.get('file', '')
+    digest = request.form.get('hash', '')
+    try:
+        activate(data_folder(), name, digest)
+    except KeyError:
+        flash('Versão não encontrada.', 'danger')
+        return redirect(url_for('main.versions'))
+    logger.info(f"{current_user.username} ativou a versão {digest[:12]} de {name}")
+    flash(f"{name}: versão {digest[:12]} ativada.", 'success')
+    return redirect(url_for('main.versions'))
+
+@bp.route('/versions/compare')
+@login_required
+@roles_required('admin', 'editor')
+def compare_versions():
+    """Compara duas versões guardadas de uma planilha de horas: ?file=&a=<hash>&b=<hash>."""
+    from .dataset_store import read_manifest
+    from .upload_check import SCHEMAS
+    name = request.args.get('file', '')
+    a, b = request.args.get('a', ''), request.args.get('b', '')
+    entry = read_manifest(data_folder())['files'].get(name)
+    known = {v['hash']: v for v in entry['versions']} if entry else {}
+    if a not in known or b not in known:
+        return jsonify({'error': 'Versão não encontrada.'}), 404
+    result = {'file': name, 'a': known[a], 'b': known[b]}
+    if name.lower() in SCHEMAS:
+        return jsonify(result)
+
+    sa = _version_summary(data_folder(), name, a)
+    sb = _version_summary(data_folder(), name, b)
+    people_a, people_b = set(sa.pop('collaborators')), set(sb.pop('collaborators'))
+    sa['collaborators'], sb['collaborators'] = len(people_a), len(people_b)
+    discs = sorted(set(sa['disciplines']) | set(sb['disciplines']))
+    result.update({
+        'summary_a': sa,
+        'summary_b': sb,
+        'only_in_a': sorted(people_a - people_b),
+        'only_in_b': sorted(people_b - people_a),
+        'hours_by_discipline': [
+            {'discipline': d, 'a': sa['disciplines'].get(d, 0.0), 'b': sb['disciplines'].get(d, 0.0),
+             'difference': round(sb['disciplines'].get(d, 0.0) - sa['disciplines'].get(d, 0.0), 2)}
+            for d in discs
+        ],
+    })
+    return jsonify(result)
+
+@bp.route('/admin/profiles')
+@login_required
+@roles_required('admin')
+def profiles():
+    """Relatórios de perfil gravados por ?_profile=cpu|mem."""
+    from .profiling import list_reports
+    return render_template('profiles.html', reports=list_reports(current_app), report=None)
+
+@bp.route('/admin/profiles/<report_id>')
+@login_required
+@roles_required('admin')
+def profile_report(report_id):
+    from .profiling import list_reports, load_report
+    report = load_report(current_app, report_id)
+    if report is None:
+        flash('Relatório de perfil não encontrado.', 'warning')
+        return redirect(url_for('main.profiles'))
+    return render_template('profiles.html', reports=list_reports(current_app), report=report)
+
+@bp.route('/admin/profiles/<report_id>/download')
+@login_required
+@roles_required('admin')
+def profile_download(report_id):
+    """Estatísticas cProfile brutas (.prof), para pstats/snakeviz."""
+    from .profiling import prof_path
+    path = prof_path(current_app, report_id)
+    if path is None:
+        flash('Arquivo .prof não encontrado.', 'warning')
+        return redirect(url_for('main.profiles'))
+    return send_file(path, download_name=f"{report_id}.prof", as_attachment=True)
+
 @bp.route('/atestado', methods=['GET', 'POST'])
 @login_required
 @roles_required('admin', 'editor')
 def atestado():
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     sel_file = request.args.get('file')
     sel_disc = request.args.get('discipline', 'All')
 
-    df_all = _load_df(sel_file) if sel_file else pd.DataFrame()
+    df_all = _load_df(sel_file, PICKER_COLUMNS) if sel_file else pd.DataFrame()
     if df_all.empty and sel_file:
         flash('Arquivo selecionado não encontrado ou inválido.', 'danger')
         return redirect(url_for('main.dashboard'))
@@ -426,8 +1013,7 @@ def atestado():
                         df_new[col] = ''
                 df_new = df_new[hist.columns]
             hist = pd.concat([hist, df_new], ignore_index=True)
-            with pd.ExcelWriter(path_xlsx, engine='openpyxl') as writer:
-                hist.to_excel(writer, index=False, sheet_name='Atestados')
+            _save_sheet(path_xlsx, hist, 'Atestados')
             flash('Registro salvo com sucesso.', 'success')
             # Sincroniza com Justificativas.xlsx
             _sync_justificativas()
@@ -452,7 +1038,7 @@ def atestado():
 @login_required
 @roles_required('admin', 'editor')
 def atestado_delete(idx):
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     path_xlsx = os.path.join(folder, 'atestado_falta.xlsx')
     sel_file = request.args.get('file')
     sel_disc = request.args.get('discipline', 'All')
@@ -466,8 +1052,7 @@ def atestado_delete(idx):
         df = df.fillna('').astype(str)
         if 0 <= idx < len(df):
             df = df.drop(df.index[idx]).reset_index(drop=True)
-            with pd.ExcelWriter(path_xlsx, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Atestados')
+            _save_sheet(path_xlsx, df, 'Atestados')
             flash('Registro excluído com sucesso.', 'success')
             # Sincroniza com Justificativas.xlsx
             _sync_justificativas()
@@ -482,7 +1067,7 @@ def atestado_delete(idx):
 @login_required
 @roles_required('admin', 'editor')
 def atestado_edit(idx):
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     path_xlsx = os.path.join(folder, 'atestado_falta.xlsx')
     sel_file = request.args.get('file')
     sel_disc = request.args.get('discipline', 'All')
@@ -517,15 +1102,14 @@ def atestado_edit(idx):
                 if col not in ['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'DESVIO']:
                     df.at[idx, col] = request.form.get(col, '').strip()
 
-            with pd.ExcelWriter(path_xlsx, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Atestados')
+            _save_sheet(path_xlsx, df, 'Atestados')
             flash('Registro atualizado com sucesso.', 'success')
             # Sincroniza com Justificativas.xlsx
             _sync_justificativas()
             return redirect(url_for('main.atestado', file=sel_file, discipline=sel_disc))
 
         record = df.iloc[idx].to_dict()
-        df_all = _load_df(sel_file) if sel_file else pd.DataFrame()
+        df_all = _load_df(sel_file, PICKER_COLUMNS) if sel_file else pd.DataFrame()
         disciplines_all = sorted(df_all['DISCIPLINA'].unique()) if not df_all.empty else []
         df_filtered = df_all[df_all['DISCIPLINA'] == sel_disc] if sel_disc != 'All' else df_all
         collaborators = sorted(df_filtered['OBSERVAÇÃO'].unique()) if not df_filtered.empty else []
@@ -552,467 +1136,127 @@ def atestado_edit(idx):
 @login_required
 @roles_required('admin', 'editor')
 def validation():
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     sel_file = request.args.get('file')
     sel_disc = request.args.get('discipline', 'All')
     files = sorted(f for f in os.listdir(folder) if f.lower().endswith(('.xls', '.xlsx')))
 
-    # 1) Data de corte (dia anterior ao atual)
-    cutoff_date = datetime.now().date() - timedelta(days=1)
-    logger.info(f"Data de corte para cobrança: {cutoff_date.strftime('%d/%m/%Y')}")
-
-    # 2) Calendário
-    cal_path = os.path.join(folder, 'calendar.xlsx')
-    has_calendar = os.path.exists(cal_path)
-    cobrar_days = set()
-    if has_calendar:
-        cal_df = pd.read_excel(cal_path, sheet_name=0, dtype={'DATA': object, 'COBRAR?': str})
-        cal_df['DATA'] = pd.to_datetime(cal_df['DATA'], dayfirst=True, errors='coerce')
-        cobrar_days = set(
-            cal_df.loc[
-                (cal_df['COBRAR?'].str.strip().str.lower() == 'sim') &
-                (cal_df['DATA'].dt.date <= cutoff_date),
-                'DATA'
-            ].dt.strftime('%d/%m/%Y').dropna()
-        )
-    else:
-        logger.info("Nenhum calendar.xlsx encontrado, usando todas as datas até o dia anterior.")
-
-    # 3) Férias & INSS
-    fer_inss = os.path.join(folder, 'ferias_inss.xlsx')
-    if os.path.exists(fer_inss):
-        vac_df = pd.read_excel(fer_inss, sheet_name='Férias')
-        vac_df.columns = vac_df.columns.str.strip()
-        col_map = {}
-        for col in vac_df.columns:
-            low = col.lower().replace('_', ' ').replace('-', ' ').strip()
-            if 'início' in low or 'inicio' in low:
-                col_map[col] = 'Férias - Início'
-            if 'término' in low or 'termino' in low:
-                col_map[col] = 'Férias - Término'
-        vac_df = vac_df.rename(columns=col_map)
-        vac_df['Férias - Início'] = pd.to_datetime(vac_df['Férias - Início'], dayfirst=True, errors='coerce').dt.date
-        vac_df['Férias - Término'] = pd.to_datetime(vac_df['Férias - Término'], dayfirst=True, errors='coerce').dt.date
-        vac_df['NOME'] = vac_df['NOME'].str.strip()
-        vac_df['DISCIPLINA'] = vac_df['DISCIPLINA'].fillna('').astype(str)
-
-        inss_df = pd.read_excel(fer_inss, sheet_name='INSS', dtype=str)
-        inss_df['Início'] = pd.to_datetime(inss_df['Início'], dayfirst=False, errors='coerce').dt.date
-        inss_df['Término'] = pd.to_datetime(inss_df['Término'], dayfirst=False, errors='coerce').dt.date
-        inss_df['NOME'] = inss_df['NOME'].str.strip()
-        inss_df['DISCIPLINA'] = inss_df['DISCIPLINA'].fillna('').astype(str)
-    else:
-        vac_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Férias - Início', 'Férias - Término'])
-        inss_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Início', 'Término'])
-
-    # 4) Efetivo, admissões e desligamentos
-    ef_path = os.path.join(folder, 'Efetivo.xlsx')
-    if os.path.exists(ef_path):
-        all_eff = pd.read_excel(ef_path, sheet_name=0, dtype=str)
-        status_col = all_eff.columns[2]
-        eff_names = all_eff.loc[all_eff[status_col].str.strip() == 'MOD', all_eff.columns[0]].str.strip().tolist()
-        eff_disciplines = all_eff.loc[all_eff[status_col].str.strip() == 'MOD', all_eff.columns[1]].str.strip().tolist()
-        eff_df = pd.DataFrame({'OBSERVAÇÃO': eff_names, 'DISCIPLINA': eff_disciplines})
-
-        adm_raw = pd.read_excel(ef_path, sheet_name=1, dtype=str)
-        adm_df = pd.DataFrame({
-            'OBSERVAÇÃO': adm_raw.iloc[:, 0].str.strip(),
-            'DISCIPLINA': adm_raw.iloc[:, 1].fillna('').astype(str),
-            'DATA': pd.to_datetime(adm_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
-        })
-
-        term_raw = pd.read_excel(ef_path, sheet_name=2, dtype=str)
-        term_df = pd.DataFrame({
-            'OBSERVAÇÃO': term_raw.iloc[:, 0].str.strip(),
-            'DISCIPLINA': term_raw.iloc[:, 1].fillna('').astype(str),
-            'DATA': pd.to_datetime(term_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
-        })
-    else:
-        eff_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA'])
-        eff_names = []
-        adm_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
-        term_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
-
-    # 5) Justificativas
-    just_path = os.path.join(folder, 'Justificativas.xlsx')
-    if os.path.exists(just_path):
-        just_raw = pd.read_excel(just_path, sheet_name='Justificativas')
-        just_raw['OBSERVAÇÃO'] = just_raw['OBSERVAÇÃO'].str.strip()
-        just_raw['DISCIPLINA'] = just_raw['DISCIPLINA'].fillna('').str.strip()
-        just_raw['DATA'] = pd.to_datetime(just_raw['DATA'], dayfirst=True, errors='coerce')
-        just_raw['DATARDO_STR'] = just_raw['DATA'].dt.strftime('%d/%m/%Y')
-        just_raw['FRENTE DE TRABALHO'] = just_raw['FRENTE DE TRABALHO'].fillna('').astype(str)
-        just_raw['CODIGO'] = just_raw['CODIGO'].fillna('').astype(str).str.strip()
-        just_df = just_raw[['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO']]
-    else:
-        just_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO'])
-
-    # 6) Prepara pivot
-    pivot = []
-    dates_list = []
     disciplines = []
-    columns = []
-
     if sel_file:
-        # 6.1) Carrega e normaliza horas
-        df = _load_df(sel_file)
-        for std in ['HORA NORMAL', 'HORA EXTRA']:
-            if std not in df.columns:
-                m = next((c for c in df.columns if c.strip().lower() == std.lower()), None)
-                if m:
-                    df.rename(columns={m: std}, inplace=True)
-                else:
-                    df[std] = 0.0
-
-        df = df[df['OBSERVAÇÃO'].isin(eff_names)]
-
-        # 6.2) DATARDO_STR
-        if 'DATARDO_STR' not in df.columns and 'DATARDO' in df.columns:
-            df['DATARDO_STR'] = pd.to_datetime(df['DATARDO'], dayfirst=True, errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
-        elif 'DATARDO_STR' not in df.columns:
-            df['DATARDO_STR'] = ''
-
-        # 6.3) Determina o mês e todos os dias até cutoff_date
-        if df['DATARDO_STR'].notna().any():
-            dates = pd.to_datetime(df['DATARDO_STR'], format='%d/%m/%Y', errors='coerce')
-            month = dates.dt.to_period('M').iloc[0] if dates.notna().any() else pd.Timestamp('2025-07-01').to_period('M')
-        else:
-            month = pd.Timestamp('2025-07-01').to_period('M')
-        month_start = month.start_time.date()
-        month_end = min(month.end_time.date(), cutoff_date)
-        all_dates = pd.date_range(month_start, month_end, freq='D')
-        dates_list = [dt.strftime('%d/%m/%Y') for dt in all_dates]
-        columns = ['OBSERVAÇÃO', 'DISCIPLINA'] + dates_list
-
-        if sel_disc != 'All':
-            df = df[df['DISCIPLINA'] == sel_disc]
-            eff_df = eff_df[eff_df['DISCIPLINA'] == sel_disc]
-
-        disciplines = sorted(df['DISCIPLINA'].unique())
-        if sel_disc == 'All':
-            disciplines = sorted(eff_df['DISCIPLINA'].unique())
-
-        # 6.4) Agrupa e pivota
-        grp = df.groupby(['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], as_index=False).agg({'HORA NORMAL': 'sum', 'HORA EXTRA': 'sum'})
-        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
-        table = grp.pivot(index=['OBSERVAÇÃO', 'DISCIPLINA'], columns='DATARDO_STR', values='TOTAL_HH').reset_index().fillna(0)
-
-        # 6.5) Adiciona colaboradores sem registros
-        names_src = pd.concat([
-            vac_df[['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
-            inss_df[['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
-            eff_df[['OBSERVAÇÃO', 'DISCIPLINA']]
-        ]).drop_duplicates()
-        extra = []
-        for _, src in names_src.iterrows():
-            nome, disc = src['OBSERVAÇÃO'], src['DISCIPLINA']
-            if sel_disc != 'All' and disc != sel_disc:
-                continue
-            if nome in eff_names and not ((table['OBSERVAÇÃO'] == nome) & (table['DISCIPLINA'] == disc)).any():
-                row = {'OBSERVAÇÃO': nome, 'DISCIPLINA': disc}
-                for dt in dates_list:
-                    row[dt] = 0.0
-                extra.append(row)
-        if extra:
-            table = pd.concat([table, pd.DataFrame(extra)], ignore_index=True)
-
-        # 6.6) Preenche células
-        for _, row in table.iterrows():
-            rec = {'OBSERVAÇÃO': row['OBSERVAÇÃO'], 'DISCIPLINA': row['DISCIPLINA']}
-            for dt in dates_list:
-                if has_calendar and dt not in cobrar_days:
-                    raw = row.get(dt, 0.0)
-                    if raw == 0 or pd.isna(raw):
-                        rec[dt] = ''
-                        rec[f'{dt}_class'] = 'code-nocharge'
-                        logger.debug(f"Assigned code-nocharge for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                    else:
-                        rec[dt] = f"{raw:.2f}".replace('.', ',')
-                        rec[f'{dt}_class'] = 'hours-cell'
-                        logger.debug(f"Assigned hours {rec[dt]} for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                    continue
-
-                sub_j = just_df[(just_df['OBSERVAÇÃO'] == row['OBSERVAÇÃO']) & (just_df['DISCIPLINA'] == row['DISCIPLINA']) & (just_df['DATARDO_STR'] == dt)]
-                if not sub_j.empty:
-                    code = sub_j['CODIGO'].iloc[0]
-                    text = sub_j['FRENTE DE TRABALHO'].iloc[0]
-                    rec[dt] = code
-                    rec[f'{dt}_class'] = f'code-{code}'
-                    rec[f'{dt}_title'] = text
-                    logger.debug(f"Assigned code-{code} for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                    continue
-
-                dt_date = datetime.strptime(dt, '%d/%m/%Y').date()
-
-                sub_t = term_df[(term_df['OBSERVAÇÃO'] == row['OBSERVAÇÃO']) & (term_df['DISCIPLINA'] == row['DISCIPLINA'])]
-                if not sub_t.empty and dt_date > sub_t['DATA'].iloc[0]:
-                    rec[dt] = 'DL'
-                    rec[f'{dt}_class'] = 'code-DL'
-                    logger.debug(f"Assigned code-DL for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                    continue
-
-                sub_v = vac_df[(vac_df['NOME'] == row['OBSERVAÇÃO']) & (vac_df['DISCIPLINA'] == row['DISCIPLINA'])]
-                if any(v['Férias - Início'] <= dt_date <= v['Férias - Término'] for _, v in sub_v.iterrows()):
-                    rec[dt] = 'F'
-                    rec[f'{dt}_class'] = 'code-F'
-                    logger.debug(f"Assigned code-F for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                    continue
-
-                sub_i = inss_df[(inss_df['NOME'] == row['OBSERVAÇÃO']) & (inss_df['DISCIPLINA'] == row['DISCIPLINA'])]
-                if any(i['Início'] <= dt_date <= i['Término'] for _, i in sub_i.iterrows()):
-                    rec[dt] = 'I'
-                    rec[f'{dt}_class'] = 'code-I'
-                    logger.debug(f"Assigned code-I for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                    continue
-
-                sub_a = adm_df[(adm_df['OBSERVAÇÃO'] == row['OBSERVAÇÃO']) & (adm_df['DISCIPLINA'] == row['DISCIPLINA'])]
-                if not sub_a.empty and dt_date < sub_a['DATA'].iloc[0]:
-                    rec[dt] = 'AG'
-                    rec[f'{dt}_class'] = 'code-AG'
-                    logger.debug(f"Assigned code-AG for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                    continue
-
-                raw = row.get(dt, 0.0)
-                if raw == 0 or pd.isna(raw):
-                    rec[dt] = 'X'
-                    rec[f'{dt}_class'] = 'empty-cell'
-                    logger.debug(f"Assigned empty-cell for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-                else:
-                    rec[dt] = f"{raw:.2f}".replace('.', ',')
-                    rec[f'{dt}_class'] = 'hours-cell'
-                    logger.debug(f"Assigned hours {rec[dt]} for {row['OBSERVAÇÃO']} | {row['DISCIPLINA']} | {dt}")
-
-            pivot.append(rec)
-
-        pivot = sorted(pivot, key=lambda x: (x['DISCIPLINA'], x['OBSERVAÇÃO']))
+        # A grade em si é carregada pelo navegador via /validation/data; aqui só
+        # os filtros, com o cálculo (se ainda não estiver pronto) em processo filho
+        from .offload import OffloadTimeout, OffloadCancelled
+        try:
+            disciplines = _ready_grid(sel_file).disciplines(sel_disc)
+        except (OffloadTimeout, OffloadCancelled):
+            flash('O cálculo da grade demorou demais; tente novamente em instantes.', 'warning')
 
-    logger.info(f"Rendering validation.html with {len(pivot)} pivot records")
     return render_template(
         'validation.html',
         files=files,
         selected_file=sel_file,
         disciplines=disciplines,
-        selected_discipline=sel_disc,
-        dates=dates_list,
-        columns=columns,
-        pivot=pivot
+        selected_discipline=sel_disc
     )
 
+@bp.route('/validation/data')
+@login_required
+@roles_required('admin', 'editor')
+def validation_data():
+    """
+    Grade de validação em JSON colunar: `codes` (int8) e `hours` (float32) são
+    matrizes linhas × dias em base64; `labels`/`classes` traduzem cada código.
+    """
+    sel_file = request.args.get('file')
+    sel_disc = request.args.get('discipline', 'All')
+    if not sel_file:
+        return jsonify({'error': 'Parâmetro file é obrigatório.'}), 400
+
+    from .offload import OffloadTimeout, OffloadCancelled
+    try:
+        data = _ready_grid(sel_file).columnar(sel_disc)
+    except (OffloadTimeout, OffloadCancelled):
+        return jsonify({'error': 'O cálculo da grade demorou demais; tente novamente em instantes.'}), 503
+    codes, hours = data.pop('codes'), data.pop('hours')
+    data.update({
+        'shape': list(codes.shape),
+        'codes_dtype': codes.dtype.name,
+        'codes': base64.b64encode(codes.tobytes()).decode('ascii'),
+        'hours': base64.b64encode(hours.tobytes()).decode('ascii'),
+    })
+    logger.info(f"Grade de validação enviada: {codes.shape[0]} linhas × {codes.shape[1]} dias")
+    return jsonify(data)
+
+@bp.route('/validation/why')
+@login_required
+@roles_required('admin')
+def validation_why():
+    """Explica uma célula da grade: ?file=&name=&discipline=&date=DD/MM/AAAA."""
+    sel_file = request.args.get('file')
+    name = request.args.get('name', '')
+    disc = request.args.get('discipline', '')
+    date = request.args.get('date', '')
+    if not (sel_file and name and date):
+        return jsonify({'error': 'Parâmetros file, name e date são obrigatórios.'}), 400
+
+    from .offload import OffloadTimeout, OffloadCancelled
+    try:
+        grid = _ready_grid(sel_file)
+    except (OffloadTimeout, OffloadCancelled):
+        return jsonify({'error': 'O cálculo da grade demorou demais; tente novamente em instantes.'}), 503
+    info = grid.explain(name, disc, date, _reference_data())
+    if info is None:
+        return jsonify({'error': 'Célula não encontrada na grade.'}), 404
+    return jsonify(info)
+
+@bp.route('/export_validation')
+@login_required
+@roles_required('admin', 'editor')
+def export_validation():
+    """Exporta a grade de validação (com cores e comentários) em XLSX gravado em modo streaming."""
+    from .validation_export import write_validation_xlsx
+    sel_file = request.args.get('file')
+    sel_disc = request.args.get('discipline', 'All')
+    if not sel_file:
+        flash('Selecione um arquivo para exportar.', 'warning')
+        return redirect(url_for('main.validation'))
+
+    def write(f, progress):
+        progress(0.1, 'Calculando grade')
+        grid = _validation_grid(sel_file)
+        progress(0.4, 'Gravando planilha')
+        write_validation_xlsx(grid, f, sel_disc)
+
+    suffix = '' if sel_disc == 'All' else f"_{sel_disc}"
+    return _start_export('validation', {'file': sel_file, 'discipline': sel_disc},
+                         _grid_version(sel_file), f"validacao{suffix}.xlsx", write)
+
 @bp.route('/pending')
 @login_required
 @roles_required('admin', 'editor')
 def pending():
-    folder = current_app.config['UPLOAD_FOLDER']
+    folder = data_folder()
     sel_file = request.args.get('file')
     sel_disc = request.args.get('discipline', 'All')
     sel_date = request.args.get('date', 'All')
+    start, end = _date_range()
     files = sorted(f for f in os.listdir(folder) if f.lower().endswith(('.xls', '.xlsx')))
 
     pending_lines = []
     disciplines = []
     dates = []
 
-    if sel_file:
-        # 1) Data de corte (dia anterior ao atual)
-        cutoff_date = datetime.now().date() - timedelta(days=1)
-        logger.info(f"Data de corte para cobrança: {cutoff_date.strftime('%d/%m/%Y')}")
-
-        df = _load_df(sel_file)
-        for std in ['HORA NORMAL', 'HORA EXTRA']:
-            if std not in df.columns:
-                m = next((c for c in df.columns if c.strip().lower() == std.lower()), None)
-                if m:
-                    df.rename(columns={m: std}, inplace=True)
-                else:
-                    df[std] = 0.0
-
-        ef_path = os.path.join(folder, 'Efetivo.xlsx')
-        eff_names = []
-        if os.path.exists(ef_path):
-            all_eff = pd.read_excel(ef_path, sheet_name=0, dtype=str)
-            status_col = all_eff.columns[2]
-            eff_names = all_eff.loc[all_eff[status_col].str.strip() == 'MOD', all_eff.columns[0]].str.strip().tolist()
-            eff_disciplines = all_eff.loc[all_eff[status_col].str.strip() == 'MOD', all_eff.columns[1]].str.strip().tolist()
-            eff_df = pd.DataFrame({'OBSERVAÇÃO': eff_names, 'DISCIPLINA': eff_disciplines})
-            df = df[df['OBSERVAÇÃO'].isin(eff_names)]
-        else:
-            eff_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA'])
-
-        if 'DATARDO_STR' not in df.columns and 'DATARDO' in df.columns:
-            df['DATARDO_STR'] = pd.to_datetime(df['DATARDO'], dayfirst=True, errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
-        elif 'DATARDO_STR' not in df.columns:
-            df['DATARDO_STR'] = ''
-
-        # 2) Determina o mês e todos os dias até cutoff_date
-        if df['DATARDO_STR'].notna().any():
-            dates_series = pd.to_datetime(df['DATARDO_STR'], format='%d/%m/%Y', errors='coerce')
-            month = dates_series.dt.to_period('M').iloc[0] if dates_series.notna().any() else pd.Timestamp('2025-07-01').to_period('M')
-        else:
-            month = pd.Timestamp('2025-07-01').to_period('M')
-        month_start = month.start_time.date()
-        month_end = min(month.end_time.date(), cutoff_date)
-        all_dates = pd.date_range(month_start, month_end, freq='D')
-
-        # 3) Filtra dias cobráveis
-        cal_path = os.path.join(folder, 'calendar.xlsx')
-        has_calendar = os.path.exists(cal_path)
-        cobrar_days = set()
-        if has_calendar:
-            cal_df = pd.read_excel(cal_path, sheet_name=0, dtype={'DATA': object, 'COBRAR?': str})
-            cal_df['DATA'] = pd.to_datetime(cal_df['DATA'], dayfirst=True, errors='coerce')
-            cobrar_days = set(
-                cal_df.loc[
-                    (cal_df['COBRAR?'].str.strip().str.lower() == 'sim') &
-                    (cal_df['DATA'].dt.date <= cutoff_date),
-                    'DATA'
-                ].dt.strftime('%d/%m/%Y').dropna()
-            )
-        dates = [dt.strftime('%d/%m/%Y') for dt in all_dates if has_calendar and dt.strftime('%d/%m/%Y') in cobrar_days or not has_calendar]
-
-        if sel_disc != 'All':
-            df = df[df['DISCIPLINA'] == sel_disc]
-            eff_df = eff_df[eff_df['DISCIPLINA'] == sel_disc]
-
-        disciplines = sorted(df['DISCIPLINA'].unique())
-        if sel_disc == 'All':
-            disciplines = sorted(eff_df['DISCIPLINA'].unique())
-
-        # 4) Agrupa e pivota
-        grp = df.groupby(['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], as_index=False).agg({'HORA NORMAL': 'sum', 'HORA EXTRA': 'sum'})
-        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
-        table = grp.pivot(index=['OBSERVAÇÃO', 'DISCIPLINA'], columns='DATARDO_STR', values='TOTAL_HH').reset_index().fillna(0)
-
-        # 5) Adiciona colaboradores sem registros
-        fer_inss = os.path.join(folder, 'ferias_inss.xlsx')
-        if os.path.exists(fer_inss):
-            vac_df = pd.read_excel(fer_inss, sheet_name='Férias')
-            vac_df.columns = vac_df.columns.str.strip()
-            col_map = {}
-            for col in vac_df.columns:
-                low = col.lower().replace('_', ' ').replace('-', ' ').strip()
-                if 'início' in low or 'inicio' in low:
-                    col_map[col] = 'Férias - Início'
-                if 'término' in low or 'termino' in low:
-                    col_map[col] = 'Férias - Término'
-            vac_df = vac_df.rename(columns=col_map)
-            vac_df['Férias - Início'] = pd.to_datetime(vac_df['Férias - Início'], dayfirst=True, errors='coerce').dt.date
-            vac_df['Férias - Término'] = pd.to_datetime(vac_df['Férias - Término'], dayfirst=True, errors='coerce').dt.date
-            vac_df['NOME'] = vac_df['NOME'].str.strip()
-            vac_df['DISCIPLINA'] = vac_df['DISCIPLINA'].fillna('').astype(str)
-
-            inss_df = pd.read_excel(fer_inss, sheet_name='INSS', dtype=str)
-            inss_df['Início'] = pd.to_datetime(inss_df['Início'], dayfirst=False, errors='coerce').dt.date
-            inss_df['Término'] = pd.to_datetime(inss_df['Término'], dayfirst=False, errors='coerce').dt.date
-            inss_df['NOME'] = inss_df['NOME'].str.strip()
-            inss_df['DISCIPLINA'] = inss_df['DISCIPLINA'].fillna('').astype(str)
-        else:
-            vac_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Férias - Início', 'Férias - Término'])
-            inss_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Início', 'Término'])
-
-        if os.path.exists(ef_path):
-            adm_raw = pd.read_excel(ef_path, sheet_name=1, dtype=str)
-            adm_df = pd.DataFrame({
-                'OBSERVAÇÃO': adm_raw.iloc[:, 0].str.strip(),
-                'DISCIPLINA': adm_raw.iloc[:, 1].fillna('').astype(str),
-                'DATA': pd.to_datetime(adm_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
-            })
-            term_raw = pd.read_excel(ef_path, sheet_name=2, dtype=str)
-            term_df = pd.DataFrame({
-                'OBSERVAÇÃO': term_raw.iloc[:, 0].str.strip(),
-                'DISCIPLINA': term_raw.iloc[:, 1].fillna('').astype(str),
-                'DATA': pd.to_datetime(term_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
-            })
-        else:
-            adm_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
-            term_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
+    from .offload import OffloadTimeout, OffloadCancelled
+    try:
+        grid = _ready_grid(sel_file) if sel_file else None
+    except (OffloadTimeout, OffloadCancelled):
+        grid = None
+        flash('O cálculo das pendências demorou demais; tente novamente em instantes.', 'warning')
 
-        just_path = os.path.join(folder, 'Justificativas.xlsx')
-        if os.path.exists(just_path):
-            just_raw = pd.read_excel(just_path, sheet_name='Justificativas')
-            just_raw['OBSERVAÇÃO'] = just_raw['OBSERVAÇÃO'].str.strip()
-            just_raw['DISCIPLINA'] = just_raw['DISCIPLINA'].fillna('').str.strip()
-            just_raw['DATA'] = pd.to_datetime(just_raw['DATA'], dayfirst=True, errors='coerce')
-            just_raw['DATARDO_STR'] = just_raw['DATA'].dt.strftime('%d/%m/%Y')
-            just_raw['FRENTE DE TRABALHO'] = just_raw['FRENTE DE TRABALHO'].fillna('').astype(str)
-            just_raw['CODIGO'] = just_raw['CODIGO'].fillna('').astype(str).str.strip()
-            just_df = just_raw[['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO']]
-        else:
-            just_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO'])
-
-        names_src = pd.concat([
-            vac_df[['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
-            inss_df[['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
-            eff_df[['OBSERVAÇÃO', 'DISCIPLINA']]
-        ]).drop_duplicates()
-        extra = []
-        for _, src in names_src.iterrows():
-            nome, disc = src['OBSERVAÇÃO'], src['DISCIPLINA']
-            if sel_disc != 'All' and disc != sel_disc:
-                continue
-            if nome in eff_names and not ((table['OBSERVAÇÃO'] == nome) & (table['DISCIPLINA'] == disc)).any():
-                row = {'OBSERVAÇÃO': nome, 'DISCIPLINA': disc}
-                for dt in dates:
-                    row[dt] = 0.0
-                extra.append(row)
-        if extra:
-            table = pd.concat([table, pd.DataFrame(extra)], ignore_index=True)
-
-        for _, row in table.iterrows():
-            nome = row['OBSERVAÇÃO']
-            disc = row['DISCIPLINA']
-            if sel_disc != 'All' and disc != sel_disc:
-                continue
-            for dt in dates:
-                if sel_date != 'All' and dt != sel_date:
-                    continue
-                if has_calendar and dt not in cobrar_days:
-                    logger.debug(f"Skipping {dt} for {nome} | {disc} (not chargeable)")
-                    continue
-                sub_j = just_df[
-                    (just_df['OBSERVAÇÃO'] == nome) &
-                    (just_df['DISCIPLINA'] == disc) &
-                    (just_df['DATARDO_STR'] == dt)
-                ]
-                if not sub_j.empty:
-                    logger.debug(f"Skipping {dt} for {nome} | {disc} (has justification)")
-                    continue
-                dt_date = datetime.strptime(dt, '%d/%m/%Y').date()
-                sub_t = term_df[
-                    (term_df['OBSERVAÇÃO'] == nome) &
-                    (term_df['DISCIPLINA'] == disc)
-                ]
-                if not sub_t.empty and dt_date > sub_t['DATA'].iloc[0]:
-                    logger.debug(f"Skipping {dt} for {nome} | {disc} (terminated)")
-                    continue
-                sub_v = vac_df[
-                    (vac_df['NOME'] == nome) &
-                    (vac_df['DISCIPLINA'] == disc)
-                ]
-                if any(v['Férias - Início'] <= dt_date <= v['Férias - Término'] for _, v in sub_v.iterrows()):
-                    logger.debug(f"Skipping {dt} for {nome} | {disc} (on vacation)")
-                    continue
-                sub_i = inss_df[
-                    (inss_df['NOME'] == nome) &
-                    (inss_df['DISCIPLINA'] == disc)
-                ]
-                if any(i['Início'] <= dt_date <= i['Término'] for _, i in sub_i.iterrows()):
-                    logger.debug(f"Skipping {dt} for {nome} | {disc} (on INSS)")
-                    continue
-                sub_a = adm_df[
-                    (adm_df['OBSERVAÇÃO'] == nome) &
-                    (adm_df['DISCIPLINA'] == disc)
-                ]
-                if not sub_a.empty and dt_date < sub_a['DATA'].iloc[0]:
-                    logger.debug(f"Skipping {dt} for {nome} | {disc} (pre-admission)")
-                    continue
-                raw = row.get(dt, 0.0)
-                if raw == 0 or pd.isna(raw):
-                    logger.debug(f"Pending record added: {nome} | {disc} | {dt}")
-                    pending_lines.append({
-                        'NOME': nome,
-                        'DISCIPLINA': disc,
-                        'DATA': dt
-                    })
+    if grid is not None:
+        dates = grid.chargeable_dates()
+        disciplines = grid.disciplines(sel_disc)
+        pending_lines = grid.pending(sel_disc, sel_date, start, end)
 
     logger.info(f"[Pending] {len(pending_lines)} registros pendentes encontrados")
 
@@ -1023,6 +1267,7 @@ def pending():
         dates=dates,
         selected_discipline=sel_disc,
         selected_date=sel_date,
+        date_from=start.isoformat() if start else '', date_to=end.isoformat() if end else '',
         pending_lines=pending_lines
     )
 
@@ -1030,203 +1275,76 @@ def pending():
 @login_required
 @roles_required('admin', 'editor')
 def export_pendentes():
-    folder = current_app.config['UPLOAD_FOLDER']
     sel_file = request.args.get('file')
     sel_disc = request.args.get('discipline', 'All')
     sel_date = request.args.get('date', 'All')
-
-    pending_lines = []
-
-    if sel_file:
-        cutoff_date = datetime.now().date() - timedelta(days=1)
-        logger.info(f"Data de corte para exportação de pendentes: {cutoff_date.strftime('%d/%m/%Y')}")
-
-        df = _load_df(sel_file)
-        for std in ('HORA NORMAL', 'HORA EXTRA'):
-            df[std] = pd.to_numeric(df.get(std, 0.0), errors='coerce').fillna(0.0)
-
-        ef_path = os.path.join(folder, 'Efetivo.xlsx')
-        eff_names = []
-        if os.path.exists(ef_path):
-            eff = pd.read_excel(ef_path, sheet_name=0, dtype=str)
-            status_col = eff.columns[2]
-            eff_names = eff.loc[eff[status_col].str.strip() == 'MOD', eff.columns[0]].str.strip().tolist()
-            eff_disciplines = eff.loc[eff[status_col].str.strip() == 'MOD', eff.columns[1]].str.strip().tolist()
-            eff_df = pd.DataFrame({'OBSERVAÇÃO': eff_names, 'DISCIPLINA': eff_disciplines})
-            df = df[df['OBSERVAÇÃO'].isin(eff_names)]
-        else:
-            eff_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA'])
-
-        if 'DATARDO_STR' not in df.columns and 'DATARDO' in df.columns:
-            df['DATARDO_STR'] = pd.to_datetime(df['DATARDO'], dayfirst=True, errors='coerce').dt.strftime('%d/%m/%Y').fillna('')
-        elif 'DATARDO_STR' not in df.columns:
-            df['DATARDO_STR'] = ''
-
-        if df['DATARDO_STR'].notna().any():
-            dates_series = pd.to_datetime(df['DATARDO_STR'], format='%d/%m/%Y', errors='coerce')
-            month = dates_series.dt.to_period('M').iloc[0] if dates_series.notna().any() else pd.Timestamp('2025-07-01').to_period('M')
-        else:
-            month = pd.Timestamp('2025-07-01').to_period('M')
-        month_start = month.start_time.date()
-        month_end = min(month.end_time.date(), cutoff_date)
-        all_dates = pd.date_range(month_start, month_end, freq='D')
-
-        cal_path = os.path.join(folder, 'calendar.xlsx')
-        has_calendar = os.path.exists(cal_path)
-        cobrar_days = set()
-        if has_calendar:
-            cal_df = pd.read_excel(cal_path, sheet_name=0, dtype={'DATA': object, 'COBRAR?': str})
-            cal_df['DATA'] = pd.to_datetime(cal_df['DATA'], dayfirst=True, errors='coerce')
-            cobrar_days = set(
-                cal_df.loc[
-                    (cal_df['COBRAR?'].str.strip().str.lower() == 'sim') &
-                    (cal_df['DATA'].dt.date <= cutoff_date),
-                    'DATA'
-                ].dt.strftime('%d/%m/%Y').dropna()
-            )
-        dates = [dt.strftime('%d/%m/%Y') for dt in all_dates if has_calendar and dt.strftime('%d/%m/%Y') in cobrar_days or not has_calendar]
-
-        if sel_disc != 'All':
-            df = df[df['DISCIPLINA'] == sel_disc]
-            eff_df = eff_df[eff_df['DISCIPLINA'] == sel_disc]
-
-        grp = df.groupby(['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR'], as_index=False).agg({'HORA NORMAL': 'sum', 'HORA EXTRA': 'sum'})
-        grp['TOTAL_HH'] = grp['HORA NORMAL'] + grp['HORA EXTRA']
-        table = grp.pivot(index=['OBSERVAÇÃO', 'DISCIPLINA'], columns='DATARDO_STR', values='TOTAL_HH').reset_index().fillna(0)
-
-        fer_inss = os.path.join(folder, 'ferias_inss.xlsx')
-        if os.path.exists(fer_inss):
-            vac_df = pd.read_excel(fer_inss, sheet_name='Férias')
-            vac_df.columns = vac_df.columns.str.strip()
-            col_map = {}
-            for col in vac_df.columns:
-                low = col.lower().replace('_', ' ').replace('-', ' ').strip()
-                if 'início' in low or 'inicio' in low:
-                    col_map[col] = 'Férias - Início'
-                if 'término' in low or 'termino' in low:
-                    col_map[col] = 'Férias - Término'
-            vac_df = vac_df.rename(columns=col_map)
-            vac_df['Férias - Início'] = pd.to_datetime(vac_df['Férias - Início'], dayfirst=True, errors='coerce').dt.date
-            vac_df['Férias - Término'] = pd.to_datetime(vac_df['Férias - Término'], dayfirst=True, errors='coerce').dt.date
-            vac_df['NOME'] = vac_df['NOME'].str.strip()
-            vac_df['DISCIPLINA'] = vac_df['DISCIPLINA'].fillna('').astype(str)
-
-            inss_df = pd.read_excel(fer_inss, sheet_name='INSS', dtype=str)
-            inss_df['Início'] = pd.to_datetime(inss_df['Início'], dayfirst=False, errors='coerce').dt.date
-            inss_df['Término'] = pd.to_datetime(inss_df['Término'], dayfirst=False, errors='coerce').dt.date
-            inss_df['NOME'] = inss_df['NOME'].str.strip()
-            inss_df['DISCIPLINA'] = inss_df['DISCIPLINA'].fillna('').astype(str)
-        else:
-            vac_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Férias - Início', 'Férias - Término'])
-            inss_df = pd.DataFrame(columns=['NOME', 'DISCIPLINA', 'Início', 'Término'])
-
-        if os.path.exists(ef_path):
-            adm_raw = pd.read_excel(ef_path, sheet_name=1, dtype=str)
-            adm_df = pd.DataFrame({
-                'OBSERVAÇÃO': adm_raw.iloc[:, 0].str.strip(),
-                'DISCIPLINA': adm_raw.iloc[:, 1].fillna('').astype(str),
-                'DATA': pd.to_datetime(adm_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
-            })
-            term_raw = pd.read_excel(ef_path, sheet_name=2, dtype=str)
-            term_df = pd.DataFrame({
-                'OBSERVAÇÃO': term_raw.iloc[:, 0].str.strip(),
-                'DISCIPLINA': term_raw.iloc[:, 1].fillna('').astype(str),
-                'DATA': pd.to_datetime(term_raw.iloc[:, 2], dayfirst=False, errors='coerce').dt.date
-            })
-        else:
-            adm_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
-            term_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATA'])
-
-        just_path = os.path.join(folder, 'Justificativas.xlsx')
-        if os.path.exists(just_path):
-            just_raw = pd.read_excel(just_path, sheet_name='Justificativas')
-            just_raw['OBSERVAÇÃO'] = just_raw['OBSERVAÇÃO'].str.strip()
-            just_raw['DISCIPLINA'] = just_raw['DISCIPLINA'].fillna('').str.strip()
-            just_raw['DATA'] = pd.to_datetime(just_raw['DATA'], dayfirst=True, errors='coerce')
-            just_raw['DATARDO_STR'] = just_raw['DATA'].dt.strftime('%d/%m/%Y')
-            just_raw['FRENTE DE TRABALHO'] = just_raw['FRENTE DE TRABALHO'].fillna('').astype(str)
-            just_raw['CODIGO'] = just_raw['CODIGO'].fillna('').astype(str).str.strip()
-            just_df = just_raw[['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO']]
+    start, end = _date_range()
+    if not sel_file:
+        flash('Selecione um arquivo para exportar.', 'warning')
+        return redirect(url_for('main.pending'))
+
+    def write(f, progress):
+        progress(0.1, 'Calculando pendências')
+        pending_lines = _validation_grid(sel_file).pending(sel_disc, sel_date, start, end)
+        progress(0.6, f'Gravando {len(pending_lines)} linhas')
+        df_export = pd.DataFrame(pending_lines, columns=['NOME', 'DISCIPLINA', 'DATA'])
+        with pd.ExcelWriter(f, engine='openpyxl') as writer:
+            df_export.to_excel(writer, index=False, sheet_name='Pendentes')
+
+    filters = {'file': sel_file, 'discipline': sel_disc, 'date': sel_date, 'from': start, 'to': end}
+    return _start_export('pending', filters, _grid_version(sel_file), "pendentes_completos.xlsx", write)
+
+@bp.route('/export_pendentes/bundle')
+@login_required
+@roles_required('admin', 'editor')
+def export_pendentes_bundle():
+    """
+    Pendências de todas as disciplinas calculadas em uma única passada pela grade:
+    ?format=xlsx (padrão) gera uma planilha com uma aba por disciplina e
+    ?format=zip um .zip com uma planilha por disciplina. ?disciplines=A,B limita
+    às disciplinas listadas; date/from/to filtram como em /export_pendentes.
+    """
+    import zipfile
+    sel_file = request.args.get('file')
+    sel_date = request.args.get('date', 'All')
+    fmt = request.args.get('format', 'xlsx')
+    wanted = [d for d in request.args.get('disciplines', '').split(',') if d]
+    start, end = _date_range()
+    if not sel_file:
+        flash('Selecione um arquivo para exportar.', 'warning')
+        return redirect(url_for('main.pending'))
+    if fmt not in ('xlsx', 'zip'):
+        flash('Formato de exportação inválido (use xlsx ou zip).', 'warning')
+        return redirect(url_for('main.pending', file=sel_file))
+
+    def frame(lines):
+        return pd.DataFrame(lines, columns=['NOME', 'DISCIPLINA', 'DATA'])
+
+    def write(f, progress):
+        progress(0.1, 'Calculando pendências de todas as disciplinas')
+        grid = _validation_grid(sel_file)
+        groups = grid.pending_by_discipline(sel_date, start, end)
+        discs = wanted or sorted(set(grid.disciplines('All')) | set(groups))
+        total = sum(len(groups.get(d, [])) for d in discs)
+        progress(0.3, f'Gravando {total} linhas em {len(discs)} disciplina(s)')
+        if fmt == 'xlsx':
+            with pd.ExcelWriter(f, engine='openpyxl') as writer:
+                summary = pd.DataFrame({'DISCIPLINA': discs, 'PENDENTES': [len(groups.get(d, [])) for d in discs]})
+                summary.to_excel(writer, index=False, sheet_name='Resumo')
+                names = _unique_names(discs, _sheet_name, reserved=['Resumo'])
+                for i, (disc, sheet) in enumerate(zip(discs, names)):
+                    frame(groups.get(disc, [])).to_excel(writer, index=False, sheet_name=sheet)
+                    progress(0.3 + 0.7 * (i + 1) / len(discs), f'Aba {sheet}')
         else:
-            just_df = pd.DataFrame(columns=['OBSERVAÇÃO', 'DISCIPLINA', 'DATARDO_STR', 'FRENTE DE TRABALHO', 'CODIGO'])
-
-        names_src = pd.concat([
-            vac_df[['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
-            inss_df[['NOME', 'DISCIPLINA']].rename(columns={'NOME': 'OBSERVAÇÃO'}),
-            eff_df[['OBSERVAÇÃO', 'DISCIPLINA']]
-        ]).drop_duplicates()
-        extra = []
-        for _, src in names_src.iterrows():
-            nome, disc = src['OBSERVAÇÃO'], src['DISCIPLINA']
-            if sel_disc != 'All' and disc != sel_disc:
-                continue
-            if nome in eff_names and not ((table['OBSERVAÇÃO'] == nome) & (table['DISCIPLINA'] == disc)).any():
-                row = {'OBSERVAÇÃO': nome, 'DISCIPLINA': disc}
-                for dt in dates:
-                    row[dt] = 0.0
-                extra.append(row)
-        if extra:
-            table = pd.concat([table, pd.DataFrame(extra)], ignore_index=True)
-
-        for _, row in table.iterrows():
-            nome = row['OBSERVAÇÃO']
-            disc = row['DISCIPLINA']
-            if sel_disc != 'All' and disc != sel_disc:
-                continue
-            for dt in dates:
-                if sel_date != 'All' and dt != sel_date:
-                    continue
-                if has_calendar and dt not in cobrar_days:
-                    continue
-                sub_j = just_df[
-                    (just_df['OBSERVAÇÃO'] == nome) &
-                    (just_df['DISCIPLINA'] == disc) &
-                    (just_df['DATARDO_STR'] == dt)
-                ]
-                if not sub_j.empty:
-                    continue
-                dt_date = datetime.strptime(dt, '%d/%m/%Y').date()
-                sub_t = term_df[
-                    (term_df['OBSERVAÇÃO'] == nome) &
-                    (term_df['DISCIPLINA'] == disc)
-                ]
-                if not sub_t.empty and dt_date > sub_t['DATA'].iloc[0]:
-                    continue
-                sub_v = vac_df[
-                    (vac_df['NOME'] == nome) &
-                    (vac_df['DISCIPLINA'] == disc)
-                ]
-                if any(v['Férias - Início'] <= dt_date <= v['Férias - Término'] for _, v in sub_v.iterrows()):
-                    continue
-                sub_i = inss_df[
-                    (inss_df['NOME'] == nome) &
-                    (inss_df['DISCIPLINA'] == disc)
-                ]
-                if any(i['Início'] <= dt_date <= i['Término'] for _, i in sub_i.iterrows()):
-                    continue
-                sub_a = adm_df[
-                    (adm_df['OBSERVAÇÃO'] == nome) &
-                    (adm_df['DISCIPLINA'] == disc)
-                ]
-                if not sub_a.empty and dt_date < sub_a['DATA'].iloc[0]:
-                    continue
-                raw = row.get(dt, 0.0)
-                if raw == 0 or pd.isna(raw):
-                    pending_lines.append({
-                        'NOME': nome,
-                        'DISCIPLINA': disc,
-                        'DATA': dt
-                    })
-
-    df_export = pd.DataFrame(pending_lines, columns=['NOME', 'DISCIPLINA', 'DATA'])
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
-        df_export.to_excel(writer, index=False, sheet_name='Pendentes')
-    buf.seek(0)
-
-    return send_file(
-        buf,
-        download_name="pendentes_completos.xlsx",
-        as_attachment=True,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
\ No newline at end of file
+            names = _unique_names(discs, _sheet_name)
+            with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for i, (disc, name) in enumerate(zip(discs, names)):
+                    buf = io.BytesIO()
+                    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
+                        frame(groups.get(disc, [])).to_excel(writer, index=False, sheet_name='Pendentes')
+                    zf.writestr(f'pendentes_{name}.xlsx', buf.getvalue())
+                    progress(0.3 + 0.7 * (i + 1) / len(discs), f'Arquivo {name}')
+
+    filters = {'file': sel_file, 'date': sel_date, 'from': start, 'to': end, 'disciplines': ','.join(wanted)}
+    return _start_export(f'pending_bundle_{fmt}', filters, _grid_version(sel_file),
+                         f"pendentes_por_disciplina.{fmt}", write)
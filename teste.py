@@ -4,55 +4,52 @@ import argparse
 from typing import List
 import pandas as pd
 
-def find_date_columns(df: pd.DataFrame) -> List[str]:
+from app.folder_inspect import detect_type, inspect_folder
+
+def find_date_columns(df: pd.DataFrame, sample_size: int = 200) -> List[str]:
     """
-    Retorna a lista de colunas que podem ser convertidas para datetime.
+    Retorna a lista de colunas que podem ser convertidas para datetime
+    (avalia só uma amostra de cada coluna).
     """
-    date_cols: List[str] = []
-    for col in df.columns:
-        series = df[col].dropna().astype(str)
-        try:
-            pd.to_datetime(series, dayfirst=True, errors='raise')
-            date_cols.append(col)
-        except Exception:
-            pass
-    return date_cols
+    return [
+        col for col in df.columns
+        if detect_type(df[col].dropna().head(sample_size).tolist()) == 'date'
+    ]
 
-def analyze_folder(folder: str):
+def analyze_folder(folder: str, workers: int = None):
     print(f"\n🔎  Analisando pasta: {folder}\n")
     if not os.path.isdir(folder):
         print("⛔️  Diretório não encontrado.")
         return
 
-    files = [f for f in os.listdir(folder)
-             if f.lower().endswith(('.xls', '.xlsx'))]
-    print(f"  • Arquivos encontrados: {len(files)}\n")
-    if not files:
+    reports = inspect_folder(folder, workers)
+    print(f"  • Arquivos encontrados: {len(reports)}\n")
+    if not reports:
         return
 
     # Cabeçalho
     print(f"{'Arquivo':60}Colunas de Data")
     print("-" * 90)
-    for fname in files:
-        path = os.path.join(folder, fname)
-        try:
-            df = pd.read_excel(path, dtype=str)
-            dates = find_date_columns(df)
-        except Exception as e:
-            dates = [f"Erro ao ler: {e}"]
-        print(f"{fname:60}{', '.join(dates) or '— nenhuma'}")
+    for rep in reports:
+        if 'error' in rep:
+            dates = [f"Erro ao ler: {rep['error']}"]
+        else:
+            dates = [c['name'] for s in rep['sheets'] for c in s['columns'] if c['type'] == 'date']
+        print(f"{rep['file']:60}{', '.join(dates) or '— nenhuma'}")
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Lista, para cada arquivo Excel numa pasta, as colunas reconhecidas como datas."
+        description="Lista, para cada arquivo Excel numa pasta, as colunas reconhecidas como datas. "
+                    "Para o relatório completo em JSON use: python -m app.folder_inspect"
     )
     parser.add_argument(
         '-f', '--folder',
-        default=r"C:\Users\ruan_cruz\Desktop\Automações\Beck-up\Validação - 02-07\test\Validação\uploads",
+        default=os.path.join(os.getcwd(), 'uploads'),
         help="Caminho da pasta com os arquivos Excel"
     )
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Nº de processos")
     args = parser.parse_args()
-    analyze_folder(args.folder)
+    analyze_folder(args.folder, args.workers)
 
 if __name__ == "__main__":
     main()